@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_acquisition.py
+Created on Sat Oct 17 20:12:44 2026
+This module reads live ECG data from arduinos. Each arduino sends one ADC
+count per line, over a serial port or a local socket. Many streams are read
+at the same time with asyncio. The counts are converted to volts in batches.
+They are held in a fixed size ring buffer, and from there they are fed to
+the StreamingFilter and OnlineBeatDetector of Project_3_stream. The ring
+buffer gives backpressure: when the analysis falls behind, the reader stops
+taking data from the device instead of letting the buffer grow. The
+filtering and beat detection run in a worker thread, so the event loop keeps
+reading the devices while a batch is analyzed. Because of
+that the time a sample waits before it is analyzed is at most the length of
+the ring buffer. SimulatedArduino serves a recording over a local socket at
+the speed of the real sensor (or faster), so the whole chain can be run
+without hardware.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import asyncio
+import time
+from collections import deque
+import numpy as np
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_stream as p3s
+
+#%% Simulated arduino
+
+class SimulatedArduino:
+    '''
+    The SimulatedArduino class stands in for an arduino ECG sensor. It
+    serves ADC counts as text lines over a local TCP socket, in packets, at
+    fs samples a second times speed. Every client that connects gets the
+    whole recording, and the connection is closed at the end of it. The
+    sending waits for the socket to drain, so a client that reads slowly
+    slows the device down the same way a full serial buffer would.
+
+    Parameters
+    ----------
+    counts : Array of integers.
+        A 1D array of the ADC count of each sample (0 to 1023).
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    speed : Float, optional
+        How many times faster than real time the samples are sent. The default is 1.
+    packet_samples : Integer, optional
+        The number of samples sent at a time. The default is 25 (50 ms at 500 Hz).
+
+    '''
+
+    def __init__(self, counts, fs=500, speed=1.0, packet_samples=25):
+        self.counts = np.asarray(counts, dtype=int)
+        self.fs = fs
+        self.speed = speed
+        self.packet_samples = packet_samples
+        self.server = None
+        self.port = None
+
+    @classmethod
+    def from_volts(cls, ecg_data, **options):
+        '''
+        The from_volts method makes a SimulatedArduino from a recording in
+        volts, like the ones returned by Project_3_loader.load_recording, by
+        turning the volts back into ADC counts.
+        '''
+        counts = np.clip(np.round(np.asarray(ecg_data)/p3l.volts_per_count), 0, 1023).astype(int)
+        return cls(counts, **options)
+
+    async def _send(self, reader, writer):
+        '''
+        The _send method sends the recording to one client, paced by the clock.
+        '''
+        start_time = time.perf_counter()
+        try:
+            for start in range(0, len(self.counts), self.packet_samples):
+                packet = self.counts[start:start + self.packet_samples]
+                # wait until the last sample of the packet would have been measured
+                send_time = start_time + (start + len(packet))/(self.fs*self.speed)
+                await asyncio.sleep(max(send_time - time.perf_counter(), 0))
+                writer.write(('\n'.join(map(str, packet.tolist())) + '\n').encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0):
+        '''
+        The start method starts serving the recording, and returns the port
+        it is served on (a free port is picked when port is 0).
+        '''
+        self.server = await asyncio.start_server(self._send, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        '''
+        The stop method stops serving the recording.
+        '''
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+#%% Connections
+
+async def open_socket(host, port):
+    '''
+    The open_socket function will connect to an ECG stream served over TCP,
+    like a SimulatedArduino or a serial to network bridge, and return its
+    (reader, writer).
+    '''
+    return await asyncio.open_connection(host, port)
+
+
+async def open_serial(port, baudrate=115200):
+    '''
+    The open_serial function will open the serial port of an arduino and
+    return its (reader, writer). It needs the optional pyserial-asyncio package.
+
+    Parameters
+    ----------
+    port : String
+        The name of the serial port, like 'COM3' or '/dev/ttyACM0'.
+    baudrate : Integer, optional
+        The baud rate the arduino code uses. The default is 115200.
+
+    Returns
+    -------
+    reader : asyncio.StreamReader
+        The stream the lines are read from.
+    writer : asyncio.StreamWriter
+        The stream to write to the arduino.
+
+    '''
+    try:
+        import serial_asyncio
+    except ImportError as error:
+        raise ImportError('reading a serial port needs the pyserial-asyncio package '
+                          '(pip install pyserial-asyncio)') from error
+    return await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
+
+#%% Ring buffer
+
+class RingBuffer:
+    '''
+    The RingBuffer class holds the newest samples of one stream in a fixed
+    numpy array, between the coroutine that reads the device and the one
+    that analyzes the samples. put waits while the buffer is full, which is
+    the backpressure, and get waits while it is empty. The time each batch
+    was put in is kept, so the time samples waited in the buffer can be measured.
+
+    Parameters
+    ----------
+    capacity : Integer
+        The most samples the buffer holds.
+
+    '''
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity)
+        self._start = 0
+        self._size = 0
+        self._closed = False
+        # [number of samples left, time put in] of each batch in the buffer
+        self._arrivals = deque()
+        self._changed = asyncio.Condition()
+        self.max_size = 0
+        self.full_waits = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    async def put(self, samples, arrival_time=None):
+        '''
+        The put method adds samples to the end of the buffer, waiting for
+        room when it is full. Batches longer than the buffer go in piece by piece.
+
+        Parameters
+        ----------
+        samples : Array of floats.
+            A 1D array of the next samples of the stream.
+        arrival_time : Float, optional
+            The time.perf_counter() the samples arrived at. The default is None, which uses now.
+
+        Returns
+        -------
+        None.
+
+        '''
+        samples = np.asarray(samples, dtype=float)
+        if arrival_time is None:
+            arrival_time = time.perf_counter()
+        async with self._changed:
+            while len(samples) > 0:
+                if self._size == self.capacity:
+                    self.full_waits += 1
+                    await self._changed.wait_for(lambda: self._size < self.capacity or self._closed)
+                if self._closed:
+                    raise ValueError('put on a closed ring buffer')
+                n_samples = min(len(samples), self.capacity - self._size)
+                end = (self._start + self._size) % self.capacity
+                first = min(n_samples, self.capacity - end)
+                self._data[end:end + first] = samples[:first]
+                self._data[:n_samples - first] = samples[first:n_samples]
+                self._size += n_samples
+                self.max_size = max(self.max_size, self._size)
+                self._arrivals.append([n_samples, arrival_time])
+                samples = samples[n_samples:]
+                self._changed.notify_all()
+
+    async def get(self, max_samples=None):
+        '''
+        The get method takes the oldest samples out of the buffer, waiting
+        while it is empty.
+
+        Parameters
+        ----------
+        max_samples : Integer, optional
+            The most samples to take. The default is None, which takes all of them.
+
+        Returns
+        -------
+        samples : Array of floats.
+            A 1D array of the samples, empty once the buffer is closed and empty.
+        oldest_arrival : Float
+            The time.perf_counter() the oldest of the samples arrived at (None if empty).
+
+        '''
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._size > 0 or self._closed)
+            n_samples = self._size if max_samples is None else min(self._size, max_samples)
+            if n_samples == 0:
+                return np.zeros(0), None
+            indices = (self._start + np.arange(n_samples)) % self.capacity
+            samples = self._data[indices]
+            self._start = (self._start + n_samples) % self.capacity
+            self._size -= n_samples
+
+            oldest_arrival = self._arrivals[0][1]
+            to_remove = n_samples
+            while to_remove > 0:
+                if self._arrivals[0][0] <= to_remove:
+                    to_remove -= self._arrivals.popleft()[0]
+                else:
+                    self._arrivals[0][0] -= to_remove
+                    to_remove = 0
+            self._changed.notify_all()
+            return samples, oldest_arrival
+
+    async def close(self):
+        '''
+        The close method marks the end of the stream. The samples still in
+        the buffer can be taken, then get returns an empty array.
+        '''
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+#%% Acquisition of one stream
+
+def parse_counts(data):
+    '''
+    The parse_counts function will turn bytes of ADC count lines into volts.
+    The whole batch is parsed and converted with one numpy call each.
+
+    Parameters
+    ----------
+    data : Bytes
+        Complete lines of ADC counts, one per line.
+
+    Returns
+    -------
+    ecg_data : Array of floats.
+        A 1D array of the voltage of each sample.
+
+    '''
+    return np.array(data.split(), dtype=float)*p3l.volts_per_count
+
+
+class AcquisitionChannel:
+    '''
+    The AcquisitionChannel class reads one live ECG stream and finds its
+    heartbeats as the data comes in. One coroutine reads the lines from the
+    device, converts each batch to volts and puts it in a RingBuffer. Another
+    takes the samples out, filters them with StreamingFilter and searches
+    them with OnlineBeatDetector in the default executor of the event loop,
+    so the analysis does not block the reading of this or other streams.
+    The beats match running the pipeline of
+    Project_3_stream on the whole recording.
+
+    Parameters
+    ----------
+    name : String
+        The name of the stream.
+    filt : Array of floats, optional
+        A 1D array of n terms where n represents the values of a bandpass filter.
+        The default is None, which uses the same 0.5-50 Hz hann filter as Project_3_script.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    buffer_time : Float, optional
+        The length of the ring buffer in seconds of data. The default is 2.
+    read_size : Integer, optional
+        The most bytes read from the device at a time. The default is 4096.
+    on_beats : Function, optional
+        Called with the name and the times of the new heartbeats every time
+        beats are found. The default is None.
+
+    '''
+
+    def __init__(self, name, filt=None, numtaps=250, height=1.7, fs=500, buffer_time=2.0,
+                 read_size=4096, on_beats=None):
+        if filt is None:
+            filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+        self.name = name
+        self.fs = fs
+        self.read_size = read_size
+        self.on_beats = on_beats
+        self.streaming_filter = p3s.StreamingFilter(filt)
+        self.detector = p3s.OnlineBeatDetector(numtaps, height, fs)
+        self.ring = RingBuffer(int(buffer_time*fs))
+        self.beat_times = []
+        self.samples_received = 0
+        self.bad_lines = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self.batches = 0
+        self.detector_report = None
+
+    async def receive(self, reader):
+        '''
+        The receive method reads ADC count lines from the device until it
+        closes the stream. The complete lines of each read are converted to
+        volts as one batch. A line cut off at the end of a read is kept for
+        the next one.
+        '''
+        partial = b''
+        try:
+            while True:
+                data = await reader.read(self.read_size)
+                if not data:
+                    break
+                arrival_time = time.perf_counter()
+                data = partial + data
+                end = data.rfind(b'\n') + 1
+                data, partial = data[:end], data[end:]
+                if end > 0:
+                    await self.ring.put(self._convert(data), arrival_time)
+            if partial.strip():
+                await self.ring.put(self._convert(partial))
+        finally:
+            await self.ring.close()
+
+    def _convert(self, data):
+        '''
+        The _convert method turns a batch of lines into volts. If a line in
+        the batch is not a number (like a line garbled when the port opens),
+        the lines are converted one at a time and the bad ones are skipped.
+        '''
+        try:
+            volts = parse_counts(data)
+        except ValueError:
+            counts = []
+            for line in data.split():
+                try:
+                    counts.append(float(line))
+                except ValueError:
+                    self.bad_lines += 1
+            volts = np.array(counts)*p3l.volts_per_count
+        self.samples_received += len(volts)
+        return volts
+
+    async def analyze(self):
+        '''
+        The analyze method filters the samples in the ring buffer and finds
+        their heartbeats until the stream ends, then flushes the filter and
+        the detector. Each batch is analyzed in the default executor of the
+        event loop, one batch at a time.
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            samples, oldest_arrival = await self.ring.get()
+            if len(samples) == 0:
+                break
+            wait = time.perf_counter() - oldest_arrival
+            self.max_wait = max(self.max_wait, wait)
+            self.total_wait += wait
+            self.batches += 1
+            self._add_beats(await loop.run_in_executor(None, self._process, samples))
+        self._add_beats(await loop.run_in_executor(None, self._flush))
+        self.detector_report = self.detector.get_latency_report()
+
+    def _process(self, samples):
+        return self.detector.process(self.streaming_filter.process(samples))
+
+    def _flush(self):
+        beats = self.detector.process(self.streaming_filter.flush())
+        return np.concatenate([beats, self.detector.flush()])
+
+    def _add_beats(self, new_beat_times):
+        if len(new_beat_times) > 0:
+            self.beat_times.extend(new_beat_times.tolist())
+            if self.on_beats is not None:
+                self.on_beats(self.name, new_beat_times)
+
+    async def run(self, reader):
+        '''
+        The run method reads and analyzes a stream until it ends, and
+        returns the report of the channel.
+        '''
+        await asyncio.gather(self.receive(reader), self.analyze())
+        return self.get_report()
+
+    def get_report(self):
+        '''
+        The get_report method returns what the channel found and how long the
+        samples waited.
+
+        Returns
+        -------
+        report : Dictionary
+            The name, the time of each heartbeat, the number of samples and bad
+            lines received, the largest number of samples the ring buffer held,
+            how many times the reader had to wait for room, the mean and max time
+            samples waited in the buffer before being analyzed, and the
+            latency report of the OnlineBeatDetector.
+
+        '''
+        return {'name': self.name,
+                'time_of_heartbeat': np.array(self.beat_times),
+                'samples': self.samples_received,
+                'bad_lines': self.bad_lines,
+                'max_buffered': self.ring.max_size,
+                'full_waits': self.ring.full_waits,
+                'mean_wait': self.total_wait/max(self.batches, 1),
+                'max_wait': self.max_wait,
+                'detector': self.detector_report}
+
+#%% Many streams at once
+
+async def acquire(connections, **channel_options):
+    '''
+    The acquire function will read many ECG streams at the same time and find
+    their heartbeats.
+
+    Parameters
+    ----------
+    connections : Dictionary
+        The (reader, writer) of each stream by name, from open_socket or open_serial.
+    **channel_options
+        Passed to AcquisitionChannel (filt, numtaps, height, fs, buffer_time, read_size, on_beats).
+
+    Returns
+    -------
+    reports : Dictionary
+        The report of each stream by name (see AcquisitionChannel.get_report).
+
+    '''
+    channels = {name: AcquisitionChannel(name, **channel_options) for name in connections}
+    try:
+        reports = await asyncio.gather(*(channels[name].run(reader)
+                                         for name, (reader, writer) in connections.items()))
+    finally:
+        for reader, writer in connections.values():
+            writer.close()
+    return dict(zip(connections, reports))
+
+
+async def acquire_simulated(recordings, speed=1.0, **channel_options):
+    '''
+    The acquire_simulated function will serve each recording from its own
+    SimulatedArduino on a local socket, connect to all of them, and read
+    them at the same time with acquire.
+
+    Parameters
+    ----------
+    recordings : Dictionary
+        The recording of each stream in volts, by name.
+    speed : Float, optional
+        How many times faster than real time the devices send. The default is 1.
+    **channel_options
+        Passed to AcquisitionChannel.
+
+    Returns
+    -------
+    reports : Dictionary
+        The report of each stream by name (see AcquisitionChannel.get_report).
+
+    '''
+    fs = channel_options.get('fs', 500)
+    devices = {name: SimulatedArduino.from_volts(ecg_data, fs=fs, speed=speed)
+               for name, ecg_data in recordings.items()}
+    try:
+        connections = {}
+        for name, device in devices.items():
+            port = await device.start()
+            connections[name] = await open_socket('127.0.0.1', port)
+        return await acquire(connections, **channel_options)
+    finally:
+        for device in devices.values():
+            await device.stop()
+
+
+def print_beats(name, time_of_heartbeat):
+    '''
+    The print_beats function prints how many new heartbeats were found and
+    the time of the last one, for use as on_beats.
+    '''
+    print(f'{name}: {len(time_of_heartbeat)} beat(s) up to {time_of_heartbeat[-1]:.2f} s')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Find heartbeats in live arduino ECG streams.')
+    parser.add_argument('--serial', nargs='+', default=[], help='serial ports to read, like /dev/ttyACM0')
+    parser.add_argument('--socket', nargs='+', default=[], help='host:port of TCP streams to read')
+    parser.add_argument('--baudrate', type=int, default=115200, help='baud rate of the serial ports')
+    parser.add_argument('--buffer-time', type=float, default=2.0, help='length of the ring buffers in seconds')
+    arguments = parser.parse_args()
+
+    async def main():
+        connections = {}
+        for port in arguments.serial:
+            connections[port] = await open_serial(port, arguments.baudrate)
+        for address in arguments.socket:
+            host, port = address.rsplit(':', 1)
+            connections[address] = await open_socket(host, int(port))
+        reports = await acquire(connections, buffer_time=arguments.buffer_time, on_beats=print_beats)
+        for name, report in reports.items():
+            print(f"{name}: {len(report['time_of_heartbeat'])} beats, max wait {report['max_wait']*1000:.1f} ms")
+
+    if arguments.serial or arguments.socket:
+        asyncio.run(main())
+    else:
+        parser.print_help()
@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_batch.py
+Created on Sat Oct 17 11:20:05 2026
+This module runs the Project_3_module analysis (filter, detect heartbeats,
+interpolate the inter-beat intervals and take their power spectrum) over many
+recordings at once. The recordings can be given as a folder, a manifest file
+or a list of file names. Each recording is loaded into a shared memory buffer
+and handed to a pool of worker processes, so the work is spread over every
+core without copying the data into each worker. The results come back as one
+row per recording with its SDRR, LF, HF, LF/HF ratio and the time each stage took.
+run_stream_batch does the same with Project_3_stream.run_pipeline for
+recordings too long to hold in memory.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+import numpy as np
+import Project_3_module as p3m
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_stream as p3s
+import Project_3_precision as p3prec
+import Project_3_profiling as p3prof
+import Project_3_quality as p3q
+
+# columns of the results table, in order
+result_columns = ['recording', 'activity', 'n_samples', 'n_beats', 'sdrr', 'lf', 'hf',
+                  'lf_hf_ratio', 'load_time', 'filter_time', 'heartbeat_time',
+                  'ibi_time', 'spectrum_time', 'good_fraction', 'n_bad_segments', 'n_excluded_ibi']
+# columns of the results table of run_stream_batch, in order
+stream_columns = ['recording', 'activity', 'n_beats', 'sdrr', 'rmssd', 'lf', 'hf', 'lf_hf_ratio', 'wall_time']
+
+#%% Find recordings
+
+def read_manifest(source, pattern='*.txt'):
+    '''
+    The read_manifest function will input a folder, a manifest file or a list
+    of file names and return the list of recordings to analyze. A folder is
+    searched for files matching pattern. A manifest is a .csv file with a
+    header, or a .json file holding a list, where each recording has a file
+    name and optionally a trim, a flip and an activity. File names in a
+    manifest are relative to the folder the manifest is in. A list can hold
+    file names or dictionaries like the rows of a manifest.
+
+    Parameters
+    ----------
+    source : String or list
+        A folder, the path to a .csv or .json manifest, or a list of file names or manifest rows.
+    pattern : String, optional
+        The glob pattern used to find recordings in a folder. The default is '*.txt'.
+
+    Returns
+    -------
+    recordings : List of dictionaries
+        One dictionary per recording with the keys 'file', 'trim', 'flip' and 'activity'.
+
+    '''
+    if isinstance(source, (list, tuple)):
+        entries = [entry if isinstance(entry, dict) else {'file': entry} for entry in source]
+        folder = ''
+    elif os.path.isdir(source):
+        entries = [{'file': file_name} for file_name in sorted(glob.glob(os.path.join(source, pattern)))]
+        folder = ''
+    elif source.endswith('.json'):
+        with open(source, 'r') as file:
+            entries = json.load(file)
+        folder = os.path.dirname(source)
+    elif source.endswith('.csv'):
+        with open(source, 'r', newline='') as file:
+            entries = list(csv.DictReader(file))
+        folder = os.path.dirname(source)
+    else:
+        raise ValueError(f'cannot read recordings from {source!r}, expected a folder, a list, or a .csv or .json manifest')
+
+    recordings = []
+    for entry in entries:
+        file_name = os.path.join(folder, entry['file'])
+        flip = entry.get('flip') or False
+        if isinstance(flip, str):
+            flip = flip.strip().lower() in ('1', 'true', 'yes')
+        recordings.append({'file': file_name,
+                           'trim': int(entry.get('trim') or 0),
+                           'flip': bool(flip),
+                           'activity': entry.get('activity') or os.path.splitext(os.path.basename(file_name))[0]})
+    return recordings
+
+#%% Analyze one recording
+
+def analyze_recording(data, filt, numtaps=250, height=1.7, dt=0.1, fs=500, precision='float64', quality=False):
+    '''
+    The analyze_recording function will input a 1D data array and a filter and
+    run the whole analysis on it: filter the data, detect the heartbeats,
+    calculate the SDRR, interpolate the inter-beat intervals and find the
+    average LF and HF power. The time taken by each stage is returned too.
+    With precision='float32' the data are the ADC counts and the filter and
+    power spectrum are done in float32 with Project_3_precision. With
+    quality=True the signal quality of the recording is checked with
+    Project_3_quality first: the bad segments are taken out of the filtered
+    data before the heartbeats are found, and the intervals that cross them
+    and the outlier intervals are left out of the SDRR and the interpolated IBI.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity
+        (the int16 ADC counts when precision is 'float32').
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    precision : String, optional
+        'float64' or 'float32'. The default is 'float64'.
+    quality : Boolean, optional
+        If True, check the signal quality and leave out the bad segments and
+        outlier intervals. The default is False.
+
+    Returns
+    -------
+    result : Dictionary
+        The number of beats, SDRR, LF, HF, LF/HF ratio and the time of each
+        stage in seconds (the quality check is timed with the heartbeats),
+        and the quality report of Project_3_quality.get_quality_report when quality is True.
+
+    '''
+    # filter with FFT convolution, the same as filter_data gives
+    if precision not in ('float64', 'float32'):
+        raise ValueError(f"precision must be 'float64' or 'float32', not {precision!r}")
+    start_time = time.perf_counter()
+    if precision == 'float32':
+        filtered_data = p3prec.apply_filter_counts(data, filt)
+    else:
+        streaming_filter = p3s.StreamingFilter(filt)
+        filtered_data = np.concatenate([streaming_filter.process(data), streaming_filter.flush()])
+    filter_time = time.perf_counter() - start_time
+
+    # detect heartbeats, outside the bad segments when the quality is checked
+    start_time = time.perf_counter()
+    mask = None
+    if quality:
+        signal_quality = p3q.get_signal_quality(data, fs, volts_per_unit=p3l.volts_per_count
+                                                if precision == 'float32' else 1.0)
+        # filtering spreads an artifact out by half the filter length
+        bad_segments = p3q.get_bad_segments(signal_quality, margin=numtaps//2)
+        mask = p3q.get_sample_mask(bad_segments, len(data))
+    if precision == 'float32':
+        # no float64 time array, the times come from the indices
+        if mask is not None:
+            filtered_data = p3q.fill_bad_samples(filtered_data, mask)
+        heartbeat_indices = p3m.find_heartbeat_indices(filtered_data, numtaps, height)
+        if mask is not None:
+            heartbeat_indices = heartbeat_indices[mask[heartbeat_indices]]
+        time_of_heartbeat = heartbeat_indices*(1/fs)
+    else:
+        time_array = np.arange(0, len(filtered_data)/fs, 1/fs)
+        time_of_heartbeat = p3m.get_heartbeats(filtered_data, numtaps, time_array, height, mask=mask)
+    heartbeat_time = time.perf_counter() - start_time
+
+    # interpolate the inter-beat intervals
+    start_time = time.perf_counter()
+    valid = p3q.find_ibi_outliers(time_of_heartbeat, bad_segments, fs) if quality else None
+    if len(time_of_heartbeat) > 2 and (valid is None or np.count_nonzero(valid) > 1):
+        sdrr = p3m.calculate_hrv(time_of_heartbeat, valid)
+        regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat, dt, valid)
+    else:
+        sdrr, interpolated_ibi = np.nan, np.zeros(0)
+    ibi_time = time.perf_counter() - start_time
+
+    # get the frequency band power
+    start_time = time.perf_counter()
+    if len(interpolated_ibi) > 1 and precision == 'float32':
+        _, _, avg_lf, avg_hf = p3prec.calculate_power_spectrum(interpolated_ibi, regular_time[-1], dt)
+    elif len(interpolated_ibi) > 1:
+        _, _, avg_lf, avg_hf = p3m.calculate_power_spectrum(interpolated_ibi, regular_time[-1], dt)
+    else:
+        avg_lf, avg_hf = np.nan, np.nan
+    spectrum_time = time.perf_counter() - start_time
+
+    result = {'n_beats': len(time_of_heartbeat),
+              'sdrr': float(sdrr),
+              'lf': float(avg_lf),
+              'hf': float(avg_hf),
+              'lf_hf_ratio': float(avg_lf/avg_hf) if avg_hf > 0 else np.nan,
+              'filter_time': filter_time,
+              'heartbeat_time': heartbeat_time,
+              'ibi_time': ibi_time,
+              'spectrum_time': spectrum_time}
+    if quality:
+        result.update(p3q.get_quality_report(signal_quality, bad_segments, valid))
+    return result
+
+
+def analyze_shared_recording(shared_name, n_samples, filt, numtaps, height, dt, fs, name=None, profile=False,
+                             precision='float64', quality=False):
+    '''
+    The analyze_shared_recording function runs analyze_recording in a worker
+    process on a recording held in a shared memory buffer made by the parent
+    process. The buffer is only read, and is freed by the parent. When
+    profile is True the worker profiles the analysis and sends its
+    measurements back with the result under 'profile_records'.
+    '''
+    shared = shared_memory.SharedMemory(name=shared_name)
+    data = np.ndarray((n_samples,), dtype=np.int16 if precision == 'float32' else float, buffer=shared.buf)
+    try:
+        if not profile:
+            return analyze_recording(data, filt, numtaps, height, dt, fs, precision, quality)
+        p3prof.enable_profiling()
+        p3prof.reset_profiling()
+        with p3prof.profile_recording(name):
+            result = analyze_recording(data, filt, numtaps, height, dt, fs, precision, quality)
+        result['profile_records'] = p3prof.get_records()
+        p3prof.reset_profiling()
+        return result
+    finally:
+        # the array has to be dropped before the buffer can be closed
+        del data
+        shared.close()
+
+#%% Run the batch
+
+def run_batch(source, filt=None, numtaps=250, height=1.7, dt=0.1, fs=500, n_workers=None, pattern='*.txt',
+              precision='float64', quality=False):
+    '''
+    The run_batch function will input a folder, manifest or list of
+    recordings and analyze every one of them with a pool of worker processes.
+    Each recording is loaded with Project_3_loader (so the text is only parsed
+    once) and copied into a shared memory buffer that the worker reads from.
+    Only a few recordings per worker are loaded at a time, so memory use
+    does not grow with the number of recordings.
+
+    Parameters
+    ----------
+    source : String or list
+        A folder, the path to a .csv or .json manifest, or a list of file names.
+    filt : Array of floats, optional
+        A 1D array of n terms where n represents the values of a bandpass filter.
+        The default is None, which uses the same 0.5-50 Hz hann filter as Project_3_script.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    n_workers : Integer, optional
+        The number of worker processes. The default is None, which uses one per
+        core. With 1 the recordings are analyzed in this process.
+    pattern : String, optional
+        The glob pattern used to find recordings in a folder. The default is '*.txt'.
+    precision : String, optional
+        'float64', or 'float32' to load the int16 ADC counts (Project_3_loader.load_counts)
+        and analyze them with Project_3_precision, which needs a quarter of
+        the shared memory. The default is 'float64'.
+    quality : Boolean, optional
+        If True, gate each recording on its signal quality with
+        Project_3_quality (see analyze_recording). The rows then hold the
+        quality report, which Project_3_quality.write_quality_report saves. The default is False.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per recording, in the order they were given, with the keys in result_columns.
+    summary : Dictionary
+        The number of recordings and samples, the total wall time, the
+        throughput in samples per second and the total time of each stage.
+
+    '''
+    if filt is None:
+        filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    recordings = read_manifest(source, pattern)
+    results = [None]*len(recordings)
+    start_time = time.perf_counter()
+
+    def load(index):
+        recording = recordings[index]
+        name = os.path.basename(recording['file'])
+        load_start = time.perf_counter()
+        with p3prof.profile_recording(name):
+            load_function = p3l.load_counts if precision == 'float32' else p3l.load_recording
+            data = load_function(recording['file'], recording['trim'], recording['flip'])
+        row = {'recording': name,
+               'activity': recording['activity'],
+               'n_samples': len(data)}
+        return data, row, load_start
+
+    if n_workers == 1:
+        for index in range(len(recordings)):
+            data, row, load_start = load(index)
+            row['load_time'] = time.perf_counter() - load_start
+            with p3prof.profile_recording(row['recording']):
+                row.update(analyze_recording(data, filt, numtaps, height, dt, fs, precision, quality))
+            results[index] = row
+    else:
+        running = {}
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                next_index = 0
+                while next_index < len(recordings) or running:
+                    # keep two recordings per worker loaded at most
+                    while next_index < len(recordings) and len(running) < 2*n_workers:
+                        data, row, load_start = load(next_index)
+                        shared = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+                        try:
+                            np.ndarray(data.shape, dtype=data.dtype, buffer=shared.buf)[:] = data
+                            row['load_time'] = time.perf_counter() - load_start
+                            future = executor.submit(analyze_shared_recording, shared.name, len(data),
+                                                     filt, numtaps, height, dt, fs,
+                                                     row['recording'], p3prof.is_enabled(), precision, quality)
+                        except BaseException:
+                            shared.close()
+                            shared.unlink()
+                            raise
+                        running[future] = (next_index, row, shared)
+                        next_index += 1
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, row, shared = running.pop(future)
+                        shared.close()
+                        shared.unlink()
+                        result = future.result()
+                        # keep the measurements the worker took when profiling is on
+                        p3prof.add_records(result.pop('profile_records', []))
+                        row.update(result)
+                        results[index] = row
+        finally:
+            # release the shared memory of every recording still in flight
+            for _, _, shared in running.values():
+                shared.close()
+                shared.unlink()
+
+    wall_time = time.perf_counter() - start_time
+    total_samples = sum(row['n_samples'] for row in results)
+    summary = {'n_recordings': len(results),
+               'n_workers': n_workers,
+               'total_samples': total_samples,
+               'wall_time': wall_time,
+               'samples_per_sec': total_samples/wall_time if wall_time > 0 else 0.0}
+    for stage in ['load_time', 'filter_time', 'heartbeat_time', 'ibi_time', 'spectrum_time']:
+        summary[stage] = sum(row[stage] for row in results)
+
+    return results, summary
+
+
+def analyze_streamed_recording(recording, filt, numtaps, height, dt, fs, max_memory):
+    '''
+    The analyze_streamed_recording function runs Project_3_stream.run_pipeline
+    on one recording from read_manifest (in a worker process for
+    run_stream_batch) and returns its row of results.
+    '''
+    start_time = time.perf_counter()
+    summary, _ = p3s.run_pipeline(recording['file'], filt, numtaps, height, dt, fs, max_memory,
+                                  recording['trim'], recording['flip'], keep_beats=False)
+    row = {'recording': os.path.basename(recording['file']), 'activity': recording['activity']}
+    row.update(summary)
+    row['wall_time'] = time.perf_counter() - start_time
+    return row
+
+
+def run_stream_batch(source, filt=None, numtaps=250, height=1.7, dt=0.1, fs=500, n_workers=None, pattern='*.txt',
+                     max_memory=32 << 20):
+    '''
+    The run_stream_batch function does what run_batch does for recordings too
+    long to hold in memory. Each recording is analyzed with
+    Project_3_stream.run_pipeline, which reads it from its cache a chunk at a
+    time, so each worker holds about max_memory bytes whatever the length of
+    the recording. The HRV comes from the RunningHRVSummary of the pipeline
+    (the LF and HF power are from Welch's method, so they are not on the same
+    scale as the rows of run_batch).
+
+    Parameters
+    ----------
+    source : String or list
+        A folder, the path to a .csv or .json manifest, or a list of file names or manifest rows.
+    filt : Array of floats, optional
+        A 1D array of n terms where n represents the values of a bandpass filter.
+        The default is None, which uses the same 0.5-50 Hz hann filter as Project_3_script.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    n_workers : Integer, optional
+        The number of worker processes. The default is None, which uses one per
+        core. With 1 the recordings are analyzed in this process.
+    pattern : String, optional
+        The glob pattern used to find recordings in a folder. The default is '*.txt'.
+    max_memory : Integer, optional
+        The memory ceiling in bytes of the working arrays of each pipeline. The default is 32 MB.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per recording, in the order they were given, with the keys in stream_columns.
+    summary : Dictionary
+        The number of recordings and workers, the total wall time and the
+        total time spent on the recordings.
+
+    '''
+    if filt is None:
+        filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    recordings = read_manifest(source, pattern)
+    start_time = time.perf_counter()
+
+    arguments = (filt, numtaps, height, dt, fs, max_memory)
+    if n_workers == 1:
+        results = [analyze_streamed_recording(recording, *arguments) for recording in recordings]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(analyze_streamed_recording, recording, *arguments)
+                       for recording in recordings]
+            results = [future.result() for future in futures]
+
+    wall_time = time.perf_counter() - start_time
+    summary = {'n_recordings': len(results),
+               'n_workers': n_workers,
+               'wall_time': wall_time,
+               'recording_time': sum(row['wall_time'] for row in results)}
+    return results, summary
+
+
+def write_results(results, file_name, columns=None):
+    '''
+    The write_results function will input the rows returned by run_batch and
+    write them to a .csv file, one row per recording.
+
+    Parameters
+    ----------
+    results : List of dictionaries
+        The rows returned by run_batch.
+    file_name : String
+        The path of the .csv file to write.
+    columns : List of strings, optional
+        The columns to write. The default is None, which uses result_columns
+        (use stream_columns for the rows of run_stream_batch).
+
+    Returns
+    -------
+    None.
+
+    '''
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=result_columns if columns is None else columns,
+                                extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
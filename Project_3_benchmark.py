@@ -0,0 +1,951 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_benchmark.py
+Created on Sat Oct 17 15:40:11 2026
+This module times the stages of the Project 3 ECG analysis so we can see how
+fast they are and whether a change made them slower. On synthetic ECG from
+Project_3_synthetic, with a known heart rate and heart rate variability, it
+times each stage (load, filter_data, get_heartbeats, IBI interpolation and
+get_power_spectrum) for recordings from minutes to 24 hours long, and
+reports the throughput and peak memory of each. The results can be saved as
+a baseline and later runs compared to it to flag regressions.
+
+Run it from the command line with
+    python Project_3_benchmark.py --durations 60 600 3600 --save-baseline
+    python Project_3_benchmark.py --durations 60 600 3600
+    python Project_3_benchmark.py --memory-hours 1 24
+    python Project_3_benchmark.py --detectors
+    python Project_3_benchmark.py --acquisition 4
+    python Project_3_benchmark.py --memo
+    python Project_3_benchmark.py --sweep
+    python Project_3_benchmark.py --precision
+    python Project_3_benchmark.py --cohort 4000
+    python Project_3_benchmark.py --quality
+    python Project_3_benchmark.py --archive 1 24
+--memory-hours measures the peak memory of Project_3_stream.run_pipeline on
+recordings from 1 to 24 hours long, --detectors compares the
+fixed height and adaptive heartbeat detectors, and --acquisition reads that
+many simulated arduinos at once with Project_3_acquisition. --memo shows
+which stages Project_3_memo runs again when only the LF band changes, and
+--sweep times a Project_3_sweep grid against running every point on its own.
+--precision times the float64 filtering against the float32 one of
+Project_3_precision, and --cohort times the Project_3_cohort statistics of
+a made up cohort of that many recordings. --quality adds artifacts to a
+synthetic recording and shows what the Project_3_quality gate removes.
+--archive measures the size of Project_3_archive files and how fast time
+ranges are read from synthetic archives that many hours long.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import Project_3_module as p3m
+import Project_3_loader as p3l
+import Project_3_filters as p3f
+import Project_3_synthetic as p3syn
+
+# file the baseline timings are kept in
+baseline_file = 'benchmark_baseline.json'
+# stages that are timed, in order
+stage_names = ['load', 'filter_data', 'get_heartbeats', 'ibi_interpolation', 'get_power_spectrum']
+
+#%% Timing
+
+def time_stage(function, *args, repeats=1):
+    '''
+    The time_stage function will call a function repeats times and return
+    its last result, the fastest wall time and the peak memory allocated
+    during the first call (measured with tracemalloc).
+    '''
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function(*args)
+    best_time = time.perf_counter() - start_time
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for _ in range(repeats - 1):
+        start_time = time.perf_counter()
+        result = function(*args)
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return result, best_time, peak_memory
+
+
+def benchmark_duration(duration, fs=500, repeats=3, include_load=True, seed=0):
+    '''
+    The benchmark_duration function will make a synthetic recording of the
+    given length and time every stage of the analysis on it.
+
+    Parameters
+    ----------
+    duration : Float
+        The length of the recording in seconds.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    repeats : Integer, optional
+        The number of times each stage is run, the fastest is kept. The default is 3.
+    include_load : Boolean, optional
+        If True a text file is written and the load stage is timed too
+        (the first, uncached load). The default is True.
+    seed : Integer, optional
+        The seed of the synthetic recording. The default is 0.
+
+    Returns
+    -------
+    results : Dictionary
+        For each stage, its time in seconds, throughput in samples per second
+        and peak memory in bytes.
+
+    '''
+    ecg_data, _ = p3syn.generate_synthetic_ecg(duration, fs, seed=seed)
+    n_samples = len(ecg_data)
+    filt = p3f.get_filter(250, (.5, 50), 'hann', fs)
+    time_array = np.arange(0, n_samples/fs, 1/fs)
+    timings = {}
+
+    if include_load:
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'synthetic_meg.txt')
+            p3syn.write_adc_file(ecg_data, file_name)
+            cache_dir = os.path.join(folder, 'cache')
+            # time the first load, which parses the text and builds the cache
+            _, stage_time, memory = time_stage(p3l.load_recording, file_name, 0, False, cache_dir)
+            timings['load'] = (stage_time, memory)
+
+    filtered_data, stage_time, memory = time_stage(p3m.apply_filter, ecg_data, filt, repeats=repeats)
+    timings['filter_data'] = (stage_time, memory)
+    time_of_heartbeat, stage_time, memory = time_stage(p3m.get_heartbeats, filtered_data, 250, time_array,
+                                                       repeats=repeats)
+    timings['get_heartbeats'] = (stage_time, memory)
+    (regular_time, interpolated_ibi), stage_time, memory = time_stage(p3m.interpolate_ibi, time_of_heartbeat,
+                                                                      repeats=repeats)
+    timings['ibi_interpolation'] = (stage_time, memory)
+    _, stage_time, memory = time_stage(p3m.calculate_power_spectrum, interpolated_ibi, regular_time[-1],
+                                       repeats=repeats)
+    timings['get_power_spectrum'] = (stage_time, memory)
+
+    results = {}
+    for stage, (stage_time, memory) in timings.items():
+        results[stage] = {'time': stage_time,
+                          'samples_per_sec': n_samples/stage_time if stage_time > 0 else float('inf'),
+                          'peak_memory': memory}
+    return results
+
+
+def time_import(module_name='Project_3_module'):
+    '''
+    The time_import function will import a module in a new python process and
+    return how long the import took and whether it loaded matplotlib. The
+    compute functions should never need matplotlib to be imported.
+
+    Parameters
+    ----------
+    module_name : String, optional
+        The module to import. The default is 'Project_3_module'.
+
+    Returns
+    -------
+    import_time : Float
+        The time the import took in seconds.
+    loaded_matplotlib : Boolean
+        True if importing the module also imported matplotlib.
+
+    '''
+    code = ('import sys, time; start = time.perf_counter(); '
+            f'import {module_name}; '
+            'print(time.perf_counter() - start, "matplotlib" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    return float(output[0]), output[1] == 'True'
+
+
+def run_benchmarks(durations=(60, 600, 3600), repeats=3, include_load=True):
+    '''
+    The run_benchmarks function will time every stage for each recording length.
+
+    Parameters
+    ----------
+    durations : List of floats, optional
+        The lengths of the recordings in seconds. The default is (60, 600, 3600).
+        Use 86400 for a 24 hour recording.
+    repeats : Integer, optional
+        The number of times each stage is run, the fastest is kept. The default is 3.
+    include_load : Boolean, optional
+        If True the load stage is timed too. The default is True.
+
+    Returns
+    -------
+    results : Dictionary
+        The results of benchmark_duration for each length, keyed by the length
+        in seconds as a string, and the import time of Project_3_module under 'import'.
+
+    '''
+    results = {}
+    import_time, loaded_matplotlib = time_import()
+    results['import'] = {'time': import_time, 'loaded_matplotlib': loaded_matplotlib}
+    for duration in durations:
+        results[f'{duration:g}'] = benchmark_duration(duration, repeats=repeats, include_load=include_load)
+    return results
+
+#%% Memory-bounded pipeline
+
+def measure_pipeline_memory(hours=(1, 24), max_memory=32 << 20, seed=0):
+    '''
+    The measure_pipeline_memory function will measure the memory used by
+    Project_3_stream.run_pipeline for recordings of several lengths. For each
+    length a synthetic recording is written and the whole pipeline (building
+    the cache, filtering, heartbeat detection and HRV) is run on it in a new
+    python process, which reports its peak resident memory (or the peak
+    traced by tracemalloc where the resource module is missing, like on
+    Windows).
+
+    Parameters
+    ----------
+    hours : List of integers, optional
+        The lengths of the recordings in hours. The default is (1, 24).
+    max_memory : Integer, optional
+        The memory ceiling in bytes passed to run_pipeline. The default is 32 MB.
+    seed : Integer, optional
+        The seed of the random number generator. The default is 0.
+
+    Returns
+    -------
+    results : Dictionary
+        The number of beats, run time, peak memory in bytes and how it was
+        measured for each length, keyed by the length in hours as a string.
+
+    '''
+    # the peak resident memory where the resource module has it, otherwise the
+    # peak traced by tracemalloc (tracemalloc adds memory of its own, so not both)
+    code = ('import json, sys, time\n'
+            'try:\n'
+            '    import resource\n'
+            'except ImportError:\n'
+            '    resource = None\n'
+            '    import tracemalloc; tracemalloc.start()\n'
+            'import Project_3_stream as p3s\n'
+            'start = time.perf_counter()\n'
+            'summary, _ = p3s.run_pipeline(sys.argv[1], max_memory=int(sys.argv[2]), cache_dir=sys.argv[3])\n'
+            'run_time = time.perf_counter() - start\n'
+            'if resource is None:\n'
+            '    peak_memory, measure = tracemalloc.get_traced_memory()[1], "tracemalloc"\n'
+            'else:\n'
+            '    peak_memory, measure = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024, "rss"\n'
+            'print(json.dumps({"n_beats": summary["n_beats"], "time": run_time, '
+            '"peak_memory": peak_memory, "measure": measure}))')
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for n_hours in hours:
+            file_name = os.path.join(temp_dir, f'synthetic_{n_hours:g}h.txt')
+            p3syn.write_long_recording(file_name, n_hours, seed)
+            output = subprocess.run([sys.executable, '-c', code, file_name, str(max_memory),
+                                     os.path.join(temp_dir, 'cache')],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            results[f'{n_hours:g}'] = json.loads(output)
+            os.remove(file_name)
+    return results
+
+
+def print_memory_results(results):
+    '''
+    The print_memory_results function will print a table of the results of measure_pipeline_memory.
+    '''
+    print(f"{'hours':>6} {'beats':>8} {'time (s)':>10} {'peak MB':>9} {'measure':>12}")
+    for n_hours, values in results.items():
+        print(f"{n_hours:>6} {values['n_beats']:>8} {values['time']:>10.2f} "
+              f"{values['peak_memory']/1e6:>9.1f} {values['measure']:>12}")
+
+#%% Heartbeat detectors
+
+def compare_detectors(fs=500, numtaps=250, height=1.7, tolerance=.05, gains=(.3, 1, 3), repeats=3, seed=0):
+    '''
+    The compare_detectors function will compare the fixed height detector
+    (find_heartbeat_indices, which needs the data filtered first) with the
+    adaptive detector (find_heartbeat_indices_adaptive, which works on the raw
+    data in one pass) for speed and accuracy. On synthetic recordings the R
+    peaks are known, so the accuracy of both is measured at several gains. The
+    bundled recordings have no labels, so there the adaptive beats are
+    compared to the fixed height beats of the filtered data, which is what
+    Project_3_script uses. Those are kept numtaps samples apart, so above
+    120 bpm (parts of the physical recording) they miss beats the adaptive
+    detector finds.
+
+    Parameters
+    ----------
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    numtaps : Integer, optional
+        The length of the 0.5-50 Hz filter and the distance used by find_peaks. The default is 250.
+    height : Float, optional
+        The height used by the fixed height detector. The default is 1.7.
+    tolerance : Float, optional
+        The most time in seconds between two beats for them to be the same beat. The default is .05.
+    gains : List of floats, optional
+        The gains the synthetic recording is scaled by. The default is (.3, 1, 3).
+    repeats : Integer, optional
+        The number of times each detector is run, the fastest is kept. The default is 3.
+    seed : Integer, optional
+        The seed of the synthetic recording. The default is 0.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per recording and detector with the number of beats, the
+        time in seconds (including filtering for the fixed height detector),
+        the sensitivity and the positive predictivity.
+
+    '''
+    filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    tolerance_samples = int(round(tolerance*fs))
+
+    def fixed_detector(data):
+        return p3m.find_heartbeat_indices(p3m.apply_filter(data, filt), numtaps, height)
+
+    def adaptive_detector(data):
+        return p3m.find_heartbeat_indices_adaptive(data, fs)
+
+    # synthetic recordings, where the true beats are known
+    recordings = []
+    ecg_data, time_of_heartbeat = p3syn.generate_synthetic_ecg(600, fs, seed=seed)
+    true_indices = np.round(time_of_heartbeat*fs).astype(int)
+    for gain in gains:
+        # scale around the baseline so only the size of the beats changes
+        recordings.append((f'synthetic x{gain:g}', 1.65 + gain*(ecg_data - 1.65), true_indices))
+
+    # bundled recordings, compared to the fixed height beats of the filtered data
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for file_name, trim, flip in p3l.bundled_recordings:
+        data = np.asarray(p3l.load_recording(os.path.join(folder, file_name), trim, flip))
+        recordings.append((file_name, data, fixed_detector(data)))
+
+    results = []
+    for name, data, reference_indices in recordings:
+        for detector_name, detector in [('fixed', fixed_detector), ('adaptive', adaptive_detector)]:
+            detected_indices, detector_time, _ = time_stage(detector, data, repeats=repeats)
+            sensitivity, positive_predictivity = p3m.match_beats(reference_indices, detected_indices,
+                                                             tolerance_samples)
+            results.append({'recording': name,
+                            'detector': detector_name,
+                            'n_beats': len(detected_indices),
+                            'time': detector_time,
+                            'sensitivity': sensitivity,
+                            'positive_predictivity': positive_predictivity})
+    return results
+
+
+def print_detector_results(results):
+    '''
+    The print_detector_results function will print a table of the results of compare_detectors.
+    '''
+    print(f"{'recording':>28} {'detector':>9} {'beats':>6} {'time (s)':>9} {'Se':>6} {'+P':>6}")
+    for row in results:
+        print(f"{row['recording']:>28} {row['detector']:>9} {row['n_beats']:>6} {row['time']:>9.4f} "
+              f"{row['sensitivity']:>6.3f} {row['positive_predictivity']:>6.3f}")
+
+#%% Live acquisition
+
+def measure_acquisition(n_devices=4, duration=60, speed=10, buffer_time=2.0, fs=500, numtaps=250, seed=0):
+    '''
+    The measure_acquisition function will serve synthetic recordings from
+    several SimulatedArduino devices at once, read them all with
+    Project_3_acquisition.acquire_simulated, and report how long samples
+    waited in the ring buffers (test_Project_3_acquisition checks the beats).
+
+    Parameters
+    ----------
+    n_devices : Integer, optional
+        The number of devices streamed at the same time. The default is 4.
+    duration : Float, optional
+        The length of each recording in seconds. The default is 60.
+    speed : Float, optional
+        How many times faster than real time the devices send. The default is 10.
+    buffer_time : Float, optional
+        The length of each ring buffer in seconds of data. The default is 2.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    numtaps : Integer, optional
+        The length of the 0.5-50 Hz filter. The default is 250.
+    seed : Integer, optional
+        The seed of the first synthetic recording, the others use the next seeds. The default is 0.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per device with the number of beats, the mean and max wait
+        in seconds, the most samples buffered, the number of times the reader
+        waited for room, and the wall time of the whole run.
+
+    '''
+    import asyncio
+    import Project_3_acquisition as p3a
+
+    filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    recordings = {}
+    for device in range(n_devices):
+        ecg_data, _ = p3syn.generate_synthetic_ecg(duration, fs, heart_rate=60 + 5*device, seed=seed + device)
+        # the devices send whole ADC counts
+        counts = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, 1023)
+        recordings[f'device {device}'] = counts*p3l.volts_per_count
+
+    start_time = time.perf_counter()
+    reports = asyncio.run(p3a.acquire_simulated(recordings, speed, filt=filt, numtaps=numtaps,
+                                                fs=fs, buffer_time=buffer_time))
+    wall_time = time.perf_counter() - start_time
+
+    results = []
+    for name, report in reports.items():
+        results.append({'device': name,
+                        'n_beats': len(report['time_of_heartbeat']),
+                        'mean_wait': report['mean_wait'],
+                        'max_wait': report['max_wait'],
+                        'max_buffered': report['max_buffered'],
+                        'full_waits': report['full_waits'],
+                        'wall_time': wall_time})
+    return results
+
+
+def print_acquisition_results(results, buffer_time=2.0):
+    '''
+    The print_acquisition_results function will print a table of the results of measure_acquisition.
+    '''
+    print(f"{'device':>10} {'beats':>6} {'mean wait (ms)':>15} {'max wait (ms)':>14} "
+          f"{'max buffered':>13} {'full waits':>11}")
+    for row in results:
+        print(f"{row['device']:>10} {row['n_beats']:>6} {row['mean_wait']*1000:>15.2f} "
+              f"{row['max_wait']*1000:>14.2f} {row['max_buffered']:>13} {row['full_waits']:>11}")
+    if results:
+        print(f"all devices read in {results[0]['wall_time']:.2f} s with {buffer_time:g} s ring buffers")
+
+#%% Stage memoization
+
+def measure_memoization(fs=500, numtaps=250, dt=0.1, lf_band=(.05, .15)):
+    '''
+    The measure_memoization function will run the analysis of the bundled
+    recordings (filter, heartbeats, IBI interpolation and power spectrum)
+    once with Project_3_memo turned off, and three times with it turned on
+    in a new cache folder: once with nothing saved, once with the same
+    settings, and once with other LF band edges. The last run should only
+    calculate the power spectrum again.
+
+    Parameters
+    ----------
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    numtaps : Integer, optional
+        The length of the 0.5-50 Hz filter. The default is 250.
+    dt : Float, optional
+        The time step of the interpolated IBI data. The default is 0.1.
+    lf_band : Tuple of floats, optional
+        The LF band edges used in the last run. The default is (.05, .15).
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per run with its name, time in seconds and the hits and
+        misses of each stage, and a row for the same analysis with
+        memoization off.
+
+    '''
+    import Project_3_memo as p3memo
+    import Project_3_spectral as p3sp
+
+    filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    folder = os.path.dirname(os.path.abspath(__file__))
+
+    def analyze(band):
+        start_time = time.perf_counter()
+        # loaded in each run, so with memoization on the recordings are keyed on their files
+        for file_name, trim, flip in p3l.bundled_recordings:
+            data = p3l.load_recording(os.path.join(folder, file_name), trim, flip)
+            time_of_heartbeat = p3m.find_heartbeat_indices(p3m.apply_filter(data, filt), numtaps)*(1/fs)
+            regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat, dt)
+            p3m.calculate_power_spectrum(interpolated_ibi, regular_time[-1], dt, band)
+        return time.perf_counter() - start_time
+
+    results = [{'run': 'memoization off', 'time': analyze(p3sp.lf_band), 'stats': {}}]
+    cache_dir = tempfile.mkdtemp(prefix='p3_memo_')
+    try:
+        p3memo.enable_memoization(cache_dir)
+        for run, band in [('cold', p3sp.lf_band), ('same settings', p3sp.lf_band), ('new LF band', lf_band)]:
+            p3memo.reset_stats()
+            run_time = analyze(band)
+            results.append({'run': run, 'time': run_time, 'stats': p3memo.get_stats()})
+    finally:
+        p3memo.disable_memoization()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def print_memoization_results(results):
+    '''
+    The print_memoization_results function will print the results of measure_memoization.
+    '''
+    for row in results:
+        stages = ', '.join(f"{stage} {counts['hits']}/{counts['misses']}" for stage, counts in row['stats'].items())
+        print(f"{row['run']:>15}: {row['time']:.4f} s, hits/misses: {stages}")
+
+#%% Parameter sweeps
+
+def measure_sweep(n_workers=None):
+    '''
+    The measure_sweep function will time a Project_3_sweep grid of 48 points
+    over the bundled recordings, against running the whole analysis once for
+    every point and recording, the way editing Project_3_script would.
+
+    Parameters
+    ----------
+    n_workers : Integer, optional
+        The number of worker processes of the sweep. The default is None, which uses one per core.
+
+    Returns
+    -------
+    results : Dictionary
+        The sweep results and summary, and the time of the point by point runs
+        (test_Project_3_sweep checks that both give the same metrics).
+
+    '''
+    import Project_3_sweep as p3sw
+
+    points = p3sw.make_grid({'numtaps': [200, 250], 'fc2': [40, 50], 'window': ['hann', 'hamming'],
+                             'height': [1.6, 1.7, 1.8], 'dt': [.1, .05]})
+    data = p3sw.load_recordings()
+    sweep_results, summary = p3sw.run_sweep(points, data, n_workers=n_workers)
+
+    # every point on its own, filtering and detecting again each time
+    reference_indices = p3sw.get_reference_indices(data)
+    # the same .05 s tolerance run_sweep uses, in samples at 500 Hz
+    tolerance_samples = 25
+    start_time = time.perf_counter()
+    for point in points:
+        filt = p3f.get_filter(point['numtaps'], [point['fc1'], point['fc2']], point['window'])
+        for name, recording in data.items():
+            detections = [(point['numtaps'], point['height'], [point['dt']])]
+            p3sw.evaluate_filter(recording, filt, detections, reference_indices[name], tolerance_samples)
+    point_time = time.perf_counter() - start_time
+    return {'results': sweep_results, 'summary': summary, 'point_time': point_time}
+
+
+def print_sweep_results(results):
+    '''
+    The print_sweep_results function will print the results of measure_sweep.
+    '''
+    import Project_3_sweep as p3sw
+
+    summary = results['summary']
+    p3sw.print_sweep(results['results'], 5)
+    print(f"{summary['n_points']} points x {summary['n_recordings']} recordings: "
+          f"{summary['n_filters']} filter runs and {summary['n_detections']} detections "
+          f"in {summary['wall_time']:.2f} s with {summary['n_workers']} worker(s), "
+          f"{results['point_time']:.2f} s point by point")
+
+#%% Precision
+
+def measure_precision(durations=(600, 3600), fs=500, numtaps=250, repeats=3, seed=0):
+    '''
+    The measure_precision function will compare the time and peak memory of
+    filtering with the float64 Project_3_module.apply_filter and with the
+    int16/float32 Project_3_precision.apply_filter_counts on synthetic
+    recordings (test_Project_3_precision checks their error bounds).
+
+    Parameters
+    ----------
+    durations : List of floats, optional
+        The lengths of the synthetic recordings in seconds. The default is (600, 3600).
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    numtaps : Integer, optional
+        The length of the 0.5-50 Hz filter. The default is 250.
+    repeats : Integer, optional
+        The number of times each filter is run, the fastest is kept. The default is 3.
+    seed : Integer, optional
+        The seed of the synthetic recordings. The default is 0.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per duration.
+
+    '''
+    import Project_3_precision as p3prec
+
+    filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    results = []
+    for duration in durations:
+        ecg_data, _ = p3syn.generate_synthetic_ecg(duration, fs, seed=seed)
+        counts = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, 1023).astype(np.int16)
+        volts = counts*p3l.volts_per_count
+
+        _, time_64, memory_64 = time_stage(p3m.apply_filter, volts, filt, repeats=repeats)
+        _, time_32, memory_32 = time_stage(p3prec.apply_filter_counts, counts, filt, repeats=repeats)
+        results.append({'duration': duration,
+                        'time_64': time_64, 'time_32': time_32,
+                        # the recording as the analysis holds it, plus the filtering
+                        'memory_64': volts.nbytes + memory_64,
+                        'memory_32': counts.nbytes + memory_32})
+    return results
+
+
+def print_precision_results(results):
+    '''
+    The print_precision_results function will print a table of the results of measure_precision.
+    '''
+    print(f"{'duration':>9} {'f64 (s)':>8} {'f32 (s)':>8} {'f64 MB':>7} {'f32 MB':>7}")
+    for row in results:
+        print(f"{row['duration']:>9g} {row['time_64']:>8.4f} {row['time_32']:>8.4f} "
+              f"{row['memory_64']/1e6:>7.1f} {row['memory_32']/1e6:>7.1f}")
+
+#%% Cohort statistics
+
+def measure_cohort(n_recordings=4000, n_resamples=10000, seed=0):
+    '''
+    The measure_cohort function will time the Project_3_cohort comparison of
+    a made up cohort from Project_3_synthetic.make_cohort_results, where only
+    the LF/HF ratio (and so LF) differs between activities, except between
+    resting and relaxing.
+
+    Returns
+    -------
+    results : Dictionary
+        The summary, intervals and comparisons and the time of each in seconds.
+
+    '''
+    import Project_3_cohort as p3c
+
+    results = p3syn.make_cohort_results(n_recordings, seed)
+    start_time = time.perf_counter()
+    summary = p3c.summarize_groups(results)
+    summary_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    intervals, comparisons = p3c.compare_activities(results, n_resamples=n_resamples, seed=seed)
+    compare_time = time.perf_counter() - start_time
+    return {'summary': summary, 'intervals': intervals, 'comparisons': comparisons,
+            'summary_time': summary_time, 'compare_time': compare_time}
+
+
+def print_cohort_results(results, n_recordings):
+    '''
+    The print_cohort_results function will print the results of measure_cohort.
+    '''
+    import Project_3_cohort as p3c
+
+    p3c.print_comparisons([row for row in results['intervals'] if row['metric'] == 'lf_hf_ratio'],
+                          [row for row in results['comparisons'] if row['metric'] in ('sdrr', 'lf_hf_ratio')])
+    print(f"{n_recordings} recordings: summary in {results['summary_time']:.3f} s, bootstrap intervals and "
+          f"permutation tests in {results['compare_time']:.2f} s")
+
+#%% Signal quality
+
+def measure_quality(duration=600, fs=500, numtaps=250, seed=0):
+    '''
+    The measure_quality function will run Project_3_batch.analyze_recording
+    on a synthetic recording, and on the same recording with
+    Project_3_synthetic.add_artifacts with and without the Project_3_quality
+    gate, and time the quality check.
+
+    Returns
+    -------
+    results : Dictionary
+        The result of each run ('clean', 'artifacts', 'gated'), the time
+        of the quality check and its throughput in samples per second.
+
+    '''
+    import Project_3_batch as p3b
+    import Project_3_quality as p3q
+
+    filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    ecg_data, _ = p3syn.generate_synthetic_ecg(duration, fs, seed=seed)
+    noisy_data, _ = p3syn.add_artifacts(ecg_data, fs, seed)
+
+    _, quality_time, _ = time_stage(p3q.get_signal_quality, noisy_data, fs, repeats=3)
+
+    return {'clean': p3b.analyze_recording(ecg_data, filt, numtaps, fs=fs),
+            'artifacts': p3b.analyze_recording(noisy_data, filt, numtaps, fs=fs),
+            'gated': p3b.analyze_recording(noisy_data, filt, numtaps, fs=fs, quality=True),
+            'quality_time': quality_time,
+            'samples_per_sec': len(noisy_data)/quality_time}
+
+
+def print_quality_results(results):
+    '''
+    The print_quality_results function will print the results of measure_quality.
+    '''
+    print(f"{'run':>10} {'beats':>6} {'SDRR (s)':>9} {'LF/HF':>7}")
+    for run in ['clean', 'artifacts', 'gated']:
+        row = results[run]
+        print(f"{run:>10} {row['n_beats']:>6} {row['sdrr']:>9.4f} {row['lf_hf_ratio']:>7.3f}")
+    gated = results['gated']
+    print(f"good fraction {gated['good_fraction']:.3f}, {gated['n_bad_segments']} bad segments, "
+          f"{gated['n_excluded_ibi']} intervals left out")
+    print(f"quality check {results['quality_time']*1e3:.1f} ms ({results['samples_per_sec']/1e6:.0f}M samples/s)")
+
+#%% Compressed archives
+
+def measure_archive(hours=(1, 24), n_reads=200, read_time=10, fs=500, seed=0):
+    '''
+    The measure_archive function will measure the Project_3_archive format:
+    its size against the text, float64 cache and int16 counts of the bundled
+    recordings and of synthetic recordings of each length in hours, the time
+    to write and fully decode each synthetic archive, and the latency of
+    reading n_reads random read_time second ranges from it, both with the
+    archive already open and when it is opened for each read.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row for the bundled recordings together and one per length in hours.
+
+    '''
+    import Project_3_archive as p3a
+
+    rng = np.random.default_rng(seed)
+    results = []
+    temp_dir = tempfile.mkdtemp(prefix='p3_archive_')
+    try:
+        # the bundled recordings, whole
+        row = {'name': 'bundled', 'n_samples': 0, 'text_bytes': 0, 'archive_bytes': 0}
+        for file_name, _, _ in p3l.bundled_recordings:
+            counts = np.asarray(p3l.load_counts(file_name, 0, False))
+            archive_name = os.path.join(temp_dir, os.path.basename(file_name) + p3l.archive_extension)
+            p3a.write_archive(counts, archive_name, fs)
+            row['n_samples'] += len(counts)
+            row['text_bytes'] += os.path.getsize(file_name)
+            row['archive_bytes'] += os.path.getsize(archive_name)
+        results.append(row)
+
+        for hour in hours:
+            ecg_data, _ = p3syn.generate_synthetic_ecg(hour*3600, fs, seed=seed)
+            counts = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, p3l.max_count).astype(np.int16)
+            del ecg_data
+            text_name = os.path.join(temp_dir, 'synthetic.txt')
+            np.savetxt(text_name, counts, fmt='%d')
+            archive_name = os.path.join(temp_dir, 'synthetic.p3a')
+            row = {'name': f'{hour:g} h synthetic', 'n_samples': len(counts),
+                   'text_bytes': os.path.getsize(text_name)}
+            os.remove(text_name)
+
+            start_time = time.perf_counter()
+            row['archive_bytes'] = p3a.write_archive(counts, archive_name, fs)
+            row['write_time'] = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            p3a.load_archive(archive_name, counts=True)
+            row['decode_time'] = time.perf_counter() - start_time
+
+            # random ranges, with the archive open and opened for each read
+            read_samples = int(read_time*fs)
+            starts = rng.integers(0, len(counts) - read_samples, n_reads)
+            latencies = []
+            with p3a.ArchiveReader(archive_name) as reader:
+                for start in starts:
+                    start_time = time.perf_counter()
+                    reader.read(start, start + read_samples)
+                    latencies.append(time.perf_counter() - start_time)
+            open_latencies = []
+            for start in starts[:n_reads//4]:
+                start_time = time.perf_counter()
+                with p3a.ArchiveReader(archive_name) as reader:
+                    reader.read(start, start + read_samples)
+                open_latencies.append(time.perf_counter() - start_time)
+            row['read_median'] = float(np.median(latencies))
+            row['read_p99'] = float(np.percentile(latencies, 99))
+            row['open_read_median'] = float(np.median(open_latencies))
+            results.append(row)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    for row in results:
+        row['bits_per_sample'] = 8*row['archive_bytes']/row['n_samples']
+        # the float64 cache of load_recording and the int16 counts of load_counts
+        row['cache_bytes'] = 8*row['n_samples']
+        row['counts_bytes'] = 2*row['n_samples']
+    return results
+
+
+def print_archive_results(results, read_time=10):
+    '''
+    The print_archive_results function will print tables of the results of measure_archive.
+    '''
+    print(f"{'recordings':>16} {'samples':>10} {'text MB':>8} {'float64 MB':>10} {'int16 MB':>8} "
+          f"{'archive MB':>10} {'bits/sample':>11} {'vs text':>7}")
+    for row in results:
+        print(f"{row['name']:>16} {row['n_samples']:>10} {row['text_bytes']/1e6:>8.2f} {row['cache_bytes']/1e6:>10.2f} "
+              f"{row['counts_bytes']/1e6:>8.2f} {row['archive_bytes']/1e6:>10.3f} {row['bits_per_sample']:>11.2f} "
+              f"{row['text_bytes']/row['archive_bytes']:>6.1f}x")
+    print(f"\n{'recordings':>16} {'write (s)':>9} {'decode (s)':>10} "
+          f"{f'{read_time:g} s read (ms)':>16} {'p99 (ms)':>8} {'open+read (ms)':>14}")
+    for row in results[1:]:
+        print(f"{row['name']:>16} {row['write_time']:>9.2f} {row['decode_time']:>10.3f} "
+              f"{row['read_median']*1e3:>16.3f} {row['read_p99']*1e3:>8.3f} "
+              f"{row['open_read_median']*1e3:>14.3f}")
+
+#%% Baselines
+
+def save_baseline(results, file_name=baseline_file):
+    '''
+    The save_baseline function will save benchmark results as the baseline to compare later runs to.
+    '''
+    with open(file_name, 'w') as file:
+        json.dump(results, file, indent=2)
+
+
+def compare_to_baseline(results, file_name=baseline_file, tolerance=.25, min_time=.005):
+    '''
+    The compare_to_baseline function will compare benchmark results to the
+    saved baseline and return every stage that got slower by more than the
+    tolerance. Stages or lengths that are not in the baseline are skipped, and
+    so are stages faster than min_time, where timer noise is larger than any change.
+
+    Parameters
+    ----------
+    results : Dictionary
+        The results of run_benchmarks.
+    file_name : String, optional
+        The baseline file. The default is 'benchmark_baseline.json'.
+    tolerance : Float, optional
+        How much slower a stage can be before it counts as a regression, as a
+        fraction of the baseline time. The default is .25.
+    min_time : Float, optional
+        Stages that took less than this many seconds in both runs are not
+        compared. The default is .005.
+
+    Returns
+    -------
+    regressions : List of dictionaries
+        One entry per slower stage with its length, stage, baseline time, new time and ratio.
+
+    '''
+    with open(file_name, 'r') as file:
+        baseline = json.load(file)
+
+    regressions = []
+    for duration, stages in results.items():
+        if duration not in baseline:
+            continue
+        if duration == 'import':
+            stages, baseline_stages = {'import': stages}, {'import': baseline[duration]}
+        else:
+            baseline_stages = baseline[duration]
+        for stage, values in stages.items():
+            if stage not in baseline_stages:
+                continue
+            if max(values['time'], baseline_stages[stage]['time']) < min_time:
+                continue
+            ratio = values['time']/baseline_stages[stage]['time']
+            if ratio > 1 + tolerance:
+                regressions.append({'duration': duration,
+                                    'stage': stage,
+                                    'baseline_time': baseline_stages[stage]['time'],
+                                    'time': values['time'],
+                                    'ratio': ratio})
+    return regressions
+
+
+def print_results(results):
+    '''
+    The print_results function will print a table of benchmark results.
+    '''
+    import_results = results.get('import')
+    if import_results is not None:
+        print(f"import Project_3_module: {import_results['time']:.3f} s, "
+              f"matplotlib loaded: {import_results['loaded_matplotlib']}")
+    print(f"{'duration (s)':>12} {'stage':>20} {'time (s)':>10} {'samples/s':>12} {'peak MB':>9}")
+    for duration, stages in results.items():
+        if duration == 'import':
+            continue
+        for stage in stage_names:
+            if stage in stages:
+                values = stages[stage]
+                print(f"{duration:>12} {stage:>20} {values['time']:>10.4f} "
+                      f"{values['samples_per_sec']:>12.3g} {values['peak_memory']/1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the stages of the Project 3 ECG analysis.')
+    parser.add_argument('--durations', type=float, nargs='+', default=[60, 600, 3600],
+                        help='lengths of the synthetic recordings in seconds (86400 is 24 hours)')
+    parser.add_argument('--repeats', type=int, default=3, help='number of times each stage is run')
+    parser.add_argument('--no-load', action='store_true', help='skip timing the load stage')
+    parser.add_argument('--baseline', default=baseline_file, help='baseline file to compare to or save')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=.25, help='allowed slowdown before a regression')
+    parser.add_argument('--memory-hours', type=float, nargs='+',
+                        help='only measure the pipeline memory for recordings this many hours long')
+    parser.add_argument('--max-memory', type=int, default=32 << 20, help='memory ceiling of the pipeline in bytes')
+    parser.add_argument('--detectors', action='store_true',
+                        help='only compare the fixed height and adaptive heartbeat detectors')
+    parser.add_argument('--acquisition', type=int, metavar='N_DEVICES',
+                        help='only time reading this many simulated arduinos at once')
+    parser.add_argument('--speed', type=float, default=10,
+                        help='how many times faster than real time the simulated arduinos send')
+    parser.add_argument('--memo', action='store_true',
+                        help='only show which stages are run again when the LF band changes')
+    parser.add_argument('--sweep', action='store_true',
+                        help='only time a parameter sweep against running every point on its own')
+    parser.add_argument('--precision', action='store_true',
+                        help='only time the float64 and float32 filtering (uses --durations)')
+    parser.add_argument('--cohort', type=int, metavar='N_RECORDINGS',
+                        help='only time the cohort statistics of this many made up recordings')
+    parser.add_argument('--quality', action='store_true',
+                        help='only check the signal quality gate on a synthetic recording with artifacts')
+    parser.add_argument('--archive', type=float, nargs='+', metavar='HOURS',
+                        help='only measure the compressed archives, with synthetic recordings this many hours long')
+    arguments = parser.parse_args()
+
+    if arguments.archive:
+        print_archive_results(measure_archive(arguments.archive))
+        sys.exit(0)
+
+    if arguments.quality:
+        print_quality_results(measure_quality())
+        sys.exit(0)
+
+    if arguments.cohort:
+        print_cohort_results(measure_cohort(arguments.cohort), arguments.cohort)
+        sys.exit(0)
+
+    if arguments.precision:
+        print_precision_results(measure_precision(arguments.durations, repeats=arguments.repeats))
+        sys.exit(0)
+
+    if arguments.sweep:
+        print_sweep_results(measure_sweep())
+        sys.exit(0)
+
+    if arguments.memo:
+        print_memoization_results(measure_memoization())
+        sys.exit(0)
+
+    if arguments.acquisition:
+        print_acquisition_results(measure_acquisition(arguments.acquisition, speed=arguments.speed))
+        sys.exit(0)
+
+    if arguments.detectors:
+        print_detector_results(compare_detectors(repeats=arguments.repeats))
+        sys.exit(0)
+
+    if arguments.memory_hours:
+        print_memory_results(measure_pipeline_memory(arguments.memory_hours, arguments.max_memory))
+        sys.exit(0)
+
+    benchmark_results = run_benchmarks(arguments.durations, arguments.repeats, not arguments.no_load)
+    print_results(benchmark_results)
+
+    if arguments.save_baseline:
+        save_baseline(benchmark_results, arguments.baseline)
+        print(f'saved baseline to {arguments.baseline}')
+    elif os.path.exists(arguments.baseline):
+        found_regressions = compare_to_baseline(benchmark_results, arguments.baseline, arguments.tolerance)
+        for regression in found_regressions:
+            print(f"REGRESSION {regression['duration']} s {regression['stage']}: "
+                  f"{regression['baseline_time']:.4f} s -> {regression['time']:.4f} s "
+                  f"({regression['ratio']:.2f}x)")
+        sys.exit(1 if found_regressions else 0)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_cli.py
+Created on Sun Oct 18 00:36:14 2026
+This module is the command line tool of the Project 3 ECG analysis. It runs
+the analysis of Project_3_script with Project_3_batch, but the recordings, their trims and
+flips, and every parameter come from the command line, so it can be run on
+new data without editing anything. The recordings can be files, globs,
+folders or .csv/.json manifests (see Project_3_batch.read_manifest), and
+p3_recordings.csv holds the bundled recordings with the trims the script uses.
+Compressed .p3a archives (Project_3_archive) can be given like text recordings.
+The results are written as .csv and .json files along with a timing summary,
+and the summary figures are saved unless --no-plots is given.
+
+Run it from the command line with
+    python Project_3_cli.py p3_recordings.csv
+    python Project_3_cli.py "recordings/*.txt" --jobs 8 --no-plots --format json
+    python Project_3_cli.py long_recordings/ --stream --max-memory 64000000
+    python Project_3_cli.py p3_recordings.csv --quality --precision float32
+By default every recording is loaded whole and analyzed with
+Project_3_batch.run_batch, one worker process per core (--jobs sets the
+number). --stream analyzes each recording a chunk at a time with
+Project_3_stream.run_pipeline, for recordings too long to hold in memory.
+The exit status is 0 when every recording was analyzed, 1 when no
+recordings were found and 2 for bad arguments, so it can be scheduled in batch jobs.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import Project_3_batch as p3b
+import Project_3_filters as p3f
+import Project_3_memo as p3memo
+import Project_3_profiling as p3prof
+
+# extensions of the manifests read_manifest can read
+manifest_extensions = ('.csv', '.json')
+# stages of run_batch whose total time goes in the timing summary
+stage_times = ['load_time', 'filter_time', 'heartbeat_time', 'ibi_time', 'spectrum_time']
+
+#%% Find recordings
+
+def find_recordings(inputs, pattern='*.txt', trim=None, flip=False):
+    '''
+    The find_recordings function will input the recordings given on the
+    command line and return the list of recordings to analyze, in the order
+    given. Each input can be a manifest, a folder (searched for pattern), a
+    glob or a file name. The trim and flip are used for the recordings that
+    are not in a manifest.
+
+    Parameters
+    ----------
+    inputs : List of strings
+        The files, globs, folders and manifests given on the command line.
+    pattern : String, optional
+        The glob pattern used to find recordings in a folder. The default is '*.txt'.
+    trim : Integer, optional
+        The number of samples to cut off the end of each recording. The default is None, which is 0.
+    flip : Boolean, optional
+        If True each recording is reversed after it is trimmed. The default is False.
+
+    Returns
+    -------
+    recordings : List of dictionaries
+        One dictionary per recording with the keys 'file', 'trim', 'flip' and 'activity'.
+
+    '''
+    recordings = []
+    for source in inputs:
+        if os.path.isfile(source) and source.endswith(manifest_extensions):
+            recordings.extend(p3b.read_manifest(source))
+            continue
+        if os.path.isdir(source):
+            file_names = sorted(glob.glob(os.path.join(source, pattern)))
+        elif glob.has_magic(source):
+            file_names = sorted(glob.glob(source))
+        elif os.path.isfile(source):
+            file_names = [source]
+        else:
+            raise FileNotFoundError(f'no recording or manifest named {source!r}')
+        recordings.extend(p3b.read_manifest([{'file': file_name, 'trim': trim, 'flip': flip}
+                                             for file_name in file_names]))
+    return recordings
+
+#%% Write results
+
+def get_json_value(value):
+    '''
+    The get_json_value function returns a value from a row of results as
+    something json can hold: numpy numbers become Python numbers, and nan
+    becomes None so the file stays valid JSON.
+    '''
+    if isinstance(value, (list, tuple)):
+        return [get_json_value(item) for item in value]
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def get_json_value_dict(values):
+    '''
+    The get_json_value_dict function runs get_json_value on every value of a dictionary.
+    '''
+    return {key: get_json_value(value) for key, value in values.items()}
+
+
+def write_outputs(results, summary, parameters, output_dir, formats, columns):
+    '''
+    The write_outputs function will write the rows of results to
+    results.csv and/or results.json in output_dir. The .json file also holds
+    the parameters of the run and its timing summary, and timing.json always
+    holds the timing summary on its own.
+
+    Parameters
+    ----------
+    results : List of dictionaries
+        The rows returned by run_batch or run_stream_batch.
+    summary : Dictionary
+        The timing summary of the run.
+    parameters : Dictionary
+        The parameters the recordings were analyzed with.
+    output_dir : String
+        The folder to write the files to.
+    formats : List of strings
+        'csv' and/or 'json'.
+    columns : List of strings
+        The columns of the .csv file.
+
+    Returns
+    -------
+    file_names : List of strings
+        The paths of the files written.
+
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    file_names = []
+    if 'csv' in formats:
+        file_names.append(os.path.join(output_dir, 'results.csv'))
+        p3b.write_results(results, file_names[-1], columns)
+    if 'json' in formats:
+        file_names.append(os.path.join(output_dir, 'results.json'))
+        rows = [{key: get_json_value(value) for key, value in row.items()} for row in results]
+        with open(file_names[-1], 'w') as file:
+            json.dump({'parameters': get_json_value_dict(parameters), 'summary': get_json_value_dict(summary),
+                       'results': rows}, file, indent=1)
+    file_names.append(os.path.join(output_dir, 'timing.json'))
+    with open(file_names[-1], 'w') as file:
+        json.dump(get_json_value_dict(summary), file, indent=1)
+    return file_names
+
+
+def plot_results(results, output_dir, plot_format='png'):
+    '''
+    The plot_results function will save bar graphs of the SDRR and the LF/HF
+    ratio of each recording, like the HRV and LF/HF figures of
+    Project_3_script. matplotlib is imported here (without a display), so
+    runs with --no-plots never load it.
+
+    Parameters
+    ----------
+    results : List of dictionaries
+        The rows returned by run_batch or run_stream_batch.
+    output_dir : String
+        The folder to save the figures to.
+    plot_format : String, optional
+        The file format of the figures. The default is 'png'.
+
+    Returns
+    -------
+    file_names : List of strings
+        The paths of the figures saved.
+
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+
+    os.makedirs(output_dir, exist_ok=True)
+    labels = [f"{row['activity']}\n{row['recording']}" for row in results]
+    file_names = []
+    for metric, label, title in [('sdrr', 'Heart Rate Variability (SDRR)', 'Heart Rate Variability'),
+                                 ('lf_hf_ratio', 'LF/HF Ratio', 'Ratios of Power Spectrums')]:
+        figure = plt.figure(figsize=(max(6, 1.2*len(results)), 5))
+        plt.bar(range(len(results)), [row[metric] for row in results])
+        plt.xticks(range(len(results)), labels, rotation=90 if len(results) > 8 else 0, fontsize=8)
+        plt.ylabel(label)
+        plt.title(title)
+        plt.tight_layout()
+        file_names.append(os.path.join(output_dir, f'{metric}_barplot.{plot_format}'))
+        figure.savefig(file_names[-1])
+        plt.close(figure)
+    return file_names
+
+
+def print_summary(summary, file=sys.stderr):
+    '''
+    The print_summary function will print the timing summary of a run.
+    '''
+    line = f"{summary['n_recordings']} recordings with {summary['n_workers']} workers in {summary['wall_time']:.2f} s"
+    if 'samples_per_sec' in summary:
+        line += f" ({summary['total_samples']} samples, {summary['samples_per_sec']/1e6:.2f}M samples/s)"
+    print(line, file=file)
+    stages = [f"{stage[:-5]} {summary[stage]:.2f} s" for stage in stage_times + ['recording_time']
+              if stage in summary]
+    print('total time of each stage: ' + ', '.join(stages), file=file)
+
+#%% Command line
+
+def get_parser():
+    '''
+    The get_parser function returns the argparse parser of the command line tool.
+    '''
+    parser = argparse.ArgumentParser(description='Find the heartbeats and heart rate variability of arduino '
+                                                 'ECG recordings.')
+    parser.add_argument('inputs', nargs='+',
+                        help='recording files, globs, folders or .csv/.json manifests')
+    parser.add_argument('--pattern', default='*.txt', help='glob pattern of the recordings in a folder')
+    parser.add_argument('--trim', type=int, help='samples to cut off the end of recordings not in a manifest')
+    parser.add_argument('--flip', action='store_true', help='reverse the recordings not in a manifest')
+
+    analysis = parser.add_argument_group('analysis')
+    analysis.add_argument('--fs', type=int, default=500, help='sampling frequency in Hz')
+    analysis.add_argument('--numtaps', type=int, default=250, help='length of the bandpass filter')
+    analysis.add_argument('--band', type=float, nargs=2, default=[.5, 50], metavar=('FC1', 'FC2'),
+                          help='cutoff frequencies of the bandpass filter in Hz')
+    analysis.add_argument('--window', default='hann', help='window the filter is designed with')
+    analysis.add_argument('--height', type=float, default=1.7, help='smallest voltage of a heartbeat')
+    analysis.add_argument('--dt', type=float, default=.1, help='time step of the interpolated IBI in seconds')
+    analysis.add_argument('--precision', choices=['float64', 'float32'], default='float64',
+                          help='float32 analyzes the int16 ADC counts with Project_3_precision')
+    analysis.add_argument('--quality', action='store_true',
+                          help='leave out bad segments and outlier intervals with Project_3_quality')
+
+    running = parser.add_argument_group('running')
+    running.add_argument('--jobs', type=int, default=None, help='worker processes (default one per core)')
+    running.add_argument('--stream', action='store_true',
+                         help='analyze each recording a chunk at a time, for recordings too long for memory')
+    running.add_argument('--max-memory', type=int, default=32 << 20,
+                         help='memory ceiling in bytes of each streamed recording')
+    running.add_argument('--memo', action='store_true',
+                         help='remember the result of each stage on disk with Project_3_memo')
+    running.add_argument('--profile', action='store_true',
+                         help='profile each stage with Project_3_profiling and save profile.json')
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--output-dir', default='p3_results', help='folder to write the results to')
+    output.add_argument('--format', nargs='+', choices=['csv', 'json'], default=['csv', 'json'],
+                        help='file formats of the results')
+    output.add_argument('--no-plots', action='store_true', help='do not make figures (matplotlib is not imported)')
+    output.add_argument('--plot-format', default='png', help='file format of the figures')
+    output.add_argument('--quiet', action='store_true', help='do not print the results and timing summary')
+    return parser
+
+
+def run(arguments):
+    '''
+    The run function will analyze the recordings with the parsed command
+    line arguments and write the results, and returns the rows of results
+    and the timing summary.
+    '''
+    recordings = find_recordings(arguments.inputs, arguments.pattern, arguments.trim, arguments.flip)
+    if not recordings:
+        return [], None
+
+    if arguments.memo:
+        p3memo.enable_memoization()
+    if arguments.profile:
+        p3prof.enable_profiling()
+    n_workers = arguments.jobs or os.cpu_count() or 1
+    filt = p3f.get_filter(arguments.numtaps, arguments.band, arguments.window, arguments.fs)
+    parameters = {'fs': arguments.fs, 'numtaps': arguments.numtaps, 'band': arguments.band,
+                  'window': arguments.window, 'height': arguments.height, 'dt': arguments.dt,
+                  'precision': arguments.precision, 'quality': arguments.quality, 'stream': arguments.stream}
+
+    if arguments.stream:
+        results, summary = p3b.run_stream_batch(recordings, filt, arguments.numtaps, arguments.height, arguments.dt,
+                                                arguments.fs, n_workers, max_memory=arguments.max_memory)
+        columns = p3b.stream_columns
+    else:
+        results, summary = p3b.run_batch(recordings, filt, arguments.numtaps, arguments.height, arguments.dt,
+                                         arguments.fs, n_workers, precision=arguments.precision,
+                                         quality=arguments.quality)
+        columns = p3b.result_columns
+
+    write_outputs(results, summary, parameters, arguments.output_dir, arguments.format, columns)
+    if not arguments.no_plots:
+        plot_results(results, arguments.output_dir, arguments.plot_format)
+    if arguments.profile:
+        p3prof.export_json(os.path.join(arguments.output_dir, 'profile.json'))
+    return results, summary
+
+
+def main(argv=None):
+    '''
+    The main function runs the command line tool and returns its exit status.
+    '''
+    parser = get_parser()
+    arguments = parser.parse_args(argv)
+    if arguments.stream and (arguments.quality or arguments.precision != 'float64'):
+        parser.error('--quality and --precision float32 cannot be used with --stream')
+    try:
+        results, summary = run(arguments)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+    if summary is None:
+        print('no recordings found', file=sys.stderr)
+        return 1
+
+    if not arguments.quiet:
+        for row in results:
+            print(f"{row['recording']:>32} {row['activity']:>12} {row['n_beats']:>7} beats  "
+                  f"SDRR {row['sdrr']:.4f} s  LF/HF {row['lf_hf_ratio']:.3f}")
+        print_summary(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_events.py
+Created on Sat Oct 17 19:06:37 2026
+This module keeps the heartbeats found in each recording in a compact store,
+so the heart rate variability of any part of any recording can be found
+without loading or filtering the ECG again. Each recording's beats are kept
+as the sample index of the first beat and the number of samples between
+beats as int32, about 4 bytes a beat, and the store is saved to one .npz
+file. The beat times are decoded the first time they are needed and kept
+sorted, so the beats in a time range are found with a binary search. The
+inter-beat intervals, interpolated IBI series and band powers are only
+calculated when asked for, and are remembered for the next time.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import numpy as np
+import Project_3_module as p3m
+import Project_3_spectral as p3sp
+
+#%% Beats of one recording
+
+class RecordingBeats:
+    '''
+    The RecordingBeats class holds the heartbeats of one recording as
+    delta encoded sample indices, and calculates the series derived from
+    them when they are first asked for.
+
+    Parameters
+    ----------
+    first_index : Integer
+        The sample index of the first heartbeat, or None if there are no heartbeats.
+    deltas : Array of integers.
+        A 1D array of the number of samples between each heartbeat and the next.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    '''
+
+    def __init__(self, first_index, deltas, fs=500):
+        self.first_index = None if first_index is None else int(first_index)
+        self.deltas = np.asarray(deltas, dtype=np.int32)
+        self.fs = fs
+        # derived series, calculated the first time they are asked for
+        self._cache = {}
+
+    @classmethod
+    def from_indices(cls, heartbeat_indices, fs=500):
+        '''
+        The from_indices method makes a RecordingBeats from the sample index of each heartbeat.
+
+        Parameters
+        ----------
+        heartbeat_indices : Array of integers.
+            A 1D array of the index of each heartbeat in the recording, in order.
+        fs : Integer, optional
+            The sampling frequency of the arduino sensor. The default is 500.
+
+        Returns
+        -------
+        beats : RecordingBeats
+            The beats of the recording.
+
+        '''
+        heartbeat_indices = np.asarray(heartbeat_indices, dtype=np.int64)
+        if np.any(np.diff(heartbeat_indices) <= 0):
+            raise ValueError('heartbeat indices must be increasing')
+        deltas = np.diff(heartbeat_indices)
+        if len(deltas) > 0 and deltas.max() > np.iinfo(np.int32).max:
+            raise ValueError('the gap between two heartbeats is too long for int32')
+        first_index = heartbeat_indices[0] if len(heartbeat_indices) > 0 else None
+        return cls(first_index, deltas.astype(np.int32), fs)
+
+    @classmethod
+    def from_times(cls, time_of_heartbeat, fs=500):
+        '''
+        The from_times method makes a RecordingBeats from the time of each
+        heartbeat in seconds, as returned by get_heartbeats.
+        '''
+        return cls.from_indices(np.round(np.asarray(time_of_heartbeat)*fs).astype(np.int64), fs)
+
+    def __len__(self):
+        return 0 if self.first_index is None else len(self.deltas) + 1
+
+    def _get(self, key, calculate):
+        '''
+        The _get method returns a derived series, calculating it the first time.
+        '''
+        if key not in self._cache:
+            value = calculate()
+            # the remembered arrays are shared, so they are made read only
+            for array in (value if isinstance(value, tuple) else (value,)):
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+            self._cache[key] = value
+        return self._cache[key]
+
+    @property
+    def indices(self):
+        '''
+        The sample index of each heartbeat (decoded once, read only).
+        '''
+        if self.first_index is None:
+            return self._get('indices', lambda: np.zeros(0, dtype=np.int64))
+        return self._get('indices', lambda: np.cumsum(np.concatenate([[self.first_index], self.deltas]),
+                                                      dtype=np.int64))
+
+    @property
+    def times(self):
+        '''
+        The time of each heartbeat in seconds (read only). They are found the
+        same way get_heartbeats finds them from the time array, index*(1/fs).
+        '''
+        return self._get('times', lambda: self.indices*(1/self.fs))
+
+    @property
+    def intervals(self):
+        '''
+        The inter-beat intervals in seconds (read only).
+        '''
+        return self._get('intervals', lambda: np.diff(self.times))
+
+    def get_range(self, start_time=None, stop_time=None):
+        '''
+        The get_range method returns the slice of the beats inside a time
+        range, found with a binary search of the beat times.
+
+        Parameters
+        ----------
+        start_time : Float, optional
+            The start of the range in seconds (included). The default is None, which uses the first beat.
+        stop_time : Float, optional
+            The end of the range in seconds (not included). The default is None, which uses the last beat.
+
+        Returns
+        -------
+        beat_slice : Slice
+            The slice of times (or indices) of the beats in the range.
+
+        '''
+        start = 0 if start_time is None else int(np.searchsorted(self.times, start_time, side='left'))
+        stop = len(self) if stop_time is None else int(np.searchsorted(self.times, stop_time, side='left'))
+        return slice(start, max(start, stop))
+
+    def get_times(self, start_time=None, stop_time=None):
+        '''
+        The get_times method returns the time of each heartbeat in a time range.
+        '''
+        return self.times[self.get_range(start_time, stop_time)]
+
+    def get_interpolated_ibi(self, dt=0.1):
+        '''
+        The get_interpolated_ibi method returns the interpolated IBI series of
+        the whole recording from Project_3_module.interpolate_ibi, calculated
+        once for each dt.
+
+        Returns
+        -------
+        regular_time : Array of floats.
+            A 1D array of the regularly sampled times, in steps of dt.
+        interpolated_ibi : Array of floats.
+            A 1D array of the inter-beat intervals interpolated at each of the regular times.
+
+        '''
+        return self._get(('interpolated_ibi', dt), lambda: p3m.interpolate_ibi(self.times, dt))
+
+    def get_hrv(self, start_time=None, stop_time=None):
+        '''
+        The get_hrv method returns the heart rate variability (SDRR) of the
+        beats in a time range, remembered for each range.
+        '''
+        beat_slice = self.get_range(start_time, stop_time)
+
+        def calculate():
+            times = self.times[beat_slice]
+            return float(p3m.calculate_hrv(times)) if len(times) > 2 else np.nan
+
+        return self._get(('hrv', beat_slice.start, beat_slice.stop), calculate)
+
+    def get_band_powers(self, start_time=None, stop_time=None, method='welch', dt=0.1):
+        '''
+        The get_band_powers method returns the LF power, HF power and LF/HF
+        ratio of the beats in a time range from
+        Project_3_spectral.get_hrv_band_powers, remembered for each range.
+
+        Parameters
+        ----------
+        start_time : Float, optional
+            The start of the range in seconds. The default is None, which uses the first beat.
+        stop_time : Float, optional
+            The end of the range in seconds. The default is None, which uses the last beat.
+        method : String, optional
+            'welch' or 'lomb'. The default is 'welch'.
+        dt : Float, optional
+            The time step used to interpolate the IBI data for Welch's method. The default is 0.1.
+
+        Returns
+        -------
+        lf_power : Float
+            The power in the LF band in s^2 (nan with fewer than 4 beats).
+        hf_power : Float
+            The power in the HF band in s^2.
+        lf_hf_ratio : Float
+            The LF power divided by the HF power.
+
+        '''
+        beat_slice = self.get_range(start_time, stop_time)
+
+        def calculate():
+            times = self.times[beat_slice]
+            if len(times) < 4:
+                return np.nan, np.nan, np.nan
+            return tuple(float(value) for value in p3sp.get_hrv_band_powers(times, method, dt))
+
+        return self._get(('band_powers', beat_slice.start, beat_slice.stop, method, dt), calculate)
+
+#%% Store of every recording
+
+class BeatStore:
+    '''
+    The BeatStore class holds the RecordingBeats of many recordings by name,
+    saves them all to one .npz file and answers questions about the same
+    time range of every recording at once.
+
+    Parameters
+    ----------
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    '''
+
+    def __init__(self, fs=500):
+        self.fs = fs
+        self.recordings = {}
+
+    def __len__(self):
+        return len(self.recordings)
+
+    def __contains__(self, name):
+        return name in self.recordings
+
+    def __getitem__(self, name):
+        return self.recordings[name]
+
+    def names(self):
+        '''
+        The names method returns the names of the recordings in the order they were added.
+        '''
+        return list(self.recordings)
+
+    def add(self, name, time_of_heartbeat=None, heartbeat_indices=None):
+        '''
+        The add method adds (or replaces) the beats of a recording, from
+        either the time of each heartbeat or the sample index of each heartbeat.
+
+        Parameters
+        ----------
+        name : String
+            The name of the recording.
+        time_of_heartbeat : Array of floats, optional
+            A 1D array of the time of each heartbeat in seconds. The default is None.
+        heartbeat_indices : Array of integers, optional
+            A 1D array of the index of each heartbeat. The default is None.
+
+        Returns
+        -------
+        beats : RecordingBeats
+            The beats of the recording.
+
+        '''
+        if heartbeat_indices is not None:
+            beats = RecordingBeats.from_indices(heartbeat_indices, self.fs)
+        elif time_of_heartbeat is not None:
+            beats = RecordingBeats.from_times(time_of_heartbeat, self.fs)
+        else:
+            raise ValueError('either time_of_heartbeat or heartbeat_indices has to be given')
+        self.recordings[name] = beats
+        return beats
+
+    def save(self, file_name):
+        '''
+        The save method writes every recording to one .npz file: the names,
+        the first index and number of beats of each recording, and all of the
+        int32 deltas one after another. It is written to a temporary name
+        and moved into place.
+        '''
+        names = self.names()
+        first_indices = np.array([-1 if self.recordings[name].first_index is None
+                                  else self.recordings[name].first_index for name in names], dtype=np.int64)
+        n_deltas = np.array([len(self.recordings[name].deltas) for name in names], dtype=np.int64)
+        deltas = (np.concatenate([self.recordings[name].deltas for name in names]) if names
+                  else np.zeros(0, dtype=np.int32))
+
+        folder = os.path.dirname(file_name)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f'{file_name}.{os.getpid()}.tmp.npz'
+        np.savez(temp_path, names=np.array(names, dtype=str), first_indices=first_indices,
+                 n_deltas=n_deltas, deltas=deltas.astype(np.int32), fs=self.fs)
+        os.replace(temp_path, file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        '''
+        The load method reads a store saved with save.
+
+        Parameters
+        ----------
+        file_name : String
+            The path of the .npz file.
+
+        Returns
+        -------
+        store : BeatStore
+            The store with every recording in the file.
+
+        '''
+        with np.load(file_name) as saved:
+            store = cls(saved['fs'].item())
+            splits = np.cumsum(saved['n_deltas'])[:-1]
+            all_deltas = np.split(saved['deltas'], splits) if len(saved['names']) > 0 else []
+            for name, first_index, deltas in zip(saved['names'].tolist(), saved['first_indices'].tolist(), all_deltas):
+                store.recordings[name] = RecordingBeats(None if first_index < 0 else first_index, deltas, store.fs)
+        return store
+
+    def query_band_powers(self, start_time=None, stop_time=None, method='welch', dt=0.1):
+        '''
+        The query_band_powers method returns the LF power, HF power and LF/HF
+        ratio of the same time range of every recording, for example
+        minutes 30-35 with start_time=1800 and stop_time=2100. Only the
+        stored beats are used.
+
+        Parameters
+        ----------
+        start_time : Float, optional
+            The start of the range in seconds. The default is None, which uses the first beat.
+        stop_time : Float, optional
+            The end of the range in seconds. The default is None, which uses the last beat.
+        method : String, optional
+            'welch' or 'lomb'. The default is 'welch'.
+        dt : Float, optional
+            The time step used to interpolate the IBI data for Welch's method. The default is 0.1.
+
+        Returns
+        -------
+        results : Dictionary
+            The (lf_power, hf_power, lf_hf_ratio) of each recording, by name.
+
+        '''
+        return {name: beats.get_band_powers(start_time, stop_time, method, dt)
+                for name, beats in self.recordings.items()}
+
+    def query_hrv(self, start_time=None, stop_time=None):
+        '''
+        The query_hrv method returns the heart rate variability (SDRR) of the
+        same time range of every recording, by name.
+        '''
+        return {name: beats.get_hrv(start_time, stop_time) for name, beats in self.recordings.items()}
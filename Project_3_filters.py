@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_filters.py
+Created on Sat Oct 17 14:52:26 2026
+This module is a registry of the FIR filters used by the Project 3 ECG
+analysis. A filter is designed with signal.firwin the first time it is asked
+for and is saved to disk along with its FFT at every block size used for
+overlap-save convolution. Every later request, in this process, a later run or another
+worker process, gets the saved taps and responses back without designing or
+transforming the filter again.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import hashlib
+import os
+import numpy as np
+from scipy import fft as fft
+from scipy import signal
+import Project_3_loader as p3l
+
+# folder the designed filters are saved in
+cache_folder = os.path.join(p3l.cache_folder, 'filters')
+
+# filters and responses already used in this process, keyed by the path they are saved in
+_filters = {}
+_responses = {}
+
+#%% Filter design
+
+def get_filter_key(numtaps, cutoffs, window='hann', fs=500, pass_zero='bandpass'):
+    '''
+    The get_filter_key function will input the settings of a filter and return
+    a string naming it, used to look it up in memory and on disk.
+
+    Parameters
+    ----------
+    numtaps : Integer
+        The length of the filter.
+    cutoffs : List of floats
+        The cutoff frequencies of the filter in Hz.
+    window : String, optional
+        The window used to design the filter. The default is 'hann'.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    pass_zero : String or Boolean, optional
+        The filter type passed to signal.firwin. The default is 'bandpass'.
+
+    Returns
+    -------
+    key : String
+        The name of the filter.
+
+    '''
+    cutoffs = np.atleast_1d(np.asarray(cutoffs, dtype=float))
+    cutoff_text = '-'.join(f'{cutoff:g}' for cutoff in cutoffs)
+    return f'firwin_{numtaps}_{cutoff_text}_{window}_{fs:g}_{pass_zero}'
+
+
+def get_cache_path(key, cache_dir=None):
+    '''
+    The get_cache_path function will return the path of the .npz file a filter is saved in.
+    '''
+    if cache_dir is None:
+        cache_dir = cache_folder
+    return os.path.join(cache_dir, key + '.npz')
+
+
+def read_saved_filter(path):
+    '''
+    The read_saved_filter function will input the path of a saved filter and
+    return a dictionary of the arrays in it, or an empty dictionary if there
+    is no file or it cannot be read.
+    '''
+    try:
+        with np.load(path) as saved:
+            return {name: saved[name] for name in saved.files}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_filter(path, arrays):
+    '''
+    The save_filter function will save a dictionary of the arrays of a filter
+    to a .npz file. It is written to a temporary name and moved into place, so
+    worker processes never read a half written file.
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, path)
+
+
+def get_filter(numtaps=250, cutoffs=(.5, 50), window='hann', fs=500, pass_zero='bandpass', cache_dir=None):
+    '''
+    The get_filter function will input the settings of a filter and return its
+    taps. The filter is only designed with signal.firwin the first time these
+    settings are used, after that it is read from memory or from disk.
+
+    Parameters
+    ----------
+    numtaps : Integer, optional
+        The length of the filter. The default is 250.
+    cutoffs : List of floats, optional
+        The cutoff frequencies of the filter in Hz. The default is (.5, 50).
+    window : String, optional
+        The window used to design the filter. The default is 'hann'.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    pass_zero : String or Boolean, optional
+        The filter type passed to signal.firwin. The default is 'bandpass'.
+    cache_dir : String, optional
+        The folder the filter is saved in. The default is None, which uses p3_cache/filters.
+
+    Returns
+    -------
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of the filter (read only).
+
+    '''
+    key = get_filter_key(numtaps, cutoffs, window, fs, pass_zero)
+    path = get_cache_path(key, cache_dir)
+    if path in _filters:
+        return _filters[path]
+
+    saved = read_saved_filter(path)
+    if 'taps' in saved:
+        filt = saved['taps']
+    else:
+        filt = signal.firwin(numtaps, cutoffs, window=window, pass_zero=pass_zero, fs=fs)
+        saved['taps'] = filt
+        save_filter(path, saved)
+
+    filt.flags.writeable = False
+    _filters[path] = filt
+    return filt
+
+#%% Frequency responses
+
+def get_taps_fft(filt, fft_size, cache_dir=None):
+    '''
+    The get_taps_fft function will input the taps of a filter and an FFT size
+    and return the real FFT of the taps zero padded to that size. The result is
+    kept in memory and saved next to the filter on disk, keyed by a hash of
+    the taps, so it works for any filter and not only ones from get_filter.
+    It is meant for the few block sizes used by overlap-save convolution. An
+    FFT the length of a whole recording should be taken with fft.rfft instead,
+    so every new recording length does not add a response to the cache.
+
+    Parameters
+    ----------
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a filter.
+    fft_size : Integer
+        The length of the FFT.
+    cache_dir : String, optional
+        The folder the response is saved in. The default is None, which uses p3_cache/filters.
+
+    Returns
+    -------
+    filt_freq : Array of complex numbers.
+        The real FFT of the filter at fft_size (read only).
+
+    '''
+    filt = np.ascontiguousarray(filt, dtype=float)
+    taps_hash = hashlib.sha1(filt.tobytes()).hexdigest()[:16]
+    path = get_cache_path('taps_' + taps_hash, cache_dir)
+    memory_key = (path, fft_size)
+    if memory_key in _responses:
+        return _responses[memory_key]
+
+    saved = read_saved_filter(path)
+    name = f'fft_{fft_size}'
+    if name in saved:
+        filt_freq = saved[name]
+    else:
+        filt_freq = fft.rfft(filt, fft_size)
+        saved['taps'] = filt
+        saved[name] = filt_freq
+        save_filter(path, saved)
+
+    filt_freq.flags.writeable = False
+    _responses[memory_key] = filt_freq
+    return filt_freq
+
+
+def get_filter_fft(numtaps=250, cutoffs=(.5, 50), window='hann', fs=500, pass_zero='bandpass',
+                   fft_size=None, cache_dir=None):
+    '''
+    The get_filter_fft function will input the settings of a filter and an FFT
+    size and return the real FFT of the filter, designing the filter first if
+    it has not been used yet.
+
+    Parameters
+    ----------
+    numtaps : Integer, optional
+        The length of the filter. The default is 250.
+    cutoffs : List of floats, optional
+        The cutoff frequencies of the filter in Hz. The default is (.5, 50).
+    window : String, optional
+        The window used to design the filter. The default is 'hann'.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    pass_zero : String or Boolean, optional
+        The filter type passed to signal.firwin. The default is 'bandpass'.
+    fft_size : Integer, optional
+        The length of the FFT. The default is None, which uses numtaps.
+    cache_dir : String, optional
+        The folder the filter is saved in. The default is None, which uses p3_cache/filters.
+
+    Returns
+    -------
+    filt_freq : Array of complex numbers.
+        The real FFT of the filter at fft_size (read only).
+
+    '''
+    filt = get_filter(numtaps, cutoffs, window, fs, pass_zero, cache_dir)
+    if fft_size is None:
+        fft_size = numtaps
+    return get_taps_fft(filt, fft_size, cache_dir)
@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_loader.py
+Created on Sat Oct 17 09:12:40 2026
+This module loads the arduino ECG recordings used by Project_3_module and
+Project_3_script. Parsing the ADC text files with np.loadtxt is slow, so each
+text file is parsed once into its whole ADC counts, which are written to a
+binary cache next to it along with the same samples in volts. Later runs map
+the cache straight into memory with np.memmap instead of parsing the text
+again. The cache is rebuilt whenever the source file changes. load_counts
+gives the raw ADC counts as int16 instead of volts, for the float32
+analysis of Project_3_precision. Compressed .p3a archives
+(Project_3_archive) are read by the same functions, straight from the archive.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import hashlib
+import itertools
+import json
+import os
+import numpy as np
+from Project_3_profiling import profiled
+
+# sampling frequency of the arduino sensor
+fs = 500
+# conversion factor between 1023 bits and 4 volts
+volts_per_count = 1/204.6
+# largest ADC count of the 10 bit arduino
+max_count = 1023
+# folder the binary caches are written to (next to the text files)
+cache_folder = 'p3_cache'
+# number of text lines parsed at a time when a cache is built
+parse_block_lines = 1 << 18
+# extension of the compressed archives of Project_3_archive, which are read without a cache
+archive_extension = '.p3a'
+# the recordings that come with the project, with the trim and flip Project_3_script uses
+bundled_recordings = [('p3_resting_meg.txt', 21389, False),
+                      ('p3_relaxing_meg.txt', 22823, False),
+                      ('p3_mentally_stress_meg.txt', 835, True),
+                      ('p3_physical_stress_meg.txt', 0, False)]
+
+#%% Cache helpers
+
+def get_file_hash(file_name):
+    '''
+    The get_file_hash function will input the name of a file and return the
+    sha1 hash of its contents. It reads the file in blocks so large recordings
+    never have to be held in memory.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the file that should be hashed.
+
+    Returns
+    -------
+    file_hash : String
+        The hex digest of the sha1 hash of the file.
+
+    '''
+    file_hash = hashlib.sha1()
+    with open(file_name, 'rb') as file:
+        # read 1 MB at a time
+        for block in iter(lambda: file.read(1 << 20), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_cache_paths(file_name, cache_dir=None):
+    '''
+    The get_cache_paths function will input the name of a recording text file
+    and return the paths of its binary cache and of the json file holding
+    its metadata.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+
+    Returns
+    -------
+    data_path : String
+        The path of the .npy file holding the recording in volts.
+    meta_path : String
+        The path of the .json file holding the metadata of the cache.
+
+    '''
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_name)), cache_folder)
+    base_name = os.path.splitext(os.path.basename(file_name))[0]
+    data_path = os.path.join(cache_dir, base_name + '.npy')
+    meta_path = os.path.join(cache_dir, base_name + '.json')
+    return data_path, meta_path
+
+
+def get_counts_path(data_path):
+    '''
+    The get_counts_path function returns the path of the int16 counts cache
+    kept next to the volts cache at data_path.
+    '''
+    return os.path.splitext(data_path)[0] + '.counts.npy'
+
+
+def read_cache_metadata(meta_path):
+    '''
+    The read_cache_metadata function will input the path of a cache metadata
+    file and return its contents, or None if the file is missing or broken.
+
+    Parameters
+    ----------
+    meta_path : String
+        The path of the .json metadata file.
+
+    Returns
+    -------
+    metadata : Dictionary or None
+        The metadata stored with the cache.
+
+    '''
+    try:
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache_metadata(meta_path, metadata):
+    '''
+    The write_cache_metadata function will input the path of a cache metadata
+    file and a dictionary, and write the dictionary to the file as json.
+    The file is written to a temporary name first so a crash never leaves a
+    half written file behind.
+
+    Parameters
+    ----------
+    meta_path : String
+        The path of the .json metadata file.
+    metadata : Dictionary
+        The metadata to store with the cache.
+
+    Returns
+    -------
+    None.
+
+    '''
+    temp_path = meta_path + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(temp_path, meta_path)
+
+
+def is_cache_valid(file_name, data_path, metadata):
+    '''
+    The is_cache_valid function will check whether the binary cache of a
+    recording still matches its text file. If the size and modification time
+    of the text file are unchanged the cache is used as is. If only the
+    modification time changed, the file is hashed and the cache is kept when
+    the contents are the same.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file.
+    data_path : String
+        The path of the .npy cache file.
+    metadata : Dictionary or None
+        The metadata stored with the cache.
+
+    Returns
+    -------
+    valid : Boolean
+        True if the cache can be used.
+    metadata : Dictionary or None
+        The metadata, with the modification time updated if it was rechecked
+        by hash.
+
+    '''
+    if metadata is None or not os.path.exists(data_path) or not os.path.exists(get_counts_path(data_path)):
+        return False, metadata
+    if metadata.get('volts_per_count') != volts_per_count or metadata.get('fs') != fs:
+        return False, metadata
+
+    stat = os.stat(file_name)
+    if stat.st_size != metadata.get('source_size'):
+        return False, metadata
+    if stat.st_mtime_ns == metadata.get('source_mtime_ns'):
+        return True, metadata
+
+    # the file was touched, compare the contents before rebuilding
+    if get_file_hash(file_name) != metadata.get('source_sha1'):
+        return False, metadata
+    metadata['source_mtime_ns'] = stat.st_mtime_ns
+    return True, metadata
+
+#%% Load data
+
+@profiled()
+def count_samples(file_name):
+    '''
+    The count_samples function will count the lines of a recording text file
+    that hold a sample (every line that is not blank), one line at a time.
+    '''
+    with open(file_name) as file:
+        return sum(1 for line in file if line.strip())
+
+
+def build_cache(file_name, data_path, meta_path):
+    '''
+    The build_cache function will parse the whole ADC counts of a recording
+    text file with np.loadtxt and save them to two binary .npy files, one of
+    the counts as int16 and one of the counts converted to volts, along with
+    a json file holding the sampling frequency, conversion factor and the
+    size, modification time and hash of the text file. The text is parsed
+    parse_block_lines lines at a time and each block is written straight to
+    the files, so a 24 hour recording never has to fit in memory.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file.
+    data_path : String
+        The path of the .npy file of volts to write (the counts are written
+        to get_counts_path(data_path)).
+    meta_path : String
+        The path of the .json file to write.
+
+    Returns
+    -------
+    metadata : Dictionary
+        The metadata written alongside the cache.
+
+    '''
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    stat = os.stat(file_name)
+    n_samples = count_samples(file_name)
+
+    # write to temporary names and move into place when done
+    counts_path = get_counts_path(data_path)
+    temp_path = data_path + '.tmp.npy'
+    counts_temp_path = counts_path + '.tmp.npy'
+    n_written = 0
+    try:
+        with open(file_name) as text_file, open(temp_path, 'wb') as data_file, \
+             open(counts_temp_path, 'wb') as counts_file:
+            for dtype, file in [(float, data_file), (np.int16, counts_file)]:
+                np.lib.format.write_array_header_1_0(file, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                                                            'fortran_order': False,
+                                                            'shape': (n_samples,)})
+            # parse a block of text at a time as whole counts, and convert them to volts
+            for lines in iter(lambda: list(itertools.islice(text_file, parse_block_lines)), []):
+                block = np.loadtxt(lines, dtype=np.int64, ndmin=1)
+                if np.any(np.abs(block) > np.iinfo(np.int16).max):
+                    raise ValueError(f'{file_name} has ADC counts that do not fit in int16')
+                counts_file.write(block.astype(np.int16).tobytes())
+                data_file.write((block*volts_per_count).tobytes())
+                n_written += len(block)
+        if n_written != n_samples:
+            raise ValueError(f'{file_name} has {n_written} samples but {n_samples} lines')
+    except ValueError:
+        os.remove(temp_path)
+        os.remove(counts_temp_path)
+        raise
+    os.replace(counts_temp_path, counts_path)
+    os.replace(temp_path, data_path)
+
+    metadata = {'source_file': os.path.basename(file_name),
+                'source_size': stat.st_size,
+                'source_mtime_ns': stat.st_mtime_ns,
+                'source_sha1': get_file_hash(file_name),
+                'fs': fs,
+                'volts_per_count': volts_per_count,
+                'n_samples': n_samples}
+    write_cache_metadata(meta_path, metadata)
+    return metadata
+
+
+def prepare_cache(file_name, cache_dir=None):
+    '''
+    The prepare_cache function will make sure the binary cache of a recording
+    is up to date, building it if it is not, and return its path. It is
+    shared by load_recording, load_counts and iterate_recording.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+
+    Returns
+    -------
+    data_path : String
+        The path of the .npy cache.
+
+    '''
+    data_path, meta_path = get_cache_paths(file_name, cache_dir)
+    metadata = read_cache_metadata(meta_path)
+    old_metadata = dict(metadata) if metadata is not None else None
+    valid, metadata = is_cache_valid(file_name, data_path, metadata)
+
+    if not valid:
+        build_cache(file_name, data_path, meta_path)
+    # the modification time may have been updated after a hash check
+    elif metadata != old_metadata:
+        write_cache_metadata(meta_path, metadata)
+
+    return data_path
+
+
+@profiled()
+def load_recording(file_name, trim=None, flip=None, cache_dir=None):
+    '''
+    The load_recording function will input the name of a recording text file
+    and return the recording in volts. The first call parses the text file and
+    builds a binary cache, every later call maps the cache into memory so no
+    text is parsed. Trimming and flipping are done on the memory map, so the
+    returned array is a read-only view and nothing is copied. With
+    Project_3_memo on, the array is keyed on the path, size and modification
+    time of the file, so the memoized stages never hash its samples.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file, or to a .p3a archive (trim and flip
+        then default to 0 and False, and cache_dir is not used).
+    trim : Integer, optional
+        The number of samples to cut off the end of the recording. The default
+        is None, which keeps the whole recording.
+    flip : Boolean, optional
+        If True the recording is reversed after it is trimmed. The default is
+        None, which keeps the recording in order.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+
+    Returns
+    -------
+    data : Memory map of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+
+    '''
+    if file_name.endswith(archive_extension):
+        import Project_3_archive as p3a
+        data = p3a.load_archive(file_name, trim, flip)
+    else:
+        data_path = prepare_cache(file_name, cache_dir)
+        trim, flip = int(trim or 0), bool(flip)
+        data = np.load(data_path, mmap_mode='r')
+
+        # trim and flip without copying
+        if trim > 0:
+            data = data[:-trim]
+        if flip:
+            data = data[::-1]
+
+    # with stage memoization on, the stages are keyed on the file instead of the samples
+    import Project_3_memo as p3memo
+    if p3memo.is_enabled():
+        status = os.stat(file_name)
+        p3memo.set_array_key(data, f'{os.path.abspath(file_name)} {status.st_size} {status.st_mtime_ns} '
+                                   f'{int(trim or 0)} {bool(flip)}')
+
+    return data
+
+
+@profiled()
+def load_counts(file_name, trim=None, flip=None, cache_dir=None):
+    '''
+    The load_counts function does what load_recording does, but returns the
+    raw ADC counts as int16 instead of volts as float64. Multiplying by
+    volts_per_count gives load_recording exactly. The counts are parsed from
+    the text file by build_cache and kept in a second cache next to the
+    volts cache.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file, or to a .p3a archive (trim and flip
+        then default to 0 and False, and cache_dir is not used).
+    trim : Integer, optional
+        The number of samples to cut off the end of the recording. The default
+        is None, which keeps the whole recording.
+    flip : Boolean, optional
+        If True the recording is reversed after it is trimmed. The default is
+        None, which keeps the recording in order.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+
+    Returns
+    -------
+    counts : Memory map of int16.
+        A 1D array of the ADC count (0 to 1023) of each sample (read only).
+
+    '''
+    if file_name.endswith(archive_extension):
+        import Project_3_archive as p3a
+        return p3a.load_archive(file_name, trim, flip, counts=True)
+
+    data_path = prepare_cache(file_name, cache_dir)
+    trim, flip = int(trim or 0), bool(flip)
+    counts = np.load(get_counts_path(data_path), mmap_mode='r')
+
+    # trim and flip without copying
+    if trim > 0:
+        counts = counts[:-trim]
+    if flip:
+        counts = counts[::-1]
+
+    return counts
+
+
+def iterate_recording(file_name, chunk_size=1 << 16, trim=None, flip=None, cache_dir=None):
+    '''
+    The iterate_recording function will input the name of a recording text
+    file and yield the recording in volts chunk_size samples at a time, in the
+    same order load_recording gives them. The chunks are read from the cache
+    with ordinary file reads instead of a memory map, so the pages already
+    read do not stay in the memory of the process and memory use does not
+    grow with the length of the recording.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file, or to a .p3a archive (trim and flip
+        then default to 0 and False, and cache_dir is not used).
+    chunk_size : Integer, optional
+        The number of samples in each chunk. The default is 65536.
+    trim : Integer, optional
+        The number of samples to cut off the end of the recording. The default
+        is None, which keeps the whole recording.
+    flip : Boolean, optional
+        If True the recording is reversed after it is trimmed. The default is
+        None, which keeps the recording in order.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+
+    Yields
+    ------
+    chunk : Array of floats.
+        The next chunk_size samples of the recording (the last one may be shorter).
+
+    '''
+    if file_name.endswith(archive_extension):
+        # only the chunks of the archive under each chunk of the recording are decoded
+        import Project_3_archive as p3a
+        with p3a.ArchiveReader(file_name) as reader:
+            yield from reader.iterate(chunk_size, 0, max(len(reader) - int(trim or 0), 0), bool(flip))
+        return
+
+    data_path = prepare_cache(file_name, cache_dir)
+    trim, flip = int(trim or 0), bool(flip)
+    with open(data_path, 'rb') as file:
+        # skip the .npy header
+        if np.lib.format.read_magic(file) == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(file)
+        data_start = file.tell()
+        n_samples = max(shape[0] - trim, 0)
+
+        for start in range(0, n_samples, chunk_size):
+            n_chunk = min(chunk_size, n_samples - start)
+            # a flipped recording is read from the end backwards
+            first_sample = n_samples - start - n_chunk if flip else start
+            file.seek(data_start + first_sample*dtype.itemsize)
+            chunk = np.fromfile(file, dtype=dtype, count=n_chunk)
+            yield chunk[::-1] if flip else chunk
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_memo.py
+Created on Sat Oct 17 21:03:52 2026
+This module remembers the results of the stages of the Project 3 ECG
+analysis on disk, so running the analysis again only recalculates the stages
+whose inputs changed. Each stage wrapped with the memoized decorator is looked
+up by a key made from its input arrays, its other parameters (like the LF
+and HF band edges) and its code, so every setting a stage depends on has to
+be one of its arguments. Hashing the contents of a long recording costs about
+as much as filtering it, so arrays are not hashed by contents where they
+have a key of their own: every array a stage returns carries the key it was
+saved under, and load_recording gives the recordings a key from the path,
+size and modification time of the file. A stage whose input came from
+another stage is then keyed on that stage's key, so changing a setting of
+one stage also changes the keys of every stage after it, and the stages
+before it are read back from disk. Only arrays without a key (made some
+other way) are hashed by contents. The arrays with a key are made read-only,
+since a key would no longer match an array changed in place. The results are
+kept in p3_cache/stages up to a size limit, and the least recently used
+results are deleted first. Memoization is off until enable_memoization is called.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import functools
+import hashlib
+import inspect
+import os
+import weakref
+import numpy as np
+import Project_3_loader as p3l
+
+# folder the stage results are saved in
+cache_folder = os.path.join(p3l.cache_folder, 'stages')
+# change this to throw away every saved result, for example when a stage's helpers change
+memo_version = 1
+
+# memoization state
+_enabled = False
+_cache_dir = cache_folder
+_max_bytes = 256 << 20
+_stats = {}
+# the key of each array returned by a stage or loaded from a file, by id
+_array_keys = {}
+
+#%% Turn memoization on and off
+
+def enable_memoization(cache_dir=None, max_bytes=256 << 20):
+    '''
+    The enable_memoization function will turn memoization on.
+
+    Parameters
+    ----------
+    cache_dir : String, optional
+        The folder the results are saved in. The default is None, which uses p3_cache/stages.
+    max_bytes : Integer, optional
+        The most bytes of results kept on disk, the least recently used are
+        deleted past this. The default is 256 MB.
+
+    Returns
+    -------
+    None.
+
+    '''
+    global _enabled, _cache_dir, _max_bytes
+    _enabled = True
+    _cache_dir = cache_folder if cache_dir is None else cache_dir
+    _max_bytes = int(max_bytes)
+
+
+def disable_memoization():
+    '''
+    The disable_memoization function will turn memoization off. The saved results are kept.
+    '''
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    '''
+    The is_enabled function returns True if memoization is on.
+    '''
+    return _enabled
+
+
+def get_stats():
+    '''
+    The get_stats function returns the number of hits (results read from
+    disk) and misses (results calculated) of each stage so far, as a
+    dictionary of {'hits': ..., 'misses': ...} by stage name.
+    '''
+    return {stage: dict(counts) for stage, counts in _stats.items()}
+
+
+def reset_stats():
+    '''
+    The reset_stats function clears the hit and miss counts.
+    '''
+    _stats.clear()
+
+
+def clear_cache(cache_dir=None):
+    '''
+    The clear_cache function deletes every saved result.
+    '''
+    cache_dir = _cache_dir if cache_dir is None else cache_dir
+    for path in get_cache_files(cache_dir):
+        os.remove(path)
+
+#%% Keys
+
+def set_array_key(data, key):
+    '''
+    The set_array_key function will give an array a key that stands for its
+    contents, so update_hash adds the key instead of hashing the contents.
+    The array is made read-only, and the key is forgotten when the array is
+    deleted.
+
+    Parameters
+    ----------
+    data : Array
+        The array, a stage result or a recording loaded from a file.
+    key : String
+        The key, which has to change whenever the contents would.
+
+    Returns
+    -------
+    None.
+
+    '''
+    data.flags.writeable = False
+    data_id = id(data)
+    if data_id not in _array_keys:
+        # forget the key when the array goes away, since its id can be reused
+        weakref.finalize(data, _array_keys.pop, data_id, None)
+    _array_keys[data_id] = key
+
+
+def get_array_key(data):
+    '''
+    The get_array_key function returns the key set_array_key gave an array, or None.
+    '''
+    return _array_keys.get(id(data))
+
+
+def update_hash(value_hash, value):
+    '''
+    The update_hash function will add a value to a hash. Arrays are added by
+    their key if they have one (see set_array_key), otherwise by their dtype,
+    shape and contents. Numbers, strings and None are added by their repr,
+    and lists, tuples and dictionaries item by item.
+
+    Parameters
+    ----------
+    value_hash : hashlib hash
+        The hash to update.
+    value : Object
+        The value to add.
+
+    Returns
+    -------
+    can_hash : Boolean
+        False if the value (or something inside it) cannot be hashed by contents.
+
+    '''
+    if isinstance(value, np.ndarray):
+        value_hash.update(f'array {value.dtype.str} {value.shape}'.encode())
+        array_key = get_array_key(value)
+        if array_key is None:
+            value_hash.update(np.ascontiguousarray(value).data)
+        else:
+            value_hash.update(f'key {array_key}'.encode())
+    elif value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        value_hash.update(f'{type(value).__name__} {value!r}'.encode())
+    elif isinstance(value, (list, tuple)):
+        value_hash.update(f'{type(value).__name__} {len(value)}'.encode())
+        return all(update_hash(value_hash, item) for item in value)
+    elif isinstance(value, dict):
+        value_hash.update(f'dict {len(value)}'.encode())
+        return all(update_hash(value_hash, key) and update_hash(value_hash, value[key]) for key in sorted(value))
+    else:
+        return False
+    return True
+
+
+def get_code_hash(function):
+    '''
+    The get_code_hash function returns the sha1 hash of the compiled code of
+    a function, so saved results are not used once the function is edited.
+    '''
+    code = function.__code__
+    code_hash = hashlib.sha1(code.co_code)
+    code_hash.update(repr(code.co_consts).encode())
+    return code_hash.hexdigest()
+
+
+def get_key(stage, arguments, code_hash=''):
+    '''
+    The get_key function will input the name of a stage and its arguments,
+    and return the key its result is saved under.
+
+    Parameters
+    ----------
+    stage : String
+        The name of the stage.
+    arguments : Dictionary
+        The value of every argument of the stage, by name (defaults included).
+    code_hash : String, optional
+        The hash of the code of the stage. The default is ''.
+
+    Returns
+    -------
+    key : String
+        The hex digest of the sha1 hash of everything above, or None if an
+        argument cannot be hashed by contents.
+
+    '''
+    key_hash = hashlib.sha1(f'{stage} {memo_version} {code_hash}'.encode())
+    if not update_hash(key_hash, arguments):
+        return None
+    return key_hash.hexdigest()
+
+#%% Saved results
+
+def get_cache_files(cache_dir):
+    '''
+    The get_cache_files function returns the paths of the saved results in a folder.
+    '''
+    if not os.path.isdir(cache_dir):
+        return []
+    return [entry.path for entry in os.scandir(cache_dir)
+            if entry.is_file() and entry.name.endswith('.npz') and '.tmp' not in entry.name]
+
+
+def read_result(path):
+    '''
+    The read_result function will read a saved result, and mark it as used
+    just now by touching its modification time. It returns (True, result),
+    or (False, None) if there is no result or it cannot be read.
+    '''
+    try:
+        with np.load(path) as saved:
+            kind = saved['kind'].item()
+            is_scalar = saved['is_scalar']
+            items = [saved[f'item_{index}'] for index in range(len(is_scalar))]
+        os.utime(path)
+    except (OSError, ValueError, KeyError):
+        return False, None
+    items = [item[()] if scalar else item for item, scalar in zip(items, is_scalar)]
+    if kind == 'single':
+        return True, items[0]
+    return True, tuple(items) if kind == 'tuple' else items
+
+
+def set_result_keys(result, key):
+    '''
+    The set_result_keys function will give the arrays of a stage result the
+    key the result is saved under, with the index of the item added for a
+    tuple or list, so the stages after it are keyed on it.
+    '''
+    if isinstance(result, np.ndarray):
+        set_array_key(result, key)
+    elif isinstance(result, (tuple, list)):
+        for index, item in enumerate(result):
+            if isinstance(item, np.ndarray):
+                set_array_key(item, f'{key}[{index}]')
+
+
+def save_result(path, result):
+    '''
+    The save_result function will save the result of a stage, an array or
+    number or a tuple or list of them, to a .npz file. It is written to a
+    temporary name and moved into place. Results of any other type are not
+    saved, and False is returned.
+    '''
+    if isinstance(result, (tuple, list)):
+        kind = type(result).__name__
+        items = list(result)
+    else:
+        kind = 'single'
+        items = [result]
+    if not all(isinstance(item, (np.ndarray, np.generic, bool, int, float)) for item in items):
+        return False
+
+    arrays = {f'item_{index}': np.asarray(item) for index, item in enumerate(items)}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(temp_path, kind=np.array(kind),
+             is_scalar=np.array([not isinstance(item, np.ndarray) for item in items], dtype=bool), **arrays)
+    os.replace(temp_path, path)
+    return True
+
+
+def evict(cache_dir, max_bytes):
+    '''
+    The evict function deletes the least recently used results in a folder
+    until the rest fit in max_bytes.
+    '''
+    files = []
+    for path in get_cache_files(cache_dir):
+        try:
+            status = os.stat(path)
+        except OSError:
+            continue
+        files.append((status.st_mtime, status.st_size, path))
+    total_bytes = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_bytes -= size
+
+#%% Decorator
+
+def memoized(stage=None):
+    '''
+    The memoized decorator saves the result of every call of a function on
+    disk, and reads it back the next time the function is called with the
+    same inputs. The arrays it returns are keyed on the key of the call (and
+    made read-only). When memoization is off the function is called straight away.
+
+    Parameters
+    ----------
+    stage : String, optional
+        The name of the stage. The default is None, which uses the name of the function.
+
+    '''
+    def decorator(function):
+        stage_name = stage or function.__name__
+        signature = inspect.signature(function)
+        code_hash = get_code_hash(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = get_key(stage_name, dict(arguments.arguments), code_hash)
+            if key is None:
+                return function(*args, **kwargs)
+
+            counts = _stats.setdefault(stage_name, {'hits': 0, 'misses': 0})
+            path = os.path.join(_cache_dir, f'{stage_name}_{key}.npz')
+            found, result = read_result(path)
+            if found:
+                counts['hits'] += 1
+            else:
+                counts['misses'] += 1
+                result = function(*args, **kwargs)
+                if save_result(path, result):
+                    evict(_cache_dir, _max_bytes)
+            set_result_keys(result, key)
+            return result
+        return wrapper
+    return decorator
@@ -8,15 +8,24 @@ It will take load in the data and filter it, and then detect the heartbeats.
 Following this, heart rate variability and it's frequency band power will also 
 be calculated. This is done to assess the autonomic nervous system (ANS) and quantitatively 
 estimate ANS activity.'
+The calculate functions do not plot, and the module does not import
+matplotlib. The plotting functions draw their graphs with Project_3_plots,
+which only imports matplotlib the first time something is plotted.
 
 @authors: Cole Richardson and Thomas Bausman
 """
 
 # import packages 
+from collections import deque
 import numpy as np
-from matplotlib import pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy import fft as fft
 from scipy.signal import find_peaks
+import Project_3_plots as p3p
+import Project_3_quality as p3q
+import Project_3_spectral as p3sp
+from Project_3_profiling import profiled
+from Project_3_memo import memoized
 
 #%% Part 1: Collect and Load data 
     
@@ -50,67 +59,8 @@ def plot_activities(data_1,data_2,data_3,data_4,time):
 
    '''
 
-    # assign fs 
-    fs = 500
-    # create figure 
-    plt.figure(1,clear=True,figsize=(8,6))
-    
-    # concatenate the arrays 
-    concatenated_data = np.concatenate([data_1,data_2, data_3, data_4])
-    concatenated_time = np.arange(0,len(concatenated_data)/fs,1/fs)
-    
-    # plot concatenated data on one graph 
-    plt.subplot(3,2,1)
-    plt.subplot2grid((3,2),(0,0),colspan=2)
-    plt.plot(concatenated_time,concatenated_data, label='Concatenated Data')
-    # titles and legend 
-    plt.title('Concatenated Activities')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.tight_layout()
-    
-    # create individual plots (only five seconds)
-    # plot activity 1 
-    plt.subplot(3,2,3)
-    plt.plot(time,data_1)
-    # label graph 
-    plt.title('Resting Activity')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.xlim(250,255)  # show only 5 seconds of data
-    plt.tight_layout()
-    
-    # plot activity 2 
-    plt.subplot(3,2,4)
-    plt.plot(time,data_2)
-    # label graph 
-    plt.title('Relaxing Activity')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.xlim(250,255)  # show only 5 seconds of data
-    plt.tight_layout()
-    
-    # plot activity 3 
-    plt.subplot(3,2,5)
-    plt.plot(time,data_3)
-    # label graph 
-    plt.title('Mental Activity')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.xlim(250,255)  # show only 5 seconds of data
-    plt.tight_layout()
-    
-    # plot activity 4 
-    plt.subplot(3,2,6)
-    plt.plot(time,data_4)
-    # label graph 
-    plt.title('Physical Activity')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.xlim(250,255)  # show only 5 seconds of data
-    plt.tight_layout()
-
-    plt.show()  # show plots
+    # plot with the rendering layer
+    p3p.plot_activities(data_1, data_2, data_3, data_4, time)
     
     
 #%% Part 2: Filter Your Data 
@@ -141,23 +91,54 @@ def filter_data(data, filt, title=''):
 
     '''
 
-    #define fs
-    fs= 500
     # convolve filter with data 
-    convolved_data = np.convolve(data, filt, mode='same')
-    #create time array
-    time = np.arange(0,len(data)/fs,1/fs)
+    convolved_data = apply_filter(data, filt)
     
     # plot data
-    plt.plot(time,convolved_data)
-    plt.title(f'Filtered {title}Data')
-    plt.xlabel('Time (sec)')
-    plt.ylabel('Voltage (mV)')
-    plt.xlim(250,255)
-    plt.tight_layout()
+    p3p.plot_filtered_data(convolved_data, title)
     
-    # show graph
-    plt.show()
+    return convolved_data
+    
+
+@profiled()
+@memoized()
+def apply_filter(data, filt):
+    '''
+    The apply_filter function does the calculation of filter_data without
+    plotting. It convolves the data set with the filter and returns the
+    filtered data set, the same length as the data. A 2D array of many
+    channels of the same length is filtered all at once with FFT convolution,
+    which gives the same result as filtering each row with np.convolve
+    (to floating point rounding).
+
+    Parameters
+    ----------
+    data : Array of floats. 
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity,
+        or a 2D array of channels x samples.
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+
+    Returns
+    -------
+    convolved_data : Array of floats. 
+        An array the same shape as data holding the result of the data being convolved with the filter.
+
+    '''
+    data = np.asarray(data)
+    if data.ndim == 1:
+        # convolve filter with data 
+        convolved_data = np.convolve(data, filt, mode='same')
+    else:
+        # convolve every row at once in the frequency domain
+        n_samples = data.shape[-1]
+        fft_size = fft.next_fast_len(n_samples + len(filt) - 1, real=True)
+        # the FFT size follows the recording length, so the response is not cached
+        filt_freq = fft.rfft(filt, fft_size)
+        full_data = fft.irfft(fft.rfft(data, fft_size, axis=-1)*filt_freq, fft_size, axis=-1)
+        # keep the middle of the full convolution, the same as mode='same'
+        start = (len(filt) - 1)//2
+        convolved_data = full_data[..., start:start + n_samples]
     
     return convolved_data
     
@@ -189,29 +170,231 @@ def detect_heartbeat(ecg_data,numtaps,title=''):
 
     '''
 
-    
-    #create fs
-    fs = 500
-    #create time array
-    time = np.arange(0,len(ecg_data)/fs,1/fs)
-    # Find peaks in the negative of the ECG signal (since find_peaks detects peaks)
-    positive_peaks, _ = find_peaks(ecg_data,height=1.7, distance=numtaps)
-
-    # Calculate the time of each heartbeat in seconds
-    time_of_heartbeat = time[positive_peaks]
+    # Find the index of each heartbeat
+    positive_peaks = find_heartbeat_indices(ecg_data, numtaps)
 
     # Plot the original ECG data with detected heartbeats
-    plt.plot(time, ecg_data, label='ECG Data')
-    plt.plot(time_of_heartbeat, ecg_data[positive_peaks], 'ro', label='Detected Heartbeats')
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('Amplitude')
-    plt.title(f'{title} Data with Detected Heartbeats')
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+    p3p.plot_heartbeats(ecg_data, positive_peaks, title)
+
+
+@profiled()
+@memoized()
+def find_heartbeat_indices(ecg_data, numtaps, height=1.7):
+    '''
+    The find_heartbeat_indices function will input a 1D data array and an
+    integer representing the length of the filter. It will find the peaks
+    above the height that are at least numtaps samples apart and return
+    the index of each one. For a 2D array of channels x samples, the peaks of
+    each row are found and a list with one array per row is returned, since
+    each row can have a different number of heartbeats.
+
+    Parameters
+    ----------
+    ecg_data : Array of floats. 
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity,
+        or a 2D array of channels x samples.
+    numtaps : Integer
+        An integer representing the length of the filter array.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+
+    Returns
+    -------
+    positive_peaks : Array of integers, or list of arrays of integers
+        A 1D array of the index of each heartbeat in ecg_data, or one array per row of a 2D ecg_data.
+
+    '''
+    ecg_data = np.asarray(ecg_data)
+    if ecg_data.ndim > 1:
+        # find_peaks goes over each row in one compiled pass; doing the same with numpy
+        # array operations over every row at once was about twice as slow, and its
+        # choice between equal peaks closer than numtaps differed from find_peaks
+        channels = ecg_data.reshape(-1, ecg_data.shape[-1])
+        return [find_peaks(channel, height=height, distance=numtaps)[0] for channel in channels]
+
+    # Find peaks in the ECG signal
+    positive_peaks, _ = find_peaks(ecg_data,height=height, distance=numtaps)
+
+    return positive_peaks
+
+@profiled()
+@memoized()
+def find_heartbeat_indices_adaptive(ecg_data, fs=500, slope_time=.032, integration_time=.15, refractory_time=.2,
+                                    search_time=.3, mask=None):
+    '''
+    The find_heartbeat_indices_adaptive function will input a 1D data array
+    and find the heartbeats with a Pan-Tompkins style detector, so no fixed
+    height has to be tuned for each recording. The slope of the data is taken
+    over slope_time, which passes the QRS band and drops the baseline, then
+    squared and smoothed with a moving window integrator (a running sum).
+    The peaks of the integrated signal are sorted into QRS
+    complexes and noise with a signal threshold and a noise threshold that
+    follow the recording as it goes. Missed beats are searched back for when
+    the gap since the last beat is too long, and T waves are skipped by their
+    smaller slope. Each heartbeat is then put on the highest sample within
+    search_time of its QRS complex, the same peak find_heartbeat_indices
+    finds on the filtered data. The signal processing is done on the whole
+    array at once, only the threshold update loops, and only over the peaks
+    of the integrated signal. It works on raw or filtered data of any gain.
+
+    Parameters
+    ----------
+    ecg_data : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity,
+        or a 2D array of channels x samples.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    slope_time : Float, optional
+        The time in seconds the slope is taken over. Its gain is largest at
+        1/(2*slope_time) Hz (about 15 Hz) and zero at 0 Hz and 1/slope_time Hz. The default is .032.
+    integration_time : Float, optional
+        The length of the moving window integrator in seconds, about the
+        length of a QRS complex. The default is .15.
+    refractory_time : Float, optional
+        The shortest time between two heartbeats in seconds. The default is .2.
+    search_time : Float, optional
+        How far in seconds from its QRS complex the peak of a heartbeat is
+        looked for. Wide ectopic beats have their highest point in the T wave
+        after them, so this is longer than a QRS complex. The default is .3.
+    mask : Array of booleans, optional
+        An array the same shape as ecg_data that is False in the bad segments
+        found by Project_3_quality. The peaks of the integrated signal there
+        are not candidates, so the thresholds are learned from the good
+        samples only. The default is None, which uses every sample.
+
+    Returns
+    -------
+    positive_peaks : Array of integers, or list of arrays of integers
+        A 1D array of the index of each heartbeat in ecg_data, or one array per row of a 2D ecg_data.
+
+    '''
+    ecg_data = np.asarray(ecg_data, dtype=float)
+    if ecg_data.ndim > 1:
+        # the rows are gone through one at a time: running the stages below on every row
+        # together was slower for long recordings, since one row stays in the CPU cache
+        channel_masks = [None]*len(ecg_data) if mask is None else np.asarray(mask, dtype=bool)
+        return [find_heartbeat_indices_adaptive(channel, fs, slope_time, integration_time, refractory_time,
+                                                search_time, channel_mask)
+                for channel, channel_mask in zip(ecg_data, channel_masks)]
+
+    # slope over slope_time, squared and summed over a window about as long as a QRS complex
+    slope_span = max(int(round(slope_time*fs/2)), 1)
+    window_length = max(int(round(integration_time*fs)), 1)
+    slope = ecg_data[2*slope_span:] - ecg_data[:-2*slope_span]
+    if len(slope) <= window_length:
+        return np.zeros(0, dtype=int)
+    squared_sum = np.cumsum(slope*slope)
+    integrated = squared_sum[window_length:] - squared_sum[:-window_length]
+    # integrated[i] covers slope[i + 1:i + 1 + window_length], so its middle is this far into ecg_data
+    center = slope_span + 1 + window_length//2
+
+    # every peak of the integrated signal is a candidate, along with the steepest slope under it
+    refractory = max(int(round(refractory_time*fs)), 1)
+    candidates, properties = find_peaks(integrated, distance=refractory, height=0)
+    values = properties['peak_heights']
+    learning = integrated
+    if mask is not None:
+        # only the good samples are candidates or set the starting levels
+        is_good = np.asarray(mask, dtype=bool)[center:center + len(integrated)]
+        candidates, values = candidates[is_good[candidates]], values[is_good[candidates]]
+        learning = integrated[is_good]
+    if len(candidates) == 0:
+        return candidates
+    max_slopes = sliding_window_view(np.abs(slope), window_length)[candidates + 1].max(axis=1)
+
+    # learn the starting signal and noise levels from the first 2 seconds
+    learning = learning[:2*fs]
+    signal_level = .25*np.max(learning)
+    noise_level = .5*np.mean(learning)
+
+    beats = []
+    beat_slopes = []
+    intervals = deque(maxlen=8)
+    skipped = []
+    for index, value, max_slope in zip(candidates.tolist(), values.tolist(), max_slopes.tolist()):
+        # nothing can be a heartbeat this soon after the last one
+        if beats and index - beats[-1] < refractory:
+            continue
+        threshold = noise_level + .25*(signal_level - noise_level)
+
+        # search back for a missed beat when the gap is much longer than usual
+        if skipped and intervals and index - beats[-1] > 1.66*sum(intervals)/len(intervals):
+            back_index, back_value, back_slope = max(skipped, key=lambda candidate: candidate[1])
+            if back_value > threshold/2:
+                intervals.append(back_index - beats[-1])
+                beats.append(back_index)
+                beat_slopes.append(back_slope)
+                signal_level = .25*back_value + .75*signal_level
+            skipped = []
+
+        is_beat = value > threshold
+        # a peak soon after a beat with half its slope is a T wave
+        if is_beat and beats and index - beats[-1] < .36*fs and max_slope < .5*beat_slopes[-1]:
+            is_beat = False
+
+        if is_beat:
+            if beats:
+                intervals.append(index - beats[-1])
+            beats.append(index)
+            beat_slopes.append(max_slope)
+            signal_level = .125*value + .875*signal_level
+            skipped = []
+        else:
+            noise_level = .125*value + .875*noise_level
+            skipped.append((index, value, max_slope))
+
+    # place each beat on the highest sample within search_time of its QRS complex
+    beats = np.array(beats, dtype=int) + center
+    search = min(int(round(search_time*fs)), (len(ecg_data) - 1)//2)
+    starts = np.clip(beats - search, 0, len(ecg_data) - 2*search - 1)
+    offsets = np.argmax(sliding_window_view(ecg_data, 2*search + 1)[starts], axis=1)
+    positive_peaks = np.unique(starts + offsets)
+    # two QRS complexes can share a highest sample, or move closer than the refractory time
+    keep = np.concatenate([[True], np.diff(positive_peaks) >= refractory])
+
+    return positive_peaks[keep]
+
+
+def match_beats(reference_indices, detected_indices, tolerance):
+    '''
+    The match_beats function will compare detected heartbeats to reference
+    heartbeats. A reference beat counts as found when a detected beat is
+    within tolerance samples of it.
+
+    Parameters
+    ----------
+    reference_indices : Array of integers.
+        A sorted 1D array of the index of each reference heartbeat.
+    detected_indices : Array of integers.
+        A sorted 1D array of the index of each detected heartbeat.
+    tolerance : Integer
+        The most samples a detected beat can be from a reference beat.
+
+    Returns
+    -------
+    sensitivity : Float
+        The fraction of the reference beats that were found.
+    positive_predictivity : Float
+        The fraction of the detected beats that are near a reference beat.
+
+    '''
+    reference_indices = np.asarray(reference_indices, dtype=int)
+    detected_indices = np.asarray(detected_indices, dtype=int)
+    if len(reference_indices) == 0 or len(detected_indices) == 0:
+        return 0.0, 0.0
+
+    # distance from every beat to the closest beat of the other set
+    def closest_distance(indices, other):
+        after = np.clip(np.searchsorted(other, indices), 0, len(other) - 1)
+        before = np.clip(after - 1, 0, len(other) - 1)
+        return np.minimum(np.abs(other[after] - indices), np.abs(other[before] - indices))
+
+    sensitivity = np.mean(closest_distance(reference_indices, detected_indices) <= tolerance)
+    positive_predictivity = np.mean(closest_distance(detected_indices, reference_indices) <= tolerance)
+    return float(sensitivity), float(positive_predictivity)
 
 #%% Getting heart beats
-def get_heartbeats(ecg_data,numtaps,time):
+def get_heartbeats(ecg_data,numtaps,time,height=1.7,method='height',fs=500,mask=None):
     
     '''
    The get_heartbeats function will input a 1D data array, an integer 
@@ -222,23 +405,59 @@ def get_heartbeats(ecg_data,numtaps,time):
    Parameters
    ----------
    ecg_data : Array of floats. 
-       A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+       A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity,
+       or a 2D array of channels x samples.
    numtaps : Integer
        An integer representing the length of the filter array.
    time : Array of floats
        A 1D array of n terms where n is the time recorded for each of the data samples.
+   height : Float, optional
+       The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+   method : String, optional
+       'height' to find the peaks above the height with find_heartbeat_indices, or
+       'adaptive' to use the thresholds of find_heartbeat_indices_adaptive, which
+       ignores height and numtaps. The default is 'height'.
+   fs : Integer, optional
+       The sampling frequency of the arduino sensor, used by the 'adaptive' method. The default is 500.
+   mask : Array of booleans, optional
+       An array the same shape as ecg_data that is False in the bad segments
+       found by Project_3_quality. The bad samples are filled in with
+       Project_3_quality.fill_bad_samples before the heartbeats are found, so
+       they add no peaks and do not set the thresholds of the 'adaptive'
+       method. The default is None, which uses every sample.
 
    Returns
    -------
-   time_of_heartbeat : Array of floats
-       A 1D array of n terms where n is the time that heartbeats occurred in the data set.
+   time_of_heartbeat : Array of floats, or list of arrays of floats
+       A 1D array of n terms where n is the time that heartbeats occurred in the data set,
+       or one array per row of a 2D ecg_data.
 
    '''
 
-    # Find peaks in the negative of the ECG signal (since find_peaks detects peaks)
-    positive_peaks, _ = find_peaks(ecg_data,height=1.7, distance=numtaps)
+    if method not in ('height', 'adaptive'):
+        raise ValueError(f"method must be 'height' or 'adaptive', not {method!r}")
+    # take out the bad segments before looking for heartbeats
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        ecg_data = p3q.fill_bad_samples(ecg_data, mask)
+
+    # Find peaks in the ECG signal
+    if method == 'height':
+        positive_peaks = find_heartbeat_indices(ecg_data, numtaps, height)
+    else:
+        positive_peaks = find_heartbeat_indices_adaptive(ecg_data, fs, mask=mask)
+
+    # a beat next to a bad segment can still be put on a filled in sample of equal height
+    if mask is not None:
+        if isinstance(positive_peaks, list):
+            positive_peaks = [channel_peaks[channel_mask[channel_peaks]]
+                              for channel_peaks, channel_mask in zip(positive_peaks, mask)]
+        else:
+            positive_peaks = positive_peaks[mask[positive_peaks]]
 
     # Calculate the time of each heartbeat in seconds
+    if isinstance(positive_peaks, list):
+        return [time[channel_peaks] for channel_peaks in positive_peaks]
     time_of_heartbeat = time[positive_peaks]
 
     return time_of_heartbeat
@@ -263,21 +482,152 @@ def calculate_hrv_plot(time_of_heartbeat,activity_types):
     -------
     None 
 
+    '''
+    # hrv by calculating the standard deviation of the intervals
+    hrv = calculate_hrv(time_of_heartbeat)
+    
+    p3p.plot_hrv(hrv, activity_types)
+
+
+@profiled()
+def calculate_hrv(time_of_heartbeat, valid=None):
+    '''
+    The calculate_hrv function does the calculation of calculate_hrv_plot
+    without plotting. It returns the heart rate variability (SDRR) of a data
+    set, the standard deviation of the intervals between heartbeats.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    valid : Array of booleans, optional
+        One term per interval that is False for the intervals to leave out,
+        from Project_3_quality.find_ibi_outliers. The default is None, which uses every interval.
+
+    Returns
+    -------
+    hrv : Float
+        The heart rate variability (SDRR) in seconds.
+
     '''
     # find interval between the beats by differentiation
     time_intervals = np.diff(time_of_heartbeat)
+    if valid is not None:
+        time_intervals = time_intervals[valid]
     
     # hrv by calculating the standard deviation
     hrv = np.std(time_intervals)
     
-    plt.bar(activity_types, [hrv])
-    plt.xlabel('Activity Data')
-    plt.ylabel('Heart Rate Variability (SDRR)')
-    plt.title('Heart Rate Variability for Different Activities')
-    plt.show()
+    return hrv
+
+#%% Interpolate inter-beat intervals
+
+@profiled()
+@memoized()
+def interpolate_ibi(time_of_heartbeat, dt=0.1, valid=None):
+    '''
+    The interpolate_ibi function will input a 1D array containing the times
+    heartbeats occurred and a time step. It will find the inter-beat intervals
+    (IBI) and interpolate them onto a regularly sampled time array so their
+    power spectrum can be taken.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    dt : Float, optional
+        The time step of the interpolated array in seconds. The default is 0.1.
+    valid : Array of booleans, optional
+        One term per interval that is False for the intervals to leave out,
+        from Project_3_quality.find_ibi_outliers. The intervals around them
+        are interpolated across the gap. The default is None, which uses every interval.
+
+    Returns
+    -------
+    regular_time : Array of floats.
+        A 1D array of the regularly sampled times, one for every interval, in steps of dt.
+    interpolated_ibi : Array of floats.
+        A 1D array of the inter-beat intervals interpolated at each of the regular times.
+
+    '''
+    # find interval between the beats by differentiation
+    time_intervals = np.diff(time_of_heartbeat)
+    # create time array for activity
+    regular_time = np.arange(0, len(time_intervals), dt)
+    interval_times = time_of_heartbeat[1:]
+    if valid is not None:
+        interval_times, time_intervals = interval_times[valid], time_intervals[valid]
+    # interpolate the intervals at the time of the beat that ends them
+    interpolated_ibi = np.interp(regular_time, interval_times, time_intervals)
+
+    return regular_time, interpolated_ibi
 
 #%% Part 5: Get HRV Frequency Band Power
 
+@profiled()
+@memoized()
+def calculate_power_spectrum(interpolated_data, resolution, dt=0.1, lf_band=p3sp.lf_band, hf_band=p3sp.hf_band):
+    '''
+    The calculate_power_spectrum function does the calculations of
+    get_power_spectrum without plotting. It takes in IBI data sampled at dt
+    and returns its frequencies, power spectrum and the average power in the
+    low frequency (LF, 0.04-0.15 Hz) and high frequency (HF, 0.15-0.4 Hz) bands.
+    A 2D array of rows of the same length gets the spectrum of every row from
+    one call, with one LF and HF average per row.
+
+    Parameters
+    ----------
+    interpolated_data : Array of float
+        This input expects an array of IBI data that has already been interpolated
+        to a sample rate of dt, or a 2D array with one row per data set
+    resolution : integer or array of float
+        This integer should be the last number in your time array to normalize your
+        data for a more accurate result. For 2D data it can also be one number per row.
+    dt : Float, optional
+        The time step of the interpolated data in seconds. The default is 0.1.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    x_f : array of float
+        The frequency of each term of the power spectrum in Hz
+    power : array of float
+        This is the power spectrum of the interpolated data in arbitrary power units
+        (one row per data set for 2D data)
+    avg_lf : float or array of float
+        Average power of LF
+    avg_hf : float or array of float
+        Average power of HF
+
+    '''
+    interpolated_data = np.asarray(interpolated_data)
+    #take real fourier transform of interpolated data (along each row for 2D data)
+    fft_result = fft.rfft(interpolated_data, axis=-1)
+    
+    #create frequency domain (cached for each length, dt and bands, along with the LF and HF ranges)
+    x_f, lf_range, hf_range = p3sp.get_frequency_grid(interpolated_data.shape[-1], dt, tuple(lf_band), tuple(hf_band))
+    
+    #line up one resolution per row with the rows of the spectrum
+    resolution = np.asarray(resolution)
+    if resolution.ndim > 0:
+        resolution = resolution[..., np.newaxis]
+    
+    # get the max power of the array
+    power = np.square(np.abs(fft_result)) / resolution
+    
+    power[..., 0] = 0 #remove spike at 0
+    
+    #LF data between .04 and .15Hz and HF data between .15 and .4Hz (by default)
+    avg_lf = np.average(power[..., lf_range], axis=-1)
+    
+    avg_hf = np.average(power[..., hf_range], axis=-1)
+    
+    return x_f, power, avg_lf, avg_hf
+
+
 def get_power_spectrum(interpolated_data, resolution):
     """
     The get_power_spectrum function takes in data sampled at a dt of 0.1 along with its resolution
@@ -310,46 +660,10 @@ def get_power_spectrum(interpolated_data, resolution):
 """
     #define dt
     dt = 0.1
-    #take real fourier transform of interpolated data
-    fft_result = fft.rfft(interpolated_data)
-    
-    #create frequency domain
-    x_f = fft.rfftfreq(len(interpolated_data),dt)
-    
-    # get the max power of the array
-    power = np.square(np.abs(fft_result)) / resolution
-    
-    power[0] = 0 #remove spike at 0
-    #plot data
-    plt.plot(x_f, power)
-    plt.xlabel('Frequency (Hz)')
-    plt.ylabel('Power (A.U.)')
-    plt.xlim(0,0.5)
-    plt.ylim(0,10)
-    
-    #set cuttoff points in Hz
-    lf_start = .04
-    lf_cut = .15
-    hf_start= .15
-    hf_cut = .4
-    
-    #color the graph and highlight LF and HF
-    
-    out_range = np.where((x_f >= 0) & (x_f <= lf_start))[0] #data below low cutoff
-    
-    lf_range = np.where((x_f >= lf_start) & (x_f <= lf_cut))[0] #LF data between .04 and .15Hz
-
-    hf_range = np.where((x_f >= hf_start) & (x_f <= hf_cut))[0] #HF data between .15 and .4Hz
-    
-    plt.fill_between(x_f[out_range], power[out_range], color='grey', alpha=0.4) #fill in with color
-    
-    plt.fill_between(x_f[lf_range], power[lf_range], color='palegreen', alpha=0.4, label='LF Area') #fill in with color
-    
-    plt.fill_between(x_f[hf_range], power[hf_range], color='moccasin', alpha=0.7, label='HF Area') #fill in with color
-    plt.legend()
-    
-    avg_lf = np.average(power[lf_range])
+    #calculate the power spectrum and band averages
+    x_f, power, avg_lf, avg_hf = calculate_power_spectrum(interpolated_data, resolution, dt)
     
-    avg_hf = np.average(power[hf_range])
+    #plot data with LF and HF highlighted
+    p3p.plot_power_spectrum(x_f, power)
     
     return power, avg_lf, avg_hf
\ No newline at end of file
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_plots.py
+Created on Sat Oct 17 12:41:09 2026
+This module holds the plotting for the Project 3 ECG analysis. The functions in
+Project_3_module only calculate, and call these to draw their graphs.
+matplotlib is slow to import, so it is only imported the first time
+something is plotted. Code that only needs the numbers (like the batch
+pipeline) never loads it. Recordings are drawn from a min/max decimation
+pyramid that is built once per recording, so only about two points per
+pixel of the visible time window are plotted however long the recording is.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import weakref
+import numpy as np
+
+# matplotlib.pyplot, imported the first time it is needed
+_plt = None
+# decimation pyramids of the recordings plotted so far, by the id of their array
+_pyramids = {}
+
+def get_pyplot():
+    '''
+    The get_pyplot function will import matplotlib.pyplot the first time it is
+    called and return it. Later calls return the module that was already imported.
+
+    Returns
+    -------
+    plt : Module
+        The matplotlib.pyplot module.
+
+    '''
+    global _plt
+    if _plt is None:
+        from matplotlib import pyplot
+        _plt = pyplot
+    return _plt
+
+#%% Decimation pyramid
+
+def build_pyramid(data, factor=4):
+    '''
+    The build_pyramid function will input a 1D data array and return its
+    min/max decimation pyramid. Level 1 holds the min and max of every
+    factor samples, level 2 of every factor**2 samples and so on, until a
+    level has only a few bins. Each level is made from the one below it, so
+    the whole pyramid takes one pass over the data and, with factor=4, about
+    2/3 of the memory of the data.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of a recording.
+    factor : Integer, optional
+        The number of bins of one level in each bin of the next. The default is 4.
+
+    Returns
+    -------
+    pyramid : List of tuples
+        One (bin_size, mins, maxs) tuple per level, from the finest to the coarsest.
+
+    '''
+    data = np.asarray(data)
+    pyramid = []
+    mins, maxs, bin_size = data, data, 1
+    while len(mins) > factor:
+        # the last bin can be shorter than the others
+        starts = np.arange(0, len(mins), factor)
+        mins = np.minimum.reduceat(mins, starts)
+        maxs = np.maximum.reduceat(maxs, starts)
+        bin_size *= factor
+        pyramid.append((bin_size, mins, maxs))
+    return pyramid
+
+
+def get_pyramid(data):
+    '''
+    The get_pyramid function will return the decimation pyramid of a data
+    array, building it the first time it is asked for. The pyramid is kept
+    until the array itself is deleted.
+    '''
+    key = id(data)
+    if key not in _pyramids:
+        _pyramids[key] = build_pyramid(data)
+        # forget the pyramid when the array goes away, since its id can be reused
+        weakref.finalize(data, _pyramids.pop, key, None)
+    return _pyramids[key]
+
+
+def get_window_samples(data, fs=500, start_time=None, stop_time=None, n_pixels=1000):
+    '''
+    The get_window_samples function will return only the samples needed to
+    draw a time window of a recording n_pixels wide. If the window has only a
+    few samples per pixel they are returned as they are. Otherwise the
+    coarsest level of the pyramid that still has a bin per pixel is used, and
+    the min and max of each bin are returned one after the other, so the
+    line still reaches every peak and trough. The number of samples returned
+    depends on n_pixels and not on the length of the recording.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of a recording.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    start_time : Float, optional
+        The time of the start of the window in seconds. The default is None, which uses the start of the recording.
+    stop_time : Float, optional
+        The time of the end of the window in seconds. The default is None, which uses the end of the recording.
+    n_pixels : Integer, optional
+        The width of the plot in pixels. The default is 1000.
+
+    Returns
+    -------
+    time : Array of floats.
+        A 1D array of the time of each returned sample in seconds.
+    values : Array of floats.
+        A 1D array of the returned samples.
+
+    '''
+    n_samples = len(data)
+    start = 0 if start_time is None else int(np.clip(np.floor(start_time*fs), 0, n_samples))
+    stop = n_samples if stop_time is None else int(np.clip(np.ceil(stop_time*fs) + 1, start, n_samples))
+
+    # pick the coarsest level with at least one bin per pixel
+    level = None
+    for bin_size, mins, maxs in get_pyramid(data):
+        if (stop - start)/bin_size < n_pixels:
+            break
+        level = (bin_size, mins, maxs)
+    if level is None:
+        return np.arange(start, stop)/fs, np.asarray(data[start:stop])
+
+    bin_size, mins, maxs = level
+    first_bin, last_bin = start//bin_size, -(-stop//bin_size)
+    # draw each bin as a line from its min to its max
+    time = np.repeat(np.arange(first_bin, last_bin)*bin_size/fs, 2)
+    values = np.column_stack([mins[first_bin:last_bin], maxs[first_bin:last_bin]]).ravel()
+    return time, values
+
+
+def plot_decimated(data, fs=500, time_offset=0, ax=None, oversample=2, **plot_options):
+    '''
+    The plot_decimated function will plot a recording against time using
+    get_window_samples, so only the samples that can be seen are drawn. The
+    line is redrawn with new samples every time the x limits of the axes
+    change, so zooming in with plt.xlim after plotting still shows every sample.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of a recording.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    time_offset : Float, optional
+        The time in seconds of the first sample, used to plot recordings one after another. The default is 0.
+    ax : Axes, optional
+        The axes to plot on. The default is None, which uses the current axes.
+    oversample : Integer, optional
+        The number of bins per pixel of the axes. The default is 2.
+    **plot_options
+        Passed on to ax.plot (color, label, ...).
+
+    Returns
+    -------
+    line : Line2D
+        The plotted line.
+
+    '''
+    if ax is None:
+        ax = get_pyplot().gca()
+
+    def get_samples(start_time=None, stop_time=None):
+        n_pixels = max(int(ax.bbox.width), 100)*oversample
+        if start_time is not None:
+            start_time, stop_time = start_time - time_offset, stop_time - time_offset
+        time, values = get_window_samples(data, fs, start_time, stop_time, n_pixels)
+        return time + time_offset, values
+
+    line, = ax.plot(*get_samples(), **plot_options)
+
+    def update_line(changed_ax):
+        line.set_data(*get_samples(*sorted(changed_ax.get_xlim())))
+
+    ax.callbacks.connect('xlim_changed', update_line)
+    return line
+
+#%% Part 1: Collect and Load data
+
+def plot_activities(data_1,data_2,data_3,data_4,time):
+    '''
+    The plot_activities function receives 4 1D data arrays and a 1D time array.
+    Using the inputs the function will create 5 different plots on 1 figure.
+    The first will be all of the data plotted one recording after another.
+    The next 4 will be the individual data arrays, zoomed in to 5 seconds.
+
+    Parameters
+    ----------
+    data_1 : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+    data_2 : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+    data_3 : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+    data_4 : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+    time : Array of floats.
+        A 1D array of n terms where n is the time recorded for each of the data samples.
+        It is no longer used, the time of each sample comes from fs.
+
+    Returns
+    -------
+    None.
+
+    '''
+    plt = get_pyplot()
+
+    # assign fs
+    fs = 500
+    # create figure
+    plt.figure(1,clear=True,figsize=(8,6))
+
+    # plot the recordings one after another on one graph, without concatenating them
+    plt.subplot(3,2,1)
+    plt.subplot2grid((3,2),(0,0),colspan=2)
+    time_offset = 0
+    for data in [data_1, data_2, data_3, data_4]:
+        plot_decimated(data, fs, time_offset, color='C0',
+                       label='Concatenated Data' if time_offset == 0 else '_nolegend_')
+        time_offset += len(data)/fs
+    # titles and legend
+    plt.title('Concatenated Activities')
+    plt.xlabel('Time (sec)')
+    plt.ylabel('Voltage (mV)')
+    plt.tight_layout()
+
+    # create individual plots (only five seconds)
+    titles = ['Resting Activity', 'Relaxing Activity', 'Mental Activity', 'Physical Activity']
+    for plot_index, (data, title) in enumerate(zip([data_1, data_2, data_3, data_4], titles)):
+        plt.subplot(3,2,plot_index + 3)
+        plot_decimated(data, fs)
+        # label graph
+        plt.title(title)
+        plt.xlabel('Time (sec)')
+        plt.ylabel('Voltage (mV)')
+        plt.xlim(250,255)  # show only 5 seconds of data
+        plt.tight_layout()
+
+    plt.show()  # show plots
+
+#%% Part 2: Filter Your Data
+
+def plot_filtered_data(filtered_data, title='', fs=500):
+    '''
+    The plot_filtered_data function will plot a filtered data set against
+    time, zoomed in to 5 seconds, with the inputted title.
+
+    Parameters
+    ----------
+    filtered_data : Array of floats.
+        A 1D array of n terms where n represents the result of the data being convolved with the filter.
+    title : String, optional
+        String that represents the desired title of the graph. The default is ''.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    Returns
+    -------
+    None.
+
+    '''
+    plt = get_pyplot()
+
+    # plot data
+    plot_decimated(filtered_data, fs)
+    plt.title(f'Filtered {title}Data')
+    plt.xlabel('Time (sec)')
+    plt.ylabel('Voltage (mV)')
+    plt.xlim(250,255)
+    plt.tight_layout()
+
+    # show graph
+    plt.show()
+
+#%% Part 3: Detect Heartbeats
+
+def plot_heartbeats(ecg_data, heartbeat_indices, title='', fs=500):
+    '''
+    The plot_heartbeats function will plot ECG data against time and mark
+    the detected heartbeats on top of it with red dots.
+
+    Parameters
+    ----------
+    ecg_data : Array of floats.
+        A 1D array of n terms where n is the voltage recorded from the arduino sensor for a particular activity.
+    heartbeat_indices : Array of integers.
+        A 1D array of the index of each heartbeat in ecg_data.
+    title : String, optional
+        A string representing the desired title for the graph. The default is ''.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    Returns
+    -------
+    None.
+
+    '''
+    plt = get_pyplot()
+
+    # Calculate the time of each heartbeat in seconds
+    time_of_heartbeat = np.asarray(heartbeat_indices)/fs
+
+    # Plot the original ECG data with detected heartbeats
+    plot_decimated(ecg_data, fs, label='ECG Data')
+    plt.plot(time_of_heartbeat, ecg_data[heartbeat_indices], 'ro', label='Detected Heartbeats')
+    plt.xlabel('Time (seconds)')
+    plt.ylabel('Amplitude')
+    plt.title(f'{title} Data with Detected Heartbeats')
+    plt.legend()
+    plt.tight_layout()
+    plt.show()
+
+#%% Part 4: Heart Rate Variability
+
+def plot_hrv(hrv, activity_types):
+    '''
+    The plot_hrv function will add the heart rate variability of a data set
+    to a bar graph, labeled for the inputted activity type.
+
+    Parameters
+    ----------
+    hrv : Float
+        The heart rate variability (SDRR) of the data set.
+    activity_types : String
+        The activity type of the data set.
+
+    Returns
+    -------
+    None.
+
+    '''
+    plt = get_pyplot()
+
+    plt.bar(activity_types, [hrv])
+    plt.xlabel('Activity Data')
+    plt.ylabel('Heart Rate Variability (SDRR)')
+    plt.title('Heart Rate Variability for Different Activities')
+    plt.show()
+
+#%% Part 5: Get HRV Frequency Band Power
+
+def plot_power_spectrum(x_f, power):
+    '''
+    The plot_power_spectrum function will plot a power spectrum zoomed in to
+    0-.5 Hz and 10 units of power, and color the parts below LF (grey),
+    LF (0.04-0.15 Hz, green) and HF (0.15-0.4 Hz, orange).
+
+    Parameters
+    ----------
+    x_f : array of float
+        The frequency of each term of the power spectrum in Hz
+    power : array of float
+        The power spectrum in arbitrary power units
+
+    Returns
+    -------
+    None.
+
+    '''
+    plt = get_pyplot()
+
+    #plot data
+    plt.plot(x_f, power)
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Power (A.U.)')
+    plt.xlim(0,0.5)
+    plt.ylim(0,10)
+
+    #set cuttoff points in Hz
+    lf_start = .04
+    lf_cut = .15
+    hf_start= .15
+    hf_cut = .4
+
+    #color the graph and highlight LF and HF
+
+    out_range = np.where((x_f >= 0) & (x_f <= lf_start))[0] #data below low cutoff
+
+    lf_range = np.where((x_f >= lf_start) & (x_f <= lf_cut))[0] #LF data between .04 and .15Hz
+
+    hf_range = np.where((x_f >= hf_start) & (x_f <= hf_cut))[0] #HF data between .15 and .4Hz
+
+    plt.fill_between(x_f[out_range], power[out_range], color='grey', alpha=0.4) #fill in with color
+
+    plt.fill_between(x_f[lf_range], power[lf_range], color='palegreen', alpha=0.4, label='LF Area') #fill in with color
+
+    plt.fill_between(x_f[hf_range], power[hf_range], color='moccasin', alpha=0.7, label='HF Area') #fill in with color
+    plt.legend()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_precision.py
+Created on Sat Oct 17 22:31:09 2026
+This module runs the Project 3 ECG analysis in single precision, for large
+groups of recordings where memory and speed matter more than the last
+digits. Project_3_module does everything in float64, even though the
+arduino only sends 10 bit ADC counts. Here the recordings stay as int16
+counts (Project_3_loader.load_counts). The conversion to volts is folded
+into the filter taps, so it costs nothing. Filtering and the power spectrum
+are done in float32. The recording then takes a quarter of the memory and
+the filtered data half, and twice as many samples fit in each SIMD register.
+
+The functions also give error bounds against the float64 path. On the
+bundled recordings the filtered data are within 1e-6 V of apply_filter,
+against a bound of about 2.2e-5 V, and the heartbeats are the same. A
+heartbeat can only change if a peak is within the error of the height, or
+moves by one sample if the two samples at its top are within the error of
+each other (this happens about once in 700 beats of synthetic ECG). The band
+powers agree to about 1e-7 of their size.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import numpy as np
+from scipy import fft as fft
+import Project_3_module as p3m
+import Project_3_loader as p3l
+import Project_3_spectral as p3sp
+import Project_3_stream as p3s
+from Project_3_profiling import profiled
+
+# the precision the calculations are done in
+precision_dtype = np.float32
+# smallest FFT length of the filter blocks
+block_fft_size = 1 << 14
+# number of blocks filtered at a time
+chunk_blocks = 4
+
+#%% Part 2: Filter Your Data
+
+def get_block_fft_size(numtaps, fft_size=None):
+    '''
+    The get_block_fft_size function returns the FFT length apply_filter_counts
+    uses for a filter: fft_size if it is given, otherwise block_fft_size or
+    the smallest power of two at least 8 times the filter length, whichever is larger.
+    '''
+    if fft_size is None:
+        fft_size = max(block_fft_size, p3s.get_block_size(numtaps))
+    if fft_size < numtaps:
+        raise ValueError('fft_size must be at least the length of the filter')
+    return fft_size
+
+
+@profiled()
+def apply_filter_counts(counts, filt, dtype=precision_dtype, fft_size=None):
+    '''
+    The apply_filter_counts function will filter ADC counts with a filter
+    designed for volts, and return the filtered data in volts. It gives
+    Project_3_module.apply_filter(counts*volts_per_count, filt) to within
+    get_filter_error_bound. The counts are convolved in dtype by a
+    Project_3_stream.StreamingFilter, with the conversion to volts folded into
+    its filter response. They are fed to it chunk_blocks blocks at a time and
+    each chunk is written straight into the output, so besides the output
+    only one chunk is held. A 2D array of channels x samples is filtered row by row.
+
+    Parameters
+    ----------
+    counts : Array of integers.
+        A 1D array of the ADC count of each sample, or a 2D array of channels x samples.
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    dtype : Numpy dtype, optional
+        The precision of the calculation. The default is float32.
+    fft_size : Integer, optional
+        The length of the FFT of each block. The default is None, which uses get_block_fft_size.
+
+    Returns
+    -------
+    convolved_data : Array of floats.
+        An array the same shape as counts of the filtered data in volts, in dtype.
+
+    '''
+    counts = np.asarray(counts)
+    if counts.ndim > 1:
+        convolved_data = np.empty(counts.shape, dtype=dtype)
+        for channel in range(counts.shape[0]):
+            convolved_data[channel] = apply_filter_counts(counts[channel], filt, dtype, fft_size)
+        return convolved_data
+
+    streaming_filter = p3s.StreamingFilter(filt, get_block_fft_size(len(filt), fft_size), dtype,
+                                           p3l.volts_per_count)
+    convolved_data = np.empty(len(counts), dtype=dtype)
+    n_out = 0
+    for chunk in p3s.iterate_chunks(counts, chunk_blocks*streaming_filter.step):
+        filtered_chunk = streaming_filter.process(chunk)
+        convolved_data[n_out:n_out + len(filtered_chunk)] = filtered_chunk
+        n_out += len(filtered_chunk)
+    convolved_data[n_out:] = streaming_filter.flush()
+    return convolved_data
+
+
+def get_filter_error_bound(filt, fft_size=None, dtype=precision_dtype):
+    '''
+    The get_filter_error_bound function will return how far the output of
+    apply_filter_counts can be from the float64 apply_filter, in volts. It
+    uses the usual bound for floating point FFT convolution: each output is
+    off by at most (log2 of the FFT length + 3) roundings of the largest sum
+    the filter can make, max_count*volts_per_count*sum(|filt|).
+
+    Parameters
+    ----------
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    fft_size : Integer, optional
+        The FFT length given to apply_filter_counts. The default is None.
+    dtype : Numpy dtype, optional
+        The precision of the calculation. The default is float32.
+
+    Returns
+    -------
+    error_bound : Float
+        The largest difference in volts between the filtered samples of the two paths.
+
+    '''
+    eps = np.finfo(dtype).eps
+    largest_output = p3l.max_count*p3l.volts_per_count*np.sum(np.abs(filt))
+    return float((np.log2(get_block_fft_size(len(filt), fft_size)) + 3)*eps*largest_output)
+
+#%% Part 5: Get HRV Frequency Band Power
+
+@profiled('calculate_power_spectrum_float32')
+def calculate_power_spectrum(interpolated_data, resolution, dt=0.1, dtype=precision_dtype,
+                             lf_band=p3sp.lf_band, hf_band=p3sp.hf_band):
+    '''
+    The calculate_power_spectrum function does what
+    Project_3_module.calculate_power_spectrum does, but takes the FFT and
+    power in dtype. The IBI data are interpolated in float64 first, since
+    there are only a few thousand of them.
+
+    Parameters
+    ----------
+    interpolated_data : Array of float
+        An array of IBI data interpolated to a sample rate of dt, or a 2D array with one row per data set.
+    resolution : integer or array of float
+        The last number in the time array, to normalize the power. For 2D data it can also be one number per row.
+    dt : Float, optional
+        The time step of the interpolated data in seconds. The default is 0.1.
+    dtype : Numpy dtype, optional
+        The precision of the calculation. The default is float32.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    x_f : array of float
+        The frequency of each term of the power spectrum in Hz
+    power : array of float
+        The power spectrum of the interpolated data in dtype (one row per data set for 2D data)
+    avg_lf : float or array of float
+        Average power of LF
+    avg_hf : float or array of float
+        Average power of HF
+
+    '''
+    interpolated_data = np.asarray(interpolated_data).astype(dtype)
+    # scipy keeps single precision through the FFT
+    fft_result = fft.rfft(interpolated_data, axis=-1)
+    x_f, lf_range, hf_range = p3sp.get_frequency_grid(interpolated_data.shape[-1], dt, tuple(lf_band), tuple(hf_band))
+
+    resolution = np.asarray(resolution, dtype=dtype)
+    if resolution.ndim > 0:
+        resolution = resolution[..., np.newaxis]
+    power = np.square(np.abs(fft_result))/resolution
+    power[..., 0] = 0
+
+    avg_lf = np.average(power[..., lf_range], axis=-1)
+    avg_hf = np.average(power[..., hf_range], axis=-1)
+    return x_f, power, avg_lf, avg_hf
+
+
+def get_power_error_bound(interpolated_data, resolution, dtype=precision_dtype):
+    '''
+    The get_power_error_bound function will return how far each term of the
+    power spectrum (and so each band average) from calculate_power_spectrum
+    can be from the float64 one. Each FFT term is off by at most
+    delta = (log2(n) + 3)*eps times sum(|x|), the largest an FFT term can be,
+    so its power is off by at most (2*delta + delta**2)*sum(|x|)**2/resolution.
+
+    Parameters
+    ----------
+    interpolated_data : Array of float
+        A 1D array of interpolated IBI data.
+    resolution : Float
+        The number the power is normalized by.
+    dtype : Numpy dtype, optional
+        The precision of the calculation. The default is float32.
+
+    Returns
+    -------
+    error_bound : Float
+        The largest difference between the power of the two paths.
+
+    '''
+    eps = np.finfo(dtype).eps
+    delta = (np.log2(max(len(interpolated_data), 2)) + 3)*eps
+    return float((2*delta + delta**2)*np.sum(np.abs(interpolated_data))**2/resolution)
+
+#%% Whole analysis
+
+def analyze_counts(counts, filt, numtaps=250, height=1.7, dt=0.1, fs=500, dtype=precision_dtype):
+    '''
+    The analyze_counts function will run the whole analysis on the ADC
+    counts of one recording in dtype: filter, detect the heartbeats, find the
+    SDRR, interpolate the inter-beat intervals and find the average LF and HF
+    power. The heartbeat times and SDRR are found from the sample indices in
+    float64, so no time array is made.
+
+    Parameters
+    ----------
+    counts : Array of integers.
+        A 1D array of the ADC count of each sample, from Project_3_loader.load_counts.
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    dtype : Numpy dtype, optional
+        The precision of the filtering and power spectrum. The default is float32.
+
+    Returns
+    -------
+    result : Dictionary
+        The time of each heartbeat, the SDRR, LF, HF and LF/HF ratio, and the
+        error bounds of the filtered data and the power spectrum.
+
+    '''
+    filtered_data = apply_filter_counts(counts, filt, dtype)
+    time_of_heartbeat = p3m.find_heartbeat_indices(filtered_data, numtaps, height)*(1/fs)
+    result = {'time_of_heartbeat': time_of_heartbeat,
+              'filter_error_bound': get_filter_error_bound(filt, dtype=dtype),
+              'sdrr': np.nan, 'lf': np.nan, 'hf': np.nan, 'lf_hf_ratio': np.nan, 'power_error_bound': np.nan}
+    if len(time_of_heartbeat) > 2:
+        regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat, dt)
+        _, _, avg_lf, avg_hf = calculate_power_spectrum(interpolated_ibi, regular_time[-1], dt, dtype)
+        result.update({'sdrr': float(p3m.calculate_hrv(time_of_heartbeat)),
+                       'lf': float(avg_lf),
+                       'hf': float(avg_hf),
+                       'lf_hf_ratio': float(avg_lf/avg_hf) if avg_hf > 0 else np.nan,
+                       'power_error_bound': get_power_error_bound(interpolated_ibi, regular_time[-1], dtype)})
+    return result
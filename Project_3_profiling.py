@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_profiling.py
+Created on Sat Oct 17 16:31:48 2026
+This module measures where the time goes in the Project 3 ECG analysis. The
+functions in Project_3_module and Project_3_loader are wrapped with the
+profiled decorator, and any other block of code can be measured with the
+profile_stage context manager. For each stage and recording it records the
+wall time, CPU time, bytes of data processed and peak memory allocated. The
+measurements can be saved as json or as a Prometheus text file. Profiling
+is off by default, and then the wrappers only check one flag before calling
+the function.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import functools
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# profiling state
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_recording = None
+_records = []
+# stages that are running, innermost last
+_stack = []
+
+#%% Turn profiling on and off
+
+def enable_profiling(trace_memory=True):
+    '''
+    The enable_profiling function will turn profiling on.
+
+    Parameters
+    ----------
+    trace_memory : Boolean, optional
+        If True the peak memory of each stage is measured with tracemalloc,
+        which slows numpy allocations down a little. The default is True.
+
+    Returns
+    -------
+    None.
+
+    '''
+    global _enabled, _trace_memory, _started_tracemalloc
+    _enabled = True
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable_profiling():
+    '''
+    The disable_profiling function will turn profiling off. The measurements
+    taken so far are kept until reset_profiling is called.
+
+    Returns
+    -------
+    None.
+
+    '''
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_enabled():
+    '''
+    The is_enabled function returns True if profiling is on.
+    '''
+    return _enabled
+
+
+def reset_profiling():
+    '''
+    The reset_profiling function clears every measurement taken so far.
+    '''
+    _records.clear()
+
+
+def add_records(records):
+    '''
+    The add_records function adds measurements taken somewhere else, like in
+    a worker process, to the measurements of this process.
+    '''
+    _records.extend(records)
+
+
+def get_records():
+    '''
+    The get_records function returns a copy of the list of measurements, one
+    dictionary per call with the keys 'stage', 'recording', 'wall_time',
+    'cpu_time', 'bytes' and 'peak_memory'.
+    '''
+    return [dict(record) for record in _records]
+
+#%% Measure stages
+
+@contextmanager
+def profile_recording(name):
+    '''
+    The profile_recording context manager tags every stage run inside it
+    with the name of the recording being analyzed.
+
+    Parameters
+    ----------
+    name : String
+        The name of the recording.
+
+    '''
+    global _recording
+    previous_recording = _recording
+    _recording = name
+    try:
+        yield
+    finally:
+        _recording = previous_recording
+
+
+@contextmanager
+def profile_stage(stage, n_bytes=0):
+    '''
+    The profile_stage context manager measures the block of code inside it
+    as one stage. When profiling is off it does nothing. A stage that is
+    already running is not measured again inside itself.
+
+    Parameters
+    ----------
+    stage : String
+        The name of the stage.
+    n_bytes : Integer, optional
+        The number of bytes of data the stage processes. The default is 0.
+
+    '''
+    if not _enabled or any(frame['stage'] == stage for frame in _stack):
+        yield
+        return
+
+    measure_memory = _trace_memory and tracemalloc.is_tracing()
+    frame = {'stage': stage, 'start_memory': 0, 'peak': 0}
+    if measure_memory:
+        current_memory, peak_so_far = tracemalloc.get_traced_memory()
+        # the stage this one runs inside keeps its peak so far, since it is reset here
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'], peak_so_far)
+        tracemalloc.reset_peak()
+        frame['start_memory'] = current_memory
+    _stack.append(frame)
+    start_cpu = time.process_time()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_time = time.perf_counter() - start_time
+        cpu_time = time.process_time() - start_cpu
+        _stack.pop()
+        peak_memory = 0
+        if measure_memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            peak_memory = max(peak - frame['start_memory'], 0)
+        _records.append({'stage': stage,
+                         'recording': _recording,
+                         'wall_time': wall_time,
+                         'cpu_time': cpu_time,
+                         'bytes': int(n_bytes),
+                         'peak_memory': int(peak_memory)})
+
+
+def get_bytes(arguments):
+    '''
+    The get_bytes function will add up the size in bytes of every numpy array
+    (or other object with an nbytes attribute) in a list of arguments.
+    '''
+    return sum(getattr(argument, 'nbytes', 0) for argument in arguments)
+
+
+def profiled(stage=None):
+    '''
+    The profiled decorator measures every call of a function as a stage
+    named after the function. The bytes processed are the total size of the
+    array arguments. When profiling is off the function is called straight away.
+
+    Parameters
+    ----------
+    stage : String, optional
+        The name of the stage. The default is None, which uses the name of the function.
+
+    '''
+    def decorator(function):
+        stage_name = stage or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with profile_stage(stage_name, get_bytes(args)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+#%% Summaries and export
+
+def summarize(records=None):
+    '''
+    The summarize function will add up the measurements for each stage and
+    recording.
+
+    Parameters
+    ----------
+    records : List of dictionaries, optional
+        The measurements to add up. The default is None, which uses every
+        measurement taken so far.
+
+    Returns
+    -------
+    summary : List of dictionaries
+        One row per stage and recording with the number of calls, total wall
+        time, total CPU time, total bytes and the largest peak memory.
+
+    '''
+    if records is None:
+        records = _records
+    totals = {}
+    for record in records:
+        key = (record['stage'], record['recording'])
+        if key not in totals:
+            totals[key] = {'stage': record['stage'], 'recording': record['recording'], 'calls': 0,
+                           'wall_time': 0.0, 'cpu_time': 0.0, 'bytes': 0, 'peak_memory': 0}
+        total = totals[key]
+        total['calls'] += 1
+        total['wall_time'] += record['wall_time']
+        total['cpu_time'] += record['cpu_time']
+        total['bytes'] += record['bytes']
+        total['peak_memory'] = max(total['peak_memory'], record['peak_memory'])
+    return list(totals.values())
+
+
+def export_json(file_name, records=None):
+    '''
+    The export_json function will save every measurement and their summary to a json file.
+
+    Parameters
+    ----------
+    file_name : String
+        The path of the json file to write.
+    records : List of dictionaries, optional
+        The measurements to save. The default is None, which uses every
+        measurement taken so far.
+
+    Returns
+    -------
+    None.
+
+    '''
+    if records is None:
+        records = get_records()
+    with open(file_name, 'w') as file:
+        json.dump({'records': records, 'summary': summarize(records)}, file, indent=2)
+
+
+def export_prometheus(file_name, records=None, prefix='p3'):
+    '''
+    The export_prometheus function will save the summary of the measurements
+    in the Prometheus text format, so a node exporter can pick it up from a
+    text file.
+
+    Parameters
+    ----------
+    file_name : String
+        The path of the .prom file to write.
+    records : List of dictionaries, optional
+        The measurements to save. The default is None, which uses every
+        measurement taken so far.
+    prefix : String, optional
+        The prefix of every metric name. The default is 'p3'.
+
+    Returns
+    -------
+    None.
+
+    '''
+    metrics = [('calls', 'stage_calls_total', 'counter', 'Number of times the stage ran.'),
+               ('wall_time', 'stage_wall_seconds_total', 'counter', 'Wall time spent in the stage.'),
+               ('cpu_time', 'stage_cpu_seconds_total', 'counter', 'CPU time spent in the stage.'),
+               ('bytes', 'stage_bytes_total', 'counter', 'Bytes of data passed to the stage.'),
+               ('peak_memory', 'stage_peak_memory_bytes', 'gauge', 'Largest memory peak of one call of the stage.')]
+    summary = summarize(records)
+    lines = []
+    for key, name, metric_type, help_text in metrics:
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+        for row in summary:
+            recording = str(row['recording'] or '').replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{prefix}_{name}{{stage="{row["stage"]}",recording="{recording}"}} {row[key]}')
+    with open(file_name, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
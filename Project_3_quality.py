@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_quality.py
+Created on Sat Oct 17 23:48:26 2026
+This module checks the signal quality of the arduino ECG recordings before
+their heartbeats are found, so noisy stretches do not add false heartbeats
+to the SDRR and LF/HF ratio. Each recording is cut into short windows and
+every window gets four checks. Lead-off fails when the leads come off and
+the signal goes flat. Saturation fails when the ADC sits at 0 or 1023.
+Baseline wander fails when the baseline moves too far within the window.
+Kurtosis fails when the slope of the signal is too close to noise, with no
+sharp QRS complexes. The checks of every window are found with whole-array
+numpy operations, one block of windows at a time, so the recording is
+gone over once. The quality index of a window is the fraction of checks it
+passes.
+
+Runs of windows below the quality threshold become bad segments. They are
+taken out before the heartbeats are found (Project_3_module.get_heartbeats
+takes the mask), so an artifact can neither add heartbeats nor throw off the
+thresholds of the detector, and find_ibi_outliers marks the inter-beat
+intervals that cross a
+bad segment, are too short or too long, or differ too much from the
+intervals around them (ectopic beats), so calculate_hrv and
+interpolate_ibi can leave them out.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import json
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import Project_3_loader as p3l
+from Project_3_profiling import profiled
+
+# the checks of each window, in the order of the quality report
+quality_checks = ['lead_off', 'saturated', 'baseline_wander', 'low_kurtosis']
+# number of samples checked at a time
+quality_block = 1 << 20
+# number of pieces each window is cut into to measure the baseline wander
+wander_pieces = 8
+
+#%% Window checks
+
+def get_window_checks(windows, volts_per_unit=1.0, min_std=.02, rail_margin=.5, max_rail_fraction=.05,
+                      max_wander=1.0, min_kurtosis=5.0):
+    '''
+    The get_window_checks function will input a 2D array of windows x samples
+    and measure the four checks of each window at once.
+
+    Parameters
+    ----------
+    windows : Array of floats or integers.
+        A 2D array with one window of the recording per row.
+    volts_per_unit : Float, optional
+        The volts of one unit of the data: 1 for data in volts, or
+        Project_3_loader.volts_per_count for ADC counts. The default is 1.0.
+    min_std : Float, optional
+        The smallest standard deviation in volts of a window with the leads on. The default is .02.
+    rail_margin : Float, optional
+        How close to 0 or 1023 counts a sample has to be to count as saturated. The default is .5.
+    max_rail_fraction : Float, optional
+        The largest fraction of saturated samples in a good window. The default is .05.
+    max_wander : Float, optional
+        The largest change in volts of the baseline across a good window (the
+        range of the means of its wander_pieces pieces). The default is 1.0.
+    min_kurtosis : Float, optional
+        The smallest kurtosis of the slope of a good window. Noise has a
+        kurtosis of 3, clean ECG from the arduino more than 10. The default is 5.0.
+
+    Returns
+    -------
+    checks : Dictionary
+        The 'std', 'rail_fraction', 'wander' and 'kurtosis' of each window,
+        and a boolean array for each check in quality_checks that is True
+        where the window fails it.
+
+    '''
+    windows = np.asarray(windows)
+    window_length = windows.shape[1]
+    # the rails in the units of the data
+    low_rail = rail_margin*p3l.volts_per_count/volts_per_unit
+    high_rail = (p3l.max_count - rail_margin)*p3l.volts_per_count/volts_per_unit
+
+    std = np.std(windows, axis=1)*volts_per_unit
+    rail_fraction = np.count_nonzero((windows <= low_rail) | (windows >= high_rail), axis=1)/window_length
+
+    # range of the baseline, from the means of the pieces of the window
+    piece_length = max(window_length//wander_pieces, 1)
+    n_pieces = window_length//piece_length
+    piece_means = windows[:, :n_pieces*piece_length].reshape(len(windows), n_pieces, piece_length).mean(axis=2)
+    wander = (piece_means.max(axis=1) - piece_means.min(axis=1))*volts_per_unit
+
+    # kurtosis of the slope, which does not change with the baseline
+    slope = np.diff(windows, axis=1).astype(float)
+    slope -= slope.mean(axis=1, keepdims=True)
+    slope *= slope
+    second_moment = slope.mean(axis=1)
+    slope *= slope
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kurtosis = slope.mean(axis=1)/second_moment**2
+    kurtosis[second_moment == 0] = 0
+
+    checks = {'std': std, 'rail_fraction': rail_fraction, 'wander': wander, 'kurtosis': kurtosis,
+              'lead_off': std < min_std,
+              'saturated': rail_fraction > max_rail_fraction,
+              'baseline_wander': wander > max_wander,
+              'low_kurtosis': kurtosis < min_kurtosis}
+    return checks
+
+
+@profiled()
+def get_signal_quality(data, fs=500, window_time=2.0, volts_per_unit=1.0, **thresholds):
+    '''
+    The get_signal_quality function will input a recording and check the
+    signal quality of every window of it. The recording is cut into windows
+    of window_time seconds, and if it does not divide evenly the last window
+    is the last window_time seconds of it. The windows are checked
+    quality_block samples at a time with get_window_checks.
+
+    Parameters
+    ----------
+    data : Array of floats or integers.
+        A 1D array of n terms where n is the voltage recorded from the arduino
+        sensor (or the ADC counts, with volts_per_unit set).
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    window_time : Float, optional
+        The length of each window in seconds. The default is 2.0.
+    volts_per_unit : Float, optional
+        The volts of one unit of the data. The default is 1.0.
+    **thresholds : Floats, optional
+        The thresholds of get_window_checks (min_std, rail_margin,
+        max_rail_fraction, max_wander, min_kurtosis).
+
+    Returns
+    -------
+    quality : Dictionary
+        The 'start' and 'stop' sample of each window, the measurements and
+        checks of get_window_checks for each window, its 'quality' index,
+        the number of samples and the sampling frequency.
+
+    '''
+    data = np.asarray(data)
+    n_samples = len(data)
+    if n_samples < 2:
+        raise ValueError('the recording needs at least 2 samples to check its quality')
+    # a recording shorter than one window is checked as one window
+    window_length = min(max(int(round(window_time*fs)), 2), n_samples)
+
+    starts = np.arange(0, n_samples - window_length + 1, window_length)
+    if starts[-1] + window_length < n_samples:
+        starts = np.append(starts, n_samples - window_length)
+    n_full = n_samples//window_length
+
+    windows_per_block = max(quality_block//window_length, 1)
+    block_checks = []
+    for first in range(0, n_full, windows_per_block):
+        last = min(first + windows_per_block, n_full)
+        windows = data[first*window_length:last*window_length].reshape(last - first, window_length)
+        block_checks.append(get_window_checks(windows, volts_per_unit, **thresholds))
+    if len(starts) > n_full:
+        block_checks.append(get_window_checks(data[np.newaxis, -window_length:], volts_per_unit, **thresholds))
+
+    quality = {name: np.concatenate([checks[name] for checks in block_checks]) for name in block_checks[0]}
+    failed = np.stack([quality[name] for name in quality_checks])
+    quality['quality'] = 1 - failed.mean(axis=0)
+    quality.update({'start': starts, 'stop': starts + window_length, 'n_samples': n_samples, 'fs': fs})
+    return quality
+
+#%% Bad segments
+
+def get_bad_segments(quality, min_quality=1.0, margin=0):
+    '''
+    The get_bad_segments function will input the result of get_signal_quality
+    and return the stretches of the recording whose windows are below
+    min_quality, with neighbouring bad windows joined into one segment.
+
+    Parameters
+    ----------
+    quality : Dictionary
+        The result of get_signal_quality.
+    min_quality : Float, optional
+        The lowest quality index of a good window. The default is 1.0, which
+        marks every window that fails any check.
+    margin : Integer, optional
+        The number of samples each segment is widened by on both sides, for
+        example half the filter length, since filtering spreads an artifact
+        out that far. The default is 0.
+
+    Returns
+    -------
+    bad_segments : Array of integers.
+        A 2D array with the start and stop sample of each bad segment per row.
+
+    '''
+    is_bad = quality['quality'] < min_quality
+    starts = np.maximum(quality['start'][is_bad] - margin, 0)
+    stops = np.minimum(quality['stop'][is_bad] + margin, quality['n_samples'])
+    if len(starts) == 0:
+        return np.zeros((0, 2), dtype=int)
+
+    # join segments that touch or overlap
+    is_new = np.concatenate([[True], starts[1:] > np.maximum.accumulate(stops)[:-1]])
+    segment_stops = np.maximum.reduceat(stops, np.flatnonzero(is_new))
+    return np.stack([starts[is_new], segment_stops], axis=1).astype(int)
+
+
+def get_sample_mask(bad_segments, n_samples):
+    '''
+    The get_sample_mask function will input the bad segments of a recording
+    and return a boolean array that is True at every good sample, the mask
+    Project_3_module.get_heartbeats takes.
+    '''
+    # +1 where a segment starts and -1 where it stops, so the running sum is the number of segments covering a sample
+    changes = np.zeros(n_samples + 1, dtype=int)
+    np.add.at(changes, bad_segments[:, 0], 1)
+    np.add.at(changes, bad_segments[:, 1], -1)
+    return np.cumsum(changes[:-1]) == 0
+
+
+def fill_bad_samples(data, mask):
+    '''
+    The fill_bad_samples function will return a copy of a recording with the
+    samples where the mask is False replaced by a straight line between the
+    good samples on either side (or the nearest good sample at the ends).
+    The bad segments then hold no peaks and no slope for a detector to find
+    or to learn its thresholds from, and no step is made at their edges.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of a recording, or a 2D array of channels x samples.
+    mask : Array of booleans.
+        An array the same shape as data that is True at every good sample,
+        from get_sample_mask.
+
+    Returns
+    -------
+    filled_data : Array of floats.
+        The recording with its bad samples filled in.
+
+    '''
+    data = np.asarray(data)
+    mask = np.asarray(mask, dtype=bool)
+    if data.ndim > 1:
+        return np.stack([fill_bad_samples(row, row_mask) for row, row_mask in zip(data, mask)])
+    filled_data = np.array(data, dtype=np.result_type(data.dtype, np.float32))
+    good_indices = np.flatnonzero(mask)
+    bad_indices = np.flatnonzero(~mask)
+    if len(good_indices) == 0:
+        # nothing to keep, a flat line has no heartbeats
+        filled_data[:] = 0
+    elif len(bad_indices) > 0:
+        filled_data[bad_indices] = np.interp(bad_indices, good_indices, data[good_indices])
+    return filled_data
+
+#%% Inter-beat intervals
+
+def find_ibi_outliers(time_of_heartbeat, bad_segments=None, fs=500, min_interval=.3, max_interval=2.0,
+                      max_deviation=.2, median_beats=5):
+    '''
+    The find_ibi_outliers function will input the times of the heartbeats of
+    a recording and find the inter-beat intervals to leave out of the HRV:
+    intervals that cross a bad segment (whose beats were dropped, so the
+    interval is not a real one), intervals shorter than min_interval or
+    longer than max_interval, and intervals that differ from the median of
+    the median_beats intervals around them by more than max_deviation of it.
+    The last check catches ectopic beats, which make one short interval and
+    one long one.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    bad_segments : Array of integers, optional
+        The result of get_bad_segments. The default is None.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor, to turn the segments into seconds. The default is 500.
+    min_interval : Float, optional
+        The shortest interval in seconds that is kept (200 beats per minute). The default is .3.
+    max_interval : Float, optional
+        The longest interval in seconds that is kept (30 beats per minute). The default is 2.0.
+    max_deviation : Float, optional
+        The largest difference from the local median that is kept, as a fraction of it. The default is .2.
+    median_beats : Integer, optional
+        The number of intervals the local median is taken over (odd). The default is 5.
+
+    Returns
+    -------
+    is_valid : Array of booleans.
+        A 1D array with one term per interval (len(time_of_heartbeat) - 1) that is True where the interval is kept.
+
+    '''
+    time_of_heartbeat = np.asarray(time_of_heartbeat, dtype=float)
+    time_intervals = np.diff(time_of_heartbeat)
+    is_valid = (time_intervals >= min_interval) & (time_intervals <= max_interval)
+
+    if bad_segments is not None and len(bad_segments) > 0:
+        # an interval crosses a segment when the segment starts before the interval ends and stops after it starts
+        segment_times = np.asarray(bad_segments)/fs
+        first_segment = np.searchsorted(segment_times[:, 1], time_of_heartbeat[:-1], side='right')
+        crosses = first_segment < len(segment_times)
+        crosses[crosses] = segment_times[first_segment[crosses], 0] < time_of_heartbeat[1:][crosses]
+        is_valid &= ~crosses
+
+    if len(time_intervals) >= median_beats:
+        # local median of the intervals, with the ends repeated so every interval has one
+        half = median_beats//2
+        padded_intervals = np.pad(time_intervals, half, mode='edge')
+        local_median = np.median(sliding_window_view(padded_intervals, 2*half + 1), axis=1)
+        is_valid &= np.abs(time_intervals - local_median) <= max_deviation*local_median
+
+    return is_valid
+
+#%% Report
+
+def get_quality_report(quality, bad_segments, is_valid=None):
+    '''
+    The get_quality_report function will input the results of
+    get_signal_quality, get_bad_segments and find_ibi_outliers for a
+    recording and return the numbers that go in its row of results: the
+    fraction of good samples, the number of bad segments, the number of
+    windows failing each check, the number of intervals left out, and the
+    bad segments themselves in seconds.
+    '''
+    fs = quality['fs']
+    bad_samples = int(np.sum(bad_segments[:, 1] - bad_segments[:, 0]))
+    report = {'good_fraction': 1 - bad_samples/quality['n_samples'],
+              'n_bad_segments': len(bad_segments),
+              'n_excluded_ibi': 0 if is_valid is None else int(np.count_nonzero(~is_valid)),
+              'bad_segments': (bad_segments/fs).tolist()}
+    for name in quality_checks:
+        report[f'n_{name}'] = int(np.count_nonzero(quality[name]))
+    return report
+
+
+def write_quality_report(results, file_name):
+    '''
+    The write_quality_report function will input the rows of
+    Project_3_batch.run_batch run with quality=True and write the quality
+    report of each recording, including its bad segments in seconds, to a .json file.
+
+    Parameters
+    ----------
+    results : List of dictionaries
+        The rows returned by run_batch.
+    file_name : String
+        The path of the .json file to write.
+
+    Returns
+    -------
+    None.
+
+    '''
+    report_keys = ['good_fraction', 'n_bad_segments', 'n_excluded_ibi', 'bad_segments'] + \
+        [f'n_{name}' for name in quality_checks]
+    report = {row['recording']: {key: row[key] for key in report_keys if key in row} for row in results}
+    with open(file_name, 'w') as file:
+        json.dump(report, file, indent=1)
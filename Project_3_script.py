@@ -9,37 +9,43 @@ calulate heart rate variability(HRV), and frequency band power will also be calc
 This is done to assess the autonomic nervous system (ANS) and quantitatively estimate ANS activity.
 Through activity of the sympathetic nervous system and parasympathetic nervous syster identified by 
 their different HRV.
+To run the analysis on other recordings without editing this script, use
+Project_3_cli.py (python Project_3_cli.py p3_recordings.csv runs these four).
 
 @authors: Cole Richardson and Thomas Bausman
 """
 
 # import packages 
+import os
 import numpy as np
 from matplotlib import pyplot as plt
 from scipy import fft as fft
-from scipy import signal
 import Project_3_module as p3m
+import Project_3_loader as p3l
+import Project_3_filters as p3f
+import Project_3_events as p3e
+import Project_3_profiling as p3prof
+import Project_3_memo as p3memo
 
-#%% Part 1: Collect and Load Data 
+# set P3_PROFILE=1 to time each stage, the results are saved to profile.json and profile.prom
+if os.environ.get('P3_PROFILE'):
+    p3prof.enable_profiling()
+
+# set P3_MEMO=1 to remember the result of each stage on disk, so a rerun only calculates the
+# stages whose inputs or settings changed
+if os.environ.get('P3_MEMO'):
+    p3memo.enable_memoization()
 
-# load data 
-resting_data = np.loadtxt('p3_resting_meg.txt')
-relaxing_data = np.loadtxt('p3_relaxing_meg.txt')
-mental_data = np.loadtxt('p3_mentally_stress_meg.txt')
-physical_data = np.loadtxt('p3_physical_stress_meg.txt')
+#%% Part 1: Collect and Load Data 
 
+# load data in volts (parsed once, then read back from a binary cache)
 # trim data sets to be the same length 
 # they will be the same length as the lowest (physical_data)
-resting_data = resting_data[:-21389]
-relaxing_data = relaxing_data[:-22823]
-mental_data = mental_data[:-835]
-mental_data = np.flip(mental_data)
-
-# divide data sets by conversion factor of 204.6 for conversion between 1023 bits and 4 volts 
-resting_data = resting_data * (1/204.6)
-relaxing_data = relaxing_data * (1/204.6)
-mental_data = mental_data * (1/204.6)
-physical_data = physical_data * (1/204.6)
+# the conversion factor of 204.6 (between 1023 bits and 4 volts) is applied by the loader
+resting_data = p3l.load_recording('p3_resting_meg.txt', trim=21389)
+relaxing_data = p3l.load_recording('p3_relaxing_meg.txt', trim=22823)
+mental_data = p3l.load_recording('p3_mentally_stress_meg.txt', trim=835, flip=True)
+physical_data = p3l.load_recording('p3_physical_stress_meg.txt')
 
 # set sampling frequency 
 fs = 500 # normal arduino code samples at 500 we did 250
@@ -55,8 +61,8 @@ fc1 = .5 #Beginning of frequency range
 fc2 = 50 #Cutoff frequency
 window = 'hann' #Filter shape
 filter_type = 'bandpass'  # filter type
-signal_filter = signal.firwin(numtaps,[fc1,fc2],window=window,pass_zero=filter_type,fs=fs)  # create filter using scipy 
-signal_filter_freq = fft.rfft(signal_filter) #bring filter to frequency domain
+signal_filter = p3f.get_filter(numtaps,[fc1,fc2],window=window,fs=fs,pass_zero=filter_type)  # create filter using scipy (designed once, then read from the registry)
+signal_filter_freq = p3f.get_filter_fft(numtaps,[fc1,fc2],window=window,fs=fs,pass_zero=filter_type) #bring filter to frequency domain
 
 # create filtered time array
 time_filter = np.arange(0,len(signal_filter)/fs,1/fs)
@@ -162,21 +168,19 @@ plt.savefig('HRV_barplot.png')
 #assign dt for x-axes
 dt= 0.1
 
-#Get iterpolated array in correct dt for graphing
-rest_regular_time = np.arange(0,len(np.diff(rest_heartbeat_times)),dt) #create time array for activity
-ibi_rest = np.interp(rest_regular_time, rest_heartbeat_times[1:], (np.diff(rest_heartbeat_times)))
+# keep the beats of every activity in the beat store, saved so later analysis does not need the ECG
+beat_store = p3e.BeatStore(fs)
+beat_store.add('Resting', rest_heartbeat_times)
+beat_store.add('Relaxing', relax_heartbeat_times)
+beat_store.add('Mental', mental_heartbeat_times)
+beat_store.add('Physical', physical_heartbeat_times)
+beat_store.save(os.path.join(p3l.cache_folder, 'beats.npz'))
 
-#Get iterpolated array in correct dt for graphing
-relax_regular_time = np.arange(0,len(np.diff(relax_heartbeat_times)),dt) #create time array for activity
-ibi_relax = np.interp(relax_regular_time,relax_heartbeat_times[1:],(np.diff(relax_heartbeat_times)))
-
-#Get iterpolated array in correct dt for graphing
-mental_regular_time = np.arange(0,len(np.diff(mental_heartbeat_times)),dt) #create time array for activity
-ibi_mental = np.interp(mental_regular_time,mental_heartbeat_times[1:],(np.diff(mental_heartbeat_times)))
-
-#Get iterpolated array in correct dt for graphing
-physical_regular_time = np.arange(0,len(np.diff(physical_heartbeat_times)),dt) #create time array for activity
-ibi_physical = np.interp(physical_regular_time,physical_heartbeat_times[1:],(np.diff(physical_heartbeat_times)))
+#Get iterpolated arrays in correct dt for graphing (calculated once by the beat store)
+rest_regular_time, ibi_rest = beat_store['Resting'].get_interpolated_ibi(dt)
+relax_regular_time, ibi_relax = beat_store['Relaxing'].get_interpolated_ibi(dt)
+mental_regular_time, ibi_mental = beat_store['Mental'].get_interpolated_ibi(dt)
+physical_regular_time, ibi_physical = beat_store['Physical'].get_interpolated_ibi(dt)
 
 #%% Part 5: Get HRV Frequency Band Power
 
@@ -227,3 +231,8 @@ plt.bar('Physically Active', physical_ratio, color='firebrick')
 
 plt.tight_layout()
 plt.savefig('LF_HF_ratio_barplot.png')
+
+# save the profile of each stage
+if p3prof.is_enabled():
+    p3prof.export_json('profile.json')
+    p3prof.export_prometheus('profile.prom')
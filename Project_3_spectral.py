@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_spectral.py
+Created on Sat Oct 17 13:35:52 2026
+This module holds the spectral estimators for the heart rate variability
+(HRV) frequency band power. get_power_spectrum in Project_3_module takes a
+single FFT of the interpolated IBI data. This module adds a Welch estimate
+(the average of the spectra of overlapping segments) and a Lomb-Scargle
+estimate, which works on the beat times directly so the IBI data never has
+to be interpolated. The frequency grids and the LF/HF index ranges only
+depend on the length of the data, dt and the band edges, so they are
+calculated once and reused. The band power is the integral of the spectrum
+over each band. The LF and HF bands default to lf_band and hf_band, and every
+function takes other band edges as arguments.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+from functools import lru_cache
+import numpy as np
+from scipy import fft as fft
+from scipy import signal
+from scipy.integrate import trapezoid
+
+# default low frequency (LF) and high frequency (HF) bands in Hz
+lf_band = (.04, .15)
+hf_band = (.15, .4)
+
+#%% Cached frequency grids
+
+def get_band_slice(frequencies, band):
+    '''
+    The get_band_slice function will input a sorted array of frequencies and
+    a band, and return the slice of the array inside the band (edges included).
+
+    Parameters
+    ----------
+    frequencies : Array of floats.
+        A sorted 1D array of frequencies in Hz.
+    band : Tuple of floats.
+        The lowest and highest frequency of the band in Hz.
+
+    Returns
+    -------
+    band_slice : Slice
+        The slice of frequencies that are inside the band.
+
+    '''
+    start = np.searchsorted(frequencies, band[0], side='left')
+    stop = np.searchsorted(frequencies, band[1], side='right')
+    return slice(int(start), int(stop))
+
+
+@lru_cache(maxsize=128)
+def get_frequency_grid(n_samples, dt, lf_band=lf_band, hf_band=hf_band):
+    '''
+    The get_frequency_grid function will input the length of a data set and
+    its time step, and return the frequencies of its real FFT along with the
+    slices of the LF and HF bands. The result is cached, so data sets of the
+    same length and bands share one grid. The returned array is read only.
+
+    Parameters
+    ----------
+    n_samples : Integer
+        The number of samples in the data (or in each Welch segment).
+    dt : Float
+        The time step of the data in seconds.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    frequencies : Array of floats.
+        A 1D array of the frequencies of the real FFT in Hz.
+    lf_slice : Slice
+        The slice of frequencies in the LF band.
+    hf_slice : Slice
+        The slice of frequencies in the HF band.
+
+    '''
+    frequencies = fft.rfftfreq(n_samples, dt)
+    frequencies.flags.writeable = False
+    return frequencies, get_band_slice(frequencies, lf_band), get_band_slice(frequencies, hf_band)
+
+
+@lru_cache(maxsize=32)
+def get_lomb_scargle_grid(max_frequency=.5, n_frequencies=501, lf_band=lf_band, hf_band=hf_band):
+    '''
+    The get_lomb_scargle_grid function will return an evenly spaced grid of
+    frequencies for the Lomb-Scargle estimate, along with the slices of the
+    LF and HF bands. The first frequency is one step above 0 Hz. The result
+    is cached and read only.
+
+    Parameters
+    ----------
+    max_frequency : Float, optional
+        The highest frequency of the grid in Hz. The default is .5.
+    n_frequencies : Integer, optional
+        The number of frequencies in the grid. The default is 501.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    frequencies : Array of floats.
+        A 1D array of frequencies in Hz.
+    lf_slice : Slice
+        The slice of frequencies in the LF band.
+    hf_slice : Slice
+        The slice of frequencies in the HF band.
+
+    '''
+    frequencies = np.linspace(0, max_frequency, n_frequencies + 1)[1:]
+    frequencies.flags.writeable = False
+    return frequencies, get_band_slice(frequencies, lf_band), get_band_slice(frequencies, hf_band)
+
+#%% Band power
+
+def integrate_band_power(frequencies, psd, band_slice):
+    '''
+    The integrate_band_power function will integrate a power spectral density
+    over one band with the trapezoid rule.
+
+    Parameters
+    ----------
+    frequencies : Array of floats.
+        A 1D array of frequencies in Hz.
+    psd : Array of floats.
+        The power spectral density at each frequency. For 2D data, one row per data set.
+    band_slice : Slice
+        The slice of frequencies in the band.
+
+    Returns
+    -------
+    band_power : Float or array of floats
+        The power in the band (one value per row for 2D data).
+
+    '''
+    return trapezoid(psd[..., band_slice], frequencies[band_slice], axis=-1)
+
+
+def get_band_powers(frequencies, psd, lf_slice, hf_slice):
+    '''
+    The get_band_powers function will return the LF power, the HF power and
+    their ratio from a power spectral density.
+
+    Parameters
+    ----------
+    frequencies : Array of floats.
+        A 1D array of frequencies in Hz.
+    psd : Array of floats.
+        The power spectral density at each frequency. For 2D data, one row per data set.
+    lf_slice : Slice
+        The slice of frequencies in the LF band.
+    hf_slice : Slice
+        The slice of frequencies in the HF band.
+
+    Returns
+    -------
+    lf_power : Float or array of floats
+        The power in the LF band.
+    hf_power : Float or array of floats
+        The power in the HF band.
+    lf_hf_ratio : Float or array of floats
+        The LF power divided by the HF power.
+
+    '''
+    lf_power = integrate_band_power(frequencies, psd, lf_slice)
+    hf_power = integrate_band_power(frequencies, psd, hf_slice)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lf_hf_ratio = lf_power/hf_power
+    return lf_power, hf_power, lf_hf_ratio
+
+#%% Estimators
+
+def welch_power_spectrum(interpolated_data, dt=0.1, segment_time=120, lf_band=lf_band, hf_band=hf_band):
+    '''
+    The welch_power_spectrum function will input IBI data that has been
+    interpolated at dt and return its power spectral density estimated with
+    Welch's method: the data is cut into half overlapping hann windowed
+    segments and their spectra are averaged, which gives a much less noisy
+    estimate than a single FFT of the whole recording. A 2D array gets the
+    spectrum of every row from one call.
+
+    Parameters
+    ----------
+    interpolated_data : Array of floats.
+        A 1D array of IBI data interpolated at dt, or a 2D array with one row per data set.
+    dt : Float, optional
+        The time step of the interpolated data in seconds. The default is 0.1.
+    segment_time : Float, optional
+        The length of each segment in seconds. 120 seconds resolves the
+        0.04 Hz edge of the LF band with several bins. The default is 120.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    frequencies : Array of floats.
+        A 1D array of frequencies in Hz (read only).
+    psd : Array of floats.
+        The power spectral density in s^2/Hz (one row per data set for 2D data).
+    lf_slice : Slice
+        The slice of frequencies in the LF band.
+    hf_slice : Slice
+        The slice of frequencies in the HF band.
+
+    '''
+    interpolated_data = np.asarray(interpolated_data)
+    n_per_segment = min(int(round(segment_time/dt)), interpolated_data.shape[-1])
+    frequencies, lf_slice, hf_slice = get_frequency_grid(n_per_segment, dt, tuple(lf_band), tuple(hf_band))
+    _, psd = signal.welch(interpolated_data, fs=1/dt, window='hann', nperseg=n_per_segment,
+                          detrend='constant', axis=-1)
+    return frequencies, psd, lf_slice, hf_slice
+
+
+def lomb_scargle_power_spectrum(time_of_heartbeat, max_frequency=.5, n_frequencies=501,
+                                lf_band=lf_band, hf_band=hf_band):
+    '''
+    The lomb_scargle_power_spectrum function will input the times heartbeats
+    occurred and return the power spectral density of the inter-beat
+    intervals estimated with the Lomb-Scargle periodogram. It works on the
+    unevenly spaced intervals directly, so there is no interpolation step.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    max_frequency : Float, optional
+        The highest frequency of the grid in Hz. The default is .5.
+    n_frequencies : Integer, optional
+        The number of frequencies in the grid. The default is 501.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    frequencies : Array of floats.
+        A 1D array of frequencies in Hz (read only).
+    psd : Array of floats.
+        The power spectral density in s^2/Hz.
+    lf_slice : Slice
+        The slice of frequencies in the LF band.
+    hf_slice : Slice
+        The slice of frequencies in the HF band.
+
+    '''
+    frequencies, lf_slice, hf_slice = get_lomb_scargle_grid(max_frequency, n_frequencies,
+                                                            tuple(lf_band), tuple(hf_band))
+
+    # each interval is placed at the time of the beat that ends it
+    time_intervals = np.diff(time_of_heartbeat)
+    beat_times = np.asarray(time_of_heartbeat[1:], dtype=float)
+    if len(time_intervals) < 3:
+        return frequencies, np.full(len(frequencies), np.nan), lf_slice, hf_slice
+
+    periodogram = signal.lombscargle(beat_times, time_intervals - np.mean(time_intervals),
+                                     2*np.pi*frequencies)
+    # scale so the spectrum integrates to the variance of the intervals, like Welch
+    duration = beat_times[-1] - beat_times[0]
+    psd = 2*duration*periodogram/len(time_intervals)
+
+    return frequencies, psd, lf_slice, hf_slice
+
+
+def get_hrv_band_powers(time_of_heartbeat, method='welch', dt=0.1, lf_band=lf_band, hf_band=hf_band):
+    '''
+    The get_hrv_band_powers function will input the times heartbeats occurred
+    and return the LF power, HF power and LF/HF ratio using either the Welch
+    or the Lomb-Scargle estimate. They are all nan when there are too few
+    heartbeats to estimate a spectrum.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    method : String, optional
+        'welch' to interpolate the IBI data at dt and use Welch's method, or
+        'lomb' to use the Lomb-Scargle periodogram. The default is 'welch'.
+    dt : Float, optional
+        The time step used to interpolate the IBI data for Welch's method. The default is 0.1.
+    lf_band : Tuple of floats, optional
+        The lowest and highest frequency of the LF band in Hz. The default is (.04, .15).
+    hf_band : Tuple of floats, optional
+        The lowest and highest frequency of the HF band in Hz. The default is (.15, .4).
+
+    Returns
+    -------
+    lf_power : Float
+        The power in the LF band in s^2.
+    hf_power : Float
+        The power in the HF band in s^2.
+    lf_hf_ratio : Float
+        The LF power divided by the HF power.
+
+    '''
+    if method not in ('welch', 'lomb'):
+        raise ValueError(f"method must be 'welch' or 'lomb', not {method!r}")
+    if len(time_of_heartbeat) < 2:
+        return np.nan, np.nan, np.nan
+
+    if method == 'welch':
+        # interpolate the intervals evenly across the recording
+        time_intervals = np.diff(time_of_heartbeat)
+        regular_time = np.arange(time_of_heartbeat[1], time_of_heartbeat[-1], dt)
+        if len(regular_time) < 2:
+            return np.nan, np.nan, np.nan
+        interpolated_ibi = np.interp(regular_time, time_of_heartbeat[1:], time_intervals)
+        frequencies, psd, lf_slice, hf_slice = welch_power_spectrum(interpolated_ibi, dt,
+                                                                    lf_band=lf_band, hf_band=hf_band)
+    else:
+        frequencies, psd, lf_slice, hf_slice = lomb_scargle_power_spectrum(time_of_heartbeat,
+                                                                           lf_band=lf_band, hf_band=hf_band)
+
+    return get_band_powers(frequencies, psd, lf_slice, hf_slice)
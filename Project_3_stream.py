@@ -0,0 +1,985 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_stream.py
+Created on Sat Oct 17 10:02:17 2026
+This module holds the streaming versions of the Project_3_module functions.
+Instead of needing the whole recording in memory, these take the ECG data a
+chunk at a time and carry their state from one chunk to the next, so
+recordings that are hours long can be filtered without loading them fully.
+Filtering uses overlap-save FFT convolution, which is much faster than the
+direct convolution done by np.convolve for long filters. Heartbeats are
+detected as the filtered samples arrive, so they can be used for live monitoring,
+and the heart rate variability is tracked over a sliding window as beats come in.
+run_pipeline chains these into one pass over a recording that only keeps the
+beat times and running sums, so a 24 hour recording needs no more memory
+than a 1 hour one.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import time
+from array import array
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as fft
+from scipy import signal
+from scipy.signal import find_peaks
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_spectral as p3sp
+from Project_3_profiling import profiled
+
+#%% Part 2: Filter Your Data
+
+def get_block_size(numtaps):
+    '''
+    The get_block_size function will return the default overlap-save FFT
+    length for a filter of numtaps taps: the smallest power of two that is
+    at least 8 times the filter length.
+    '''
+    return 1 << int(np.ceil(np.log2(8*numtaps)))
+
+
+class StreamingFilter:
+    '''
+    The StreamingFilter class convolves a stream of data with an FIR filter
+    one chunk at a time using overlap-save FFT convolution. The last
+    numtaps-1 input samples are kept between chunks, so chunks of any size can
+    be pushed in. Once the stream is flushed the output matches
+    np.convolve(data, filt, mode='same') on the whole recording (to floating
+    point rounding), which is what Project_3_module.filter_data returns.
+    The data can be filtered in another precision (like float32) and scaled
+    on the way, which Project_3_precision uses to filter ADC counts into volts.
+
+    Parameters
+    ----------
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    fft_size : Integer, optional
+        The length of the FFT used for each block. The default is None, which
+        uses the smallest power of two that is at least 8 times the filter length.
+    dtype : Numpy dtype, optional
+        The precision of the calculation and of the output. The default is float.
+    scale : Float, optional
+        The input is multiplied by this (folded into the filter response, so
+        it costs nothing). The default is 1.
+
+    '''
+
+    def __init__(self, filt, fft_size=None, dtype=float, scale=1.0):
+        self.filt = np.asarray(filt, dtype=float)
+        self.dtype = np.dtype(dtype)
+        self.numtaps = len(self.filt)
+        if fft_size is None:
+            fft_size = get_block_size(self.numtaps)
+        if fft_size < self.numtaps:
+            raise ValueError('fft_size must be at least the length of the filter')
+        self.fft_size = fft_size
+        # number of new output samples made by each block
+        self.step = fft_size - (self.numtaps - 1)
+        # frequency response of the filter at the block size (from the filter registry),
+        # with the scale folded in
+        self.filt_freq = p3f.get_taps_fft(self.filt, fft_size)
+        if scale != 1 or self.dtype != np.float64:
+            self.filt_freq = (self.filt_freq*scale).astype(np.result_type(self.dtype, np.complex64))
+        # np.convolve mode='same' starts this many samples into the full convolution
+        self.delay = (self.numtaps - 1)//2
+        self.reset()
+
+    def reset(self):
+        '''
+        The reset method clears the filter history so a new stream can be started.
+
+        Returns
+        -------
+        None.
+
+        '''
+        # history starts as zeros, the same as the edge of np.convolve
+        self._buffer = np.zeros(self.numtaps - 1, dtype=self.dtype)
+        self._to_skip = self.delay
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def _convolve_blocks(self, buffer):
+        '''
+        The _convolve_blocks method runs overlap-save on every full block in
+        the buffer at once and returns the output along with the part of the
+        buffer that has not been used up yet.
+        '''
+        n_blocks = (len(buffer) - (self.numtaps - 1))//self.step
+        if n_blocks <= 0:
+            return np.zeros(0, dtype=self.dtype), buffer
+
+        # every block starts one step after the last and overlaps it by numtaps-1
+        blocks = sliding_window_view(buffer, self.fft_size)[::self.step][:n_blocks]
+        output = fft.irfft(fft.rfft(blocks, axis=1)*self.filt_freq, self.fft_size, axis=1)
+        # the first numtaps-1 samples of each block are wrapped around and thrown away
+        output = output[:, self.numtaps - 1:].ravel()
+
+        return output, buffer[n_blocks*self.step:]
+
+    def _trim_output(self, output):
+        '''
+        The _trim_output method drops the leading samples of the full
+        convolution that np.convolve mode='same' leaves out.
+        '''
+        if self._to_skip > 0:
+            skipped = min(self._to_skip, len(output))
+            output = output[skipped:]
+            self._to_skip -= skipped
+        self.samples_out += len(output)
+        return output
+
+    @profiled('StreamingFilter.process')
+    def process(self, chunk):
+        '''
+        The process method takes the next chunk of the stream and returns as
+        much filtered data as can be computed so far. The output lags the input
+        by up to one block, the rest comes out on later calls or from flush.
+
+        Parameters
+        ----------
+        chunk : Array of floats.
+            A 1D array of the next samples of the stream. It can be any length.
+
+        Returns
+        -------
+        filtered_chunk : Array of floats.
+            A 1D array of the next samples of the filtered stream.
+
+        '''
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        self.samples_in += len(chunk)
+        buffer = np.concatenate([self._buffer, chunk])
+        output, self._buffer = self._convolve_blocks(buffer)
+        return self._trim_output(output)
+
+    def flush(self):
+        '''
+        The flush method ends the stream. It pads the end with zeros, returns
+        the last filtered samples so the total output is the same length as the
+        input, and resets the filter for a new stream.
+
+        Returns
+        -------
+        filtered_chunk : Array of floats.
+            A 1D array of the last samples of the filtered stream.
+
+        '''
+        remaining = self.samples_in - self.samples_out
+        # pad with at least delay zeros (the tail of mode='same') and fill the last block
+        n_unused = len(self._buffer) - (self.numtaps - 1)
+        n_pad = self.delay + (-(n_unused + self.delay)) % self.step
+        buffer = np.concatenate([self._buffer, np.zeros(n_pad, dtype=self.dtype)])
+        output, _ = self._convolve_blocks(buffer)
+        output = self._trim_output(output)[:remaining]
+        self.reset()
+        return output
+
+
+def stream_filter(chunks, filt, fft_size=None):
+    '''
+    The stream_filter function will input an iterable of data chunks and a
+    1D array of a filter, and yield the filtered data chunk by chunk. Only one
+    block of data is held in memory at a time.
+
+    Parameters
+    ----------
+    chunks : Iterable of arrays of floats.
+        The chunks of a recording, in order.
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    fft_size : Integer, optional
+        The length of the FFT used for each block. The default is None.
+
+    Yields
+    ------
+    filtered_chunk : Array of floats.
+        The next samples of the filtered recording. Empty chunks are skipped.
+
+    '''
+    streaming_filter = StreamingFilter(filt, fft_size)
+    for chunk in chunks:
+        filtered_chunk = streaming_filter.process(chunk)
+        if len(filtered_chunk) > 0:
+            yield filtered_chunk
+    filtered_chunk = streaming_filter.flush()
+    if len(filtered_chunk) > 0:
+        yield filtered_chunk
+
+
+def iterate_chunks(data, chunk_size):
+    '''
+    The iterate_chunks function will input an array and yield it in views of
+    chunk_size samples. Used with a memory map from Project_3_loader, only
+    the chunk being worked on is read from disk.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of a recording.
+    chunk_size : Integer
+        The number of samples in each chunk.
+
+    Yields
+    ------
+    chunk : Array of floats.
+        The next chunk_size samples of the recording (the last one may be shorter).
+
+    '''
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+#%% Part 3: Detect Heartbeats
+
+class OnlineBeatDetector:
+    '''
+    The OnlineBeatDetector class finds heartbeats in a stream of ECG samples
+    one chunk at a time, using the same rule as get_heartbeats in
+    Project_3_module: peaks above a height that are at least numtaps samples
+    apart, where the higher of two close peaks is kept. Peaks closer than
+    numtaps to each other are collected into a group, and once numtaps
+    samples pass with no new peak the group is settled the same way
+    find_peaks does it and its beats are given out. For a normal heart rhythm
+    a beat is given out about numtaps samples after it happens. Only the open
+    group and the flat part at the end of the last chunk are kept between
+    chunks, so the state does not grow with the length of the stream.
+
+    The beats match find_peaks(ecg_data, height, distance=numtaps) on the whole
+    recording, except that peaks of exactly the same height may be broken
+    differently. If a group ever spans more than max_group_length samples it
+    is settled early to keep the delay bounded.
+
+    Parameters
+    ----------
+    numtaps : Integer, optional
+        An integer representing the length of the filter array, used as the
+        smallest distance between beats in samples. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    max_group_length : Integer, optional
+        The longest a group of close peaks can span, in samples, before it is
+        settled early. The default is None, which uses 8 times numtaps.
+
+    '''
+
+    def __init__(self, numtaps=250, height=1.7, fs=500, max_group_length=None):
+        self.numtaps = numtaps
+        self.height = height
+        self.fs = fs
+        if max_group_length is None:
+            max_group_length = 8*numtaps
+        self.max_group_length = max_group_length
+        self.reset()
+        self.reset_latency()
+
+    def reset(self):
+        '''
+        The reset method clears the detection state so a new stream can be
+        started. The latency statistics are kept (see reset_latency).
+
+        Returns
+        -------
+        None.
+
+        '''
+        # index of the next sample in the stream
+        self.samples_in = 0
+        # the flat run of samples at the end of the last chunk, and the value before it
+        self._left_value = None
+        self._run_value = None
+        self._run_start = 0
+        # peaks closer than numtaps to each other that have not been settled yet
+        self._group_indices = []
+        self._group_heights = []
+
+    def reset_latency(self):
+        '''
+        The reset_latency method clears the latency statistics reported by
+        get_latency_report.
+
+        Returns
+        -------
+        None.
+
+        '''
+        # latency of each call to process
+        self.chunks_processed = 0
+        self.samples_processed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+        self.max_delay_samples = 0
+
+    def _find_candidates(self, chunk):
+        '''
+        The _find_candidates method finds every peak above the height whose
+        top is fully inside what has been seen so far. The trailing flat run of
+        the last chunk is squashed into one sample, and the edges of a plateau
+        that touches it are mapped back to their place in the stream.
+        '''
+        n = self.samples_in
+        if self._run_value is None:
+            window = chunk
+            n_context = 0
+        elif self._left_value is None:
+            window = np.concatenate([[self._run_value], chunk])
+            n_context = 1
+        else:
+            window = np.concatenate([[self._left_value, self._run_value], chunk])
+            n_context = 2
+
+        # convert an index in the window into an index in the stream
+        def to_stream(index, is_left):
+            if index == n_context - 1:
+                return self._run_start if is_left else n - 1
+            return n + index - n_context
+
+        peaks, properties = find_peaks(window, height=self.height, plateau_size=1)
+        left = np.array([to_stream(i, True) for i in properties['left_edges']], dtype=int)
+        right = np.array([to_stream(i, False) for i in properties['right_edges']], dtype=int)
+        candidates = (left + right)//2
+
+        # find the flat run at the end of the window
+        last_value = window[-1]
+        different = np.flatnonzero(window != last_value)
+        if len(different) == 0:
+            # the whole window is one value, the run just gets longer
+            if self._run_value is None:
+                self._run_start = 0
+        elif different[-1] >= n_context - 1:
+            self._left_value = window[different[-1]]
+            self._run_start = to_stream(different[-1] + 1, True) if different[-1] + 1 >= n_context else n
+        self._run_value = last_value
+
+        return candidates, properties['peak_heights']
+
+    def _settle_group(self, n_peaks, keep_open=False):
+        '''
+        The _settle_group method picks the beats out of the first n_peaks of
+        the open group like find_peaks does: the highest peak is kept first and
+        every peak closer than numtaps to a kept peak is dropped. With
+        keep_open the peaks within numtaps of the end of the group are left
+        in the group instead of being given out.
+        '''
+        indices = np.array(self._group_indices[:n_peaks], dtype=int)
+        heights = np.array(self._group_heights[:n_peaks])
+        keep = np.ones(len(indices), dtype=bool)
+        # highest first, and the later peak first when two are the same height
+        for i in np.lexsort((-indices, -heights)):
+            if not keep[i]:
+                continue
+            close = np.abs(indices - indices[i]) < self.numtaps
+            close[i] = False
+            keep[close] = False
+
+        settled = keep
+        if keep_open:
+            settled = keep & (indices[-1] - indices >= self.numtaps)
+            # the peaks after the last settled beat stay open
+            n_settled = np.flatnonzero(settled)[-1] + 1 if np.any(settled) else 0
+            settled[n_settled:] = False
+        else:
+            n_settled = n_peaks
+        beats = indices[settled].tolist()
+
+        del self._group_indices[:n_settled]
+        del self._group_heights[:n_settled]
+        return beats
+
+    @profiled('OnlineBeatDetector.process')
+    def process(self, chunk):
+        '''
+        The process method takes the next chunk of ECG samples and returns the
+        times of the heartbeats that can no longer change.
+
+        Parameters
+        ----------
+        chunk : Array of floats.
+            A 1D array of the next samples of the stream. It can be any length.
+
+        Returns
+        -------
+        time_of_heartbeat : Array of floats
+            A 1D array of the times in seconds of the heartbeats found so far
+            that had not been given out yet.
+
+        '''
+        start_time = time.perf_counter()
+        chunk = np.asarray(chunk, dtype=float)
+        beats = []
+        if len(chunk) > 0:
+            candidates, heights = self._find_candidates(chunk)
+            self.samples_in += len(chunk)
+
+            for index, peak_height in zip(candidates, heights):
+                if len(self._group_indices) > 0 and index - self._group_indices[-1] >= self.numtaps:
+                    # far enough from the group that nothing in it can change
+                    beats.extend(self._settle_group(len(self._group_indices)))
+                self._group_indices.append(int(index))
+                self._group_heights.append(peak_height)
+                if self._group_indices[-1] - self._group_indices[0] > self.max_group_length:
+                    # keep the delay bounded, only the end of the group stays open
+                    beats.extend(self._settle_group(len(self._group_indices), keep_open=True))
+
+            # no peak found later can be within numtaps of the group
+            if len(self._group_indices) > 0 and self._run_start - self._group_indices[-1] >= self.numtaps:
+                beats.extend(self._settle_group(len(self._group_indices)))
+
+        beats = np.array(beats, dtype=int)
+        if len(beats) > 0:
+            self.max_delay_samples = max(self.max_delay_samples, int(self.samples_in - 1 - beats[0]))
+
+        latency = time.perf_counter() - start_time
+        self.chunks_processed += 1
+        self.samples_processed += len(chunk)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.last_latency = latency
+
+        return beats*(1/self.fs)
+
+    def flush(self):
+        '''
+        The flush method ends the stream, returns the heartbeats that were
+        still waiting to be settled, and resets the detector for a new stream.
+        The latency statistics are kept, so get_latency_report still covers
+        the whole stream.
+
+        Returns
+        -------
+        time_of_heartbeat : Array of floats
+            A 1D array of the times in seconds of the last heartbeats.
+
+        '''
+        beats = np.array(self._settle_group(len(self._group_indices)), dtype=int)
+        self.reset()
+        return beats*(1/self.fs)
+
+    def get_latency_report(self):
+        '''
+        The get_latency_report method returns how long the calls to process
+        took, and how that compares to the time the samples took to record.
+
+        Returns
+        -------
+        report : Dictionary
+            The number of chunks, the mean and max processing time per chunk
+            in seconds, the longest delay in seconds between a heartbeat and the
+            last sample seen when it was given out, and the real-time factor
+            (processing time divided by recording time, below 1 keeps up).
+
+        '''
+        recorded_time = self.samples_processed/self.fs
+        return {'chunks': self.chunks_processed,
+                'mean_latency': self.total_latency/max(self.chunks_processed, 1),
+                'max_latency': self.max_latency,
+                'max_beat_delay': self.max_delay_samples/self.fs,
+                'real_time_factor': self.total_latency/recorded_time if recorded_time > 0 else 0.0}
+
+
+#%% Part 4: Heart Rate Variability
+
+class SlidingHRVTracker:
+    '''
+    The SlidingHRVTracker class tracks heart rate variability over a sliding
+    window (5 minutes by default) as heartbeat times arrive, and gives a row
+    of metrics every step_time seconds: SDRR, RMSSD, LF power, HF power and
+    the LF/HF ratio. Nothing is recalculated from scratch for each window.
+    SDRR and RMSSD come from running sums that beats are added to and taken
+    out of as they enter and leave the window. For the band powers the
+    inter-beat intervals are interpolated every dt seconds and a sliding DFT
+    keeps the LF and HF bins of the window up to date, one new sample at a
+    time. The bins are recalculated with an FFT once per window length so
+    rounding errors cannot build up. The whole recording is processed in
+    time proportional to its length.
+
+    Parameters
+    ----------
+    window_time : Float, optional
+        The length of the window in seconds. The default is 300.
+    step_time : Float, optional
+        The time between rows of metrics in seconds. The default is 5.
+    dt : Float, optional
+        The time step of the interpolated IBI data used for the band powers,
+        in seconds. It has to be below 1.25 seconds to reach the top of the
+        HF band. The default is 0.5.
+
+    '''
+
+    def __init__(self, window_time=300, step_time=5, dt=0.5):
+        self.window_time = window_time
+        self.step_time = step_time
+        self.dt = dt
+        # number of interpolated samples in a window and the DFT bins of each band
+        self.n_window = int(round(window_time/dt))
+        frequencies = np.arange(self.n_window//2 + 1)/(self.n_window*dt)
+        self._lf_bins = np.flatnonzero((frequencies >= .04) & (frequencies <= .15))
+        self._hf_bins = np.flatnonzero((frequencies >= .15) & (frequencies <= .4))
+        self._bins = np.union1d(self._lf_bins, self._hf_bins)
+        self._lf_in_bins = np.isin(self._bins, self._lf_bins)
+        self._hf_in_bins = np.isin(self._bins, self._hf_bins)
+        # turning factor of each bin for one step of the sliding DFT
+        self._twiddle = np.exp(2j*np.pi*self._bins/self.n_window)
+        self.reset()
+
+    def reset(self):
+        '''
+        The reset method clears the tracker so a new recording can be started.
+
+        Returns
+        -------
+        None.
+
+        '''
+        # beats in the window and the running sums over their intervals
+        self._last_beat = None
+        self._last_interval = None
+        self._intervals = deque()
+        self._interval_sum = 0.0
+        self._interval_square_sum = 0.0
+        self._successive = deque()
+        self._successive_square_sum = 0.0
+        # interpolated IBI samples in the window, kept in a ring buffer
+        self._ring = np.zeros(self.n_window)
+        self._ring_position = 0
+        self._n_interpolated = 0
+        self._next_grid_time = None
+        self._dft = np.zeros(len(self._bins), dtype=complex)
+        self._next_report = self.window_time
+        self.history = []
+
+    def _add_interpolated(self, samples):
+        '''
+        The _add_interpolated method pushes new interpolated IBI samples into
+        the ring buffer and updates the DFT bins with the sliding DFT.
+        '''
+        for sample in samples:
+            old_sample = self._ring[self._ring_position]
+            self._ring[self._ring_position] = sample
+            self._ring_position = (self._ring_position + 1) % self.n_window
+            self._dft = (self._dft + (sample - old_sample))*self._twiddle
+            self._n_interpolated += 1
+            if self._n_interpolated % self.n_window == 0:
+                # recalculate from the buffer (oldest sample first) to clear rounding errors
+                window = np.roll(self._ring, -self._ring_position)
+                self._dft = fft.rfft(window)[self._bins]
+
+    def _interpolate(self, beat_time, interval):
+        '''
+        The _interpolate method linearly interpolates the intervals between
+        the last beat and this one at every dt on the grid.
+        '''
+        if self._last_interval is None:
+            # the first interval is the first sample, the grid goes on from there
+            self._next_grid_time = beat_time + self.dt
+            return np.array([interval])
+        grid_times = np.arange(self._next_grid_time, beat_time + self.dt/2, self.dt)
+        grid_times = grid_times[grid_times <= beat_time]
+        if len(grid_times) == 0:
+            return grid_times
+        self._next_grid_time = grid_times[-1] + self.dt
+        return np.interp(grid_times, [self._last_beat, beat_time], [self._last_interval, interval])
+
+    def _get_metrics(self, beat_time):
+        '''
+        The _get_metrics method returns the metrics of the window that ends at beat_time.
+        '''
+        n_intervals = len(self._intervals)
+        mean_interval = self._interval_sum/n_intervals
+        sdrr = np.sqrt(max(self._interval_square_sum/n_intervals - mean_interval**2, 0.0))
+        rmssd = np.sqrt(self._successive_square_sum/len(self._successive)) if self._successive else np.nan
+        # band power of each bin of a rectangular window, in s^2
+        bin_power = 2*np.abs(self._dft)**2/self.n_window**2
+        lf_power = np.sum(bin_power[self._lf_in_bins])
+        hf_power = np.sum(bin_power[self._hf_in_bins])
+        return {'time': beat_time,
+                'n_beats': n_intervals + 1,
+                'sdrr': sdrr,
+                'rmssd': rmssd,
+                'lf': lf_power,
+                'hf': hf_power,
+                'lf_hf_ratio': lf_power/hf_power if hf_power > 0 else np.nan}
+
+    def update(self, beat_times):
+        '''
+        The update method takes the next heartbeat times of the recording and
+        returns a row of metrics for every step_time that has passed, once
+        the first window is full.
+
+        Parameters
+        ----------
+        beat_times : Array of floats.
+            A 1D array of the next heartbeat times in seconds, in order.
+
+        Returns
+        -------
+        rows : List of dictionaries
+            One row per step with the keys 'time', 'n_beats', 'sdrr', 'rmssd',
+            'lf', 'hf' and 'lf_hf_ratio'. The rows are also added to history.
+
+        '''
+        rows = []
+        for beat_time in np.asarray(beat_times, dtype=float):
+            if self._last_beat is None:
+                self._last_beat = beat_time
+                continue
+            interval = beat_time - self._last_beat
+
+            # add the new interval and successive difference to the running sums
+            self._intervals.append((beat_time, interval))
+            self._interval_sum += interval
+            self._interval_square_sum += interval**2
+            if self._last_interval is not None:
+                difference_square = (interval - self._last_interval)**2
+                # stored with the end of the earlier interval, so it leaves the window with it
+                self._successive.append((self._last_beat, difference_square))
+                self._successive_square_sum += difference_square
+
+            # take out the intervals that have left the window
+            window_start = beat_time - self.window_time
+            while self._intervals and self._intervals[0][0] <= window_start:
+                _, old_interval = self._intervals.popleft()
+                self._interval_sum -= old_interval
+                self._interval_square_sum -= old_interval**2
+            while self._successive and self._successive[0][0] <= window_start:
+                _, old_difference = self._successive.popleft()
+                self._successive_square_sum -= old_difference
+
+            self._add_interpolated(self._interpolate(beat_time, interval))
+            self._last_beat = beat_time
+            self._last_interval = interval
+
+            if beat_time >= self._next_report:
+                row = self._get_metrics(beat_time)
+                rows.append(row)
+                self.history.append(row)
+                # skip ahead past any steps with no beats in them
+                self._next_report += self.step_time*(1 + np.floor((beat_time - self._next_report)/self.step_time))
+        return rows
+
+
+def track_hrv(time_of_heartbeat, window_time=300, step_time=5, dt=0.5):
+    '''
+    The track_hrv function will input the times heartbeats occurred over a
+    whole recording and return the time series of the sliding window HRV
+    metrics from SlidingHRVTracker.
+
+    Parameters
+    ----------
+    time_of_heartbeat : Array of floats.
+        A 1D array of n terms where n represents the time recorded at each heartbeat from a specific activity's data set.
+    window_time : Float, optional
+        The length of the window in seconds. The default is 300.
+    step_time : Float, optional
+        The time between rows of metrics in seconds. The default is 5.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.5.
+
+    Returns
+    -------
+    hrv_series : Dictionary of arrays
+        One array for each of 'time', 'n_beats', 'sdrr', 'rmssd', 'lf', 'hf' and 'lf_hf_ratio'.
+
+    '''
+    tracker = SlidingHRVTracker(window_time, step_time, dt)
+    rows = tracker.update(time_of_heartbeat)
+    keys = ['time', 'n_beats', 'sdrr', 'rmssd', 'lf', 'hf', 'lf_hf_ratio']
+    return {key: np.array([row[key] for row in rows]) for key in keys}
+
+
+class RunningHRVSummary:
+    '''
+    The RunningHRVSummary class calculates the heart rate variability of a
+    whole recording as heartbeat times arrive, without keeping the
+    interpolated IBI data: SDRR and RMSSD come from running sums, and the LF
+    and HF power come from a Welch estimate that is built one segment at a
+    time. The inter-beat intervals are interpolated every dt seconds as each
+    beat arrives, and every time a segment is full its spectrum is added to
+    the running total. The result is the same as
+    Project_3_spectral.get_hrv_band_powers with method='welch' on all the
+    beats, while only one segment of samples is held in memory.
+
+    Parameters
+    ----------
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    segment_time : Float, optional
+        The length of each Welch segment in seconds. The default is 120.
+
+    '''
+
+    def __init__(self, dt=0.1, segment_time=120):
+        self.dt = dt
+        self.segment_time = segment_time
+        self.n_per_segment = int(round(segment_time/dt))
+        # segments overlap by half, like signal.welch
+        self.segment_step = self.n_per_segment - self.n_per_segment//2
+        self._window = signal.get_window('hann', self.n_per_segment)
+        # density scaling of signal.welch, doubled for the one sided spectrum
+        self._scale = np.full(self.n_per_segment//2 + 1, 2*dt/np.sum(self._window**2))
+        self._scale[0] /= 2
+        if self.n_per_segment % 2 == 0:
+            self._scale[-1] /= 2
+        self.reset()
+
+    def reset(self):
+        '''
+        The reset method clears the summary so a new recording can be started.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.n_beats = 0
+        self._last_beat = None
+        self._last_interval = None
+        # running mean and sum of squared differences of the intervals (Welford)
+        self._n_intervals = 0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0
+        self._n_successive = 0
+        self._successive_square_sum = 0.0
+        # interpolation grid, which starts at the second beat like interpolate_ibi
+        self._grid_start = None
+        self._grid_step = None
+        self._next_grid_index = 0
+        # interpolated samples not yet used up by a segment and the summed segment spectra
+        self._pending = np.zeros(0)
+        self._psd_sum = np.zeros(self.n_per_segment//2 + 1)
+        self._n_segments = 0
+
+    def _interpolate(self, beat_time, interval):
+        '''
+        The _interpolate method returns the interpolated intervals on the grid
+        from the last beat up to (but not including) this one.
+        '''
+        if self._grid_start is None:
+            self._grid_start = beat_time
+            # the step np.arange uses between grid points
+            self._grid_step = (beat_time + self.dt) - beat_time
+            return np.zeros(0)
+        n_grid = int(np.ceil((beat_time - self._grid_start)/self._grid_step))
+        grid_times = self._grid_start + np.arange(self._next_grid_index, n_grid)*self._grid_step
+        grid_times = grid_times[grid_times < beat_time]
+        self._next_grid_index += len(grid_times)
+        return np.interp(grid_times, [self._last_beat, beat_time], [self._last_interval, interval])
+
+    def _add_segments(self):
+        '''
+        The _add_segments method adds the spectrum of every full segment of
+        the pending samples to the running total and drops the samples no
+        later segment needs.
+        '''
+        n_segments = (len(self._pending) - self.n_per_segment)//self.segment_step + 1
+        if n_segments <= 0:
+            return
+        segments = sliding_window_view(self._pending, self.n_per_segment)[::self.segment_step][:n_segments]
+        segments = segments - np.mean(segments, axis=1, keepdims=True)
+        spectra = np.abs(fft.rfft(segments*self._window, axis=1))**2
+        self._psd_sum += np.sum(spectra, axis=0)*self._scale
+        self._n_segments += n_segments
+        self._pending = self._pending[n_segments*self.segment_step:].copy()
+
+    def update(self, beat_times):
+        '''
+        The update method takes the next heartbeat times of the recording.
+
+        Parameters
+        ----------
+        beat_times : Array of floats.
+            A 1D array of the next heartbeat times in seconds, in order.
+
+        Returns
+        -------
+        None.
+
+        '''
+        samples = []
+        for beat_time in np.asarray(beat_times, dtype=float):
+            self.n_beats += 1
+            if self._last_beat is None:
+                self._last_beat = beat_time
+                continue
+            interval = beat_time - self._last_beat
+
+            # add the interval to the running mean and variance
+            self._n_intervals += 1
+            difference = interval - self._interval_mean
+            self._interval_mean += difference/self._n_intervals
+            self._interval_m2 += difference*(interval - self._interval_mean)
+            if self._last_interval is not None:
+                self._n_successive += 1
+                self._successive_square_sum += (interval - self._last_interval)**2
+                samples.append(self._interpolate(beat_time, interval))
+            else:
+                self._interpolate(beat_time, interval)
+
+            self._last_beat = beat_time
+            self._last_interval = interval
+
+        if samples:
+            self._pending = np.concatenate([self._pending] + samples)
+            self._add_segments()
+
+    def get_summary(self):
+        '''
+        The get_summary method returns the heart rate variability of the
+        beats seen so far.
+
+        Returns
+        -------
+        summary : Dictionary
+            The number of beats, the SDRR and RMSSD in seconds, the LF and HF
+            power in s^2 and the LF/HF ratio. Values that need more beats are nan.
+
+        '''
+        sdrr = np.sqrt(self._interval_m2/self._n_intervals) if self._n_intervals > 0 else np.nan
+        rmssd = np.sqrt(self._successive_square_sum/self._n_successive) if self._n_successive > 0 else np.nan
+
+        if self._n_segments > 0:
+            frequencies, lf_slice, hf_slice = p3sp.get_frequency_grid(self.n_per_segment, self.dt)
+            psd = self._psd_sum/self._n_segments
+            lf_power, hf_power, lf_hf_ratio = p3sp.get_band_powers(frequencies, psd, lf_slice, hf_slice)
+        elif len(self._pending) > 1:
+            # shorter than one segment, so the segment is the whole recording like welch_power_spectrum
+            frequencies, psd, lf_slice, hf_slice = p3sp.welch_power_spectrum(self._pending, self.dt,
+                                                                             self.segment_time)
+            lf_power, hf_power, lf_hf_ratio = p3sp.get_band_powers(frequencies, psd, lf_slice, hf_slice)
+        else:
+            lf_power, hf_power, lf_hf_ratio = np.nan, np.nan, np.nan
+
+        return {'n_beats': self.n_beats,
+                'sdrr': float(sdrr),
+                'rmssd': float(rmssd),
+                'lf': float(lf_power),
+                'hf': float(hf_power),
+                'lf_hf_ratio': float(lf_hf_ratio)}
+
+#%% Whole recording pipeline
+
+# rough number of bytes of working arrays per sample of a chunk, used to size
+# chunks from a memory ceiling (the chunk, the filter buffer and FFT blocks,
+# the filtered chunk and the peak search)
+pipeline_bytes_per_sample = 128
+
+def detect_beats(filtered_chunks, numtaps=250, height=1.7, fs=500):
+    '''
+    The detect_beats function will input an iterable of filtered ECG chunks
+    and yield the times of the heartbeats found in them with
+    OnlineBeatDetector, as soon as they are settled.
+
+    Parameters
+    ----------
+    filtered_chunks : Iterable of arrays of floats.
+        The chunks of a filtered recording, in order.
+    numtaps : Integer, optional
+        The smallest number of samples between two heartbeats. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    Yields
+    ------
+    time_of_heartbeat : Array of floats
+        The times in seconds of the next heartbeats. Empty arrays are skipped.
+
+    '''
+    detector = OnlineBeatDetector(numtaps, height, fs)
+    for filtered_chunk in filtered_chunks:
+        beat_times = detector.process(filtered_chunk)
+        if len(beat_times) > 0:
+            yield beat_times
+    beat_times = detector.flush()
+    if len(beat_times) > 0:
+        yield beat_times
+
+
+def get_pipeline_chunk_size(max_memory, fft_size):
+    '''
+    The get_pipeline_chunk_size function will return the number of samples
+    to read at a time so the working arrays of the pipeline fit in
+    max_memory bytes. A chunk is never smaller than one FFT block.
+    '''
+    chunk_size = int(max_memory)//pipeline_bytes_per_sample
+    if chunk_size < fft_size:
+        raise ValueError(f'max_memory must be at least {fft_size*pipeline_bytes_per_sample} bytes '
+                         f'for an FFT size of {fft_size}')
+    return chunk_size
+
+
+def run_pipeline(file_name, filt=None, numtaps=250, height=1.7, dt=0.1, fs=500, max_memory=32 << 20,
+                 trim=None, flip=None, cache_dir=None, keep_beats=True):
+    '''
+    The run_pipeline function will run load, filter, heartbeat detection and
+    HRV over a whole recording as a chain of generators. The recording is
+    read from its cache a chunk at a time (Project_3_loader.iterate_recording),
+    filtered with StreamingFilter, searched for heartbeats with
+    OnlineBeatDetector and summarized with RunningHRVSummary. No array as long
+    as the recording is ever made, not even a time array: only the working
+    arrays of one chunk, which are sized to fit max_memory, the beat times
+    and the running sums are held. The beat times grow by about 0.8 MB per
+    day of recording, and are not kept at all with keep_beats=False.
+
+    Parameters
+    ----------
+    file_name : String
+        The path to the recording text file.
+    filt : Array of floats, optional
+        A 1D array of n terms where n represents the values of a bandpass filter.
+        The default is None, which uses the same 0.5-50 Hz hann filter as Project_3_script.
+    numtaps : Integer, optional
+        An integer representing the length of the filter array. The default is 250.
+    height : Float, optional
+        The smallest voltage a peak needs to count as a heartbeat. The default is 1.7.
+    dt : Float, optional
+        The time step of the interpolated IBI data in seconds. The default is 0.1.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    max_memory : Integer, optional
+        The memory ceiling in bytes for the working arrays of one chunk. The default is 32 MB.
+    trim : Integer, optional
+        The number of samples to cut off the end of the recording. The default
+        is None, which keeps the whole recording.
+    flip : Boolean, optional
+        If True the recording is reversed after it is trimmed. The default is
+        None, which keeps the recording in order.
+    cache_dir : String, optional
+        The folder to keep the cache in. The default is None, which uses a
+        p3_cache folder next to the text file.
+    keep_beats : Boolean, optional
+        If True the time of every heartbeat is returned. The default is True.
+
+    Returns
+    -------
+    summary : Dictionary
+        The number of beats, SDRR, RMSSD, LF power, HF power and LF/HF ratio
+        from RunningHRVSummary.
+    time_of_heartbeat : Array of floats
+        A 1D array of the time of each heartbeat in seconds (empty if keep_beats is False).
+
+    '''
+    if filt is None:
+        filt = p3f.get_filter(numtaps, (.5, 50), 'hann', fs)
+    fft_size = get_block_size(len(filt))
+    chunk_size = get_pipeline_chunk_size(max_memory, fft_size)
+
+    # each stage pulls one chunk at a time from the stage before it
+    chunks = p3l.iterate_recording(file_name, chunk_size, trim, flip, cache_dir)
+    filtered_chunks = stream_filter(chunks, filt, fft_size)
+    hrv_summary = RunningHRVSummary(dt)
+    beat_times = array('d')
+    for new_beat_times in detect_beats(filtered_chunks, numtaps, height, fs):
+        hrv_summary.update(new_beat_times)
+        if keep_beats:
+            beat_times.extend(new_beat_times)
+
+    return hrv_summary.get_summary(), np.frombuffer(beat_times, dtype=float)
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_sweep.py
+Created on Sat Oct 17 21:48:15 2026
+This module tries many settings of the Project 3 ECG analysis at once,
+instead of editing Project_3_script by hand. It sweeps the filter length
+(numtaps), its band edges (fc1 and fc2), its window, the find_peaks height
+and the IBI time step (dt), over a grid or over random points of a search
+space. Each set of settings is run on every recording. Settings that
+share a filter share its filtered data, and settings that also share the
+height share its heartbeats, so each stage is only run once for each
+distinct set of inputs. The filter groups are spread over a pool of worker
+processes that read the recordings from shared memory. The result is a
+table ranked by how well the heartbeats agree with reference heartbeats
+found without any of the swept settings (the adaptive detector on the raw
+data, or annotated or synthetic beats), with the heart rate variability of
+each recording.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import Project_3_module as p3m
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+
+# the settings of Project_3_script, used for any setting a sweep leaves out
+default_parameters = {'numtaps': 250, 'fc1': .5, 'fc2': 50, 'window': 'hann', 'height': 1.7, 'dt': .1}
+# settings that change the filter, the heartbeats, and only the IBI analysis
+filter_parameters = ['numtaps', 'fc1', 'fc2', 'window']
+detection_parameters = ['numtaps', 'height']
+# metrics kept for each recording
+recording_metrics = ['n_beats', 'sensitivity', 'positive_predictivity', 'agreement',
+                     'heart_rate', 'sdrr', 'lf', 'hf', 'lf_hf_ratio']
+
+#%% Search spaces
+
+def make_grid(space):
+    '''
+    The make_grid function will input the values to try for each setting and
+    return every combination of them. Settings that are left out keep the
+    values in default_parameters.
+
+    Parameters
+    ----------
+    space : Dictionary
+        A list of values for each setting by name, like {'height': [1.6, 1.7, 1.8]}.
+
+    Returns
+    -------
+    points : List of dictionaries
+        The value of every setting at each point of the grid.
+
+    '''
+    check_names(space)
+    names = list(space)
+    return [dict(default_parameters, **dict(zip(names, values)))
+            for values in itertools.product(*(space[name] for name in names))]
+
+
+def make_random(space, n_points, seed=None):
+    '''
+    The make_random function will input a search space and return random
+    points of it. A list of values is chosen from, and a (low, high) tuple
+    is drawn uniformly (as integers if both ends are integers). Settings
+    that are left out keep the values in default_parameters. Repeated points
+    are dropped, so fewer than n_points may be returned.
+
+    Parameters
+    ----------
+    space : Dictionary
+        A list of values or a (low, high) tuple for each setting by name.
+    n_points : Integer
+        The number of points to draw.
+    seed : Integer, optional
+        The seed of the random number generator. The default is None.
+
+    Returns
+    -------
+    points : List of dictionaries
+        The value of every setting at each point.
+
+    '''
+    check_names(space)
+    rng = np.random.default_rng(seed)
+    points = []
+    for _ in range(n_points):
+        point = dict(default_parameters)
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    point[name] = int(rng.integers(low, high + 1))
+                else:
+                    point[name] = float(rng.uniform(low, high))
+            else:
+                point[name] = values[rng.integers(len(values))]
+        if point not in points:
+            points.append(point)
+    return points
+
+
+def check_names(space):
+    '''
+    The check_names function raises a ValueError if a search space has a setting that cannot be swept.
+    '''
+    unknown = set(space) - set(default_parameters)
+    if unknown:
+        raise ValueError(f'cannot sweep {sorted(unknown)}, the settings are {list(default_parameters)}')
+
+#%% Evaluate one filter
+
+def get_ibi_metrics(time_of_heartbeat, dt):
+    '''
+    The get_ibi_metrics function will return the mean heart rate, SDRR, LF,
+    HF and LF/HF ratio of a set of heartbeats, found the same way
+    Project_3_script finds them (nan with too few beats).
+    '''
+    if len(time_of_heartbeat) < 3:
+        return {'heart_rate': np.nan, 'sdrr': np.nan, 'lf': np.nan, 'hf': np.nan, 'lf_hf_ratio': np.nan}
+    regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat, dt)
+    _, _, avg_lf, avg_hf = p3m.calculate_power_spectrum(interpolated_ibi, regular_time[-1], dt)
+    return {'heart_rate': float(60/np.mean(np.diff(time_of_heartbeat))),
+            'sdrr': float(p3m.calculate_hrv(time_of_heartbeat)),
+            'lf': float(avg_lf),
+            'hf': float(avg_hf),
+            'lf_hf_ratio': float(avg_lf/avg_hf) if avg_hf > 0 else np.nan}
+
+
+def evaluate_filter(data, filt, detections, reference_indices, tolerance, fs=500):
+    '''
+    The evaluate_filter function will filter one recording once and evaluate
+    every detection setting and time step that uses that filter. Each height
+    is detected once and shared by all of its time steps.
+
+    Parameters
+    ----------
+    data : Array of floats.
+        A 1D array of the voltage of the recording.
+    filt : Array of floats.
+        A 1D array of n terms where n represents the values of a bandpass filter.
+    detections : List of tuples
+        The (numtaps, height, list of dt) of each detection setting to evaluate.
+    reference_indices : Array of integers.
+        A 1D array of the index of each heartbeat found by the reference detector.
+    tolerance : Integer
+        The most samples between two beats for them to be the same beat.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    Returns
+    -------
+    results : Dictionary
+        The metrics (recording_metrics) of each (numtaps, height, dt).
+
+    '''
+    filtered_data = p3m.apply_filter(data, filt)
+    results = {}
+    for numtaps, height, dts in detections:
+        heartbeat_indices = p3m.find_heartbeat_indices(filtered_data, numtaps, height)
+        sensitivity, positive_predictivity = p3m.match_beats(reference_indices, heartbeat_indices, tolerance)
+        total = sensitivity + positive_predictivity
+        detection_metrics = {'n_beats': len(heartbeat_indices),
+                             'sensitivity': sensitivity,
+                             'positive_predictivity': positive_predictivity,
+                             'agreement': 2*sensitivity*positive_predictivity/total if total > 0 else 0.0}
+        time_of_heartbeat = heartbeat_indices*(1/fs)
+        for dt in dts:
+            results[(numtaps, height, dt)] = dict(detection_metrics, **get_ibi_metrics(time_of_heartbeat, dt))
+    return results
+
+
+def evaluate_shared_filter(shared_name, n_samples, filt, detections, reference_indices, tolerance, fs):
+    '''
+    The evaluate_shared_filter function runs evaluate_filter in a worker
+    process on a recording held in a shared memory buffer made by the parent
+    process. The buffer is only read, and is freed by the parent.
+    '''
+    shared = shared_memory.SharedMemory(name=shared_name)
+    data = np.ndarray((n_samples,), dtype=float, buffer=shared.buf)
+    try:
+        return evaluate_filter(data, filt, detections, reference_indices, tolerance, fs)
+    finally:
+        # the array has to be dropped before the buffer can be closed
+        del data
+        shared.close()
+
+#%% Run a sweep
+
+def load_recordings(recordings=None):
+    '''
+    The load_recordings function will load the recordings to sweep over with
+    Project_3_loader. By default these are the four bundled recordings with
+    the trim and flip Project_3_script uses.
+
+    Parameters
+    ----------
+    recordings : List of tuples, optional
+        The (file name, trim, flip) of each recording. The default is None,
+        which uses the bundled recordings.
+
+    Returns
+    -------
+    data : Dictionary
+        The voltage of each recording, by file name.
+
+    '''
+    if recordings is None:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        recordings = [(os.path.join(folder, file_name), trim, flip) for file_name, trim, flip in p3l.bundled_recordings]
+    return {os.path.basename(file_name): np.asarray(p3l.load_recording(file_name, trim, flip), dtype=float)
+            for file_name, trim, flip in recordings}
+
+
+def get_reference_indices(data, reference='adaptive', fs=500):
+    '''
+    The get_reference_indices function will find the heartbeats each sweep
+    point is compared to. These must not come from the filter and
+    find_peaks settings being swept, or the settings they came from would
+    always rank first.
+
+    Parameters
+    ----------
+    data : Dictionary
+        The voltage of each recording, by name.
+    reference : String or dictionary, optional
+        'adaptive' to use find_heartbeat_indices_adaptive on the raw data, or
+        the heartbeat indices of each recording by name, like annotated beats
+        or the beats of Project_3_synthetic.generate_synthetic_ecg. The default is 'adaptive'.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+
+    Returns
+    -------
+    reference_indices : Dictionary
+        The index of each reference heartbeat of each recording, by name.
+
+    '''
+    if isinstance(reference, dict):
+        return {name: np.asarray(reference[name], dtype=int) for name in data}
+    if reference == 'adaptive':
+        return {name: p3m.find_heartbeat_indices_adaptive(recording, fs) for name, recording in data.items()}
+    raise ValueError(f"reference must be 'adaptive' or a dictionary, not {reference!r}")
+
+
+def run_sweep(points, data=None, reference='adaptive', tolerance=.05, fs=500, n_workers=None):
+    '''
+    The run_sweep function will evaluate every point of a search space on
+    every recording and rank the points. The points are grouped by their
+    filter, and each filter is designed once and run once on each recording,
+    as one task for the pool of worker processes. Within a task each
+    (numtaps, height) is detected once, and each time step reuses those beats.
+
+    Parameters
+    ----------
+    points : List of dictionaries
+        The settings to evaluate, from make_grid or make_random.
+    data : Dictionary, optional
+        The voltage of each recording by name. The default is None, which
+        loads the bundled recordings with load_recordings.
+    reference : String or dictionary, optional
+        The heartbeats the points are compared to (see get_reference_indices).
+        The default is 'adaptive'.
+    tolerance : Float, optional
+        The most time in seconds between two beats for them to be the same beat. The default is .05.
+    fs : Integer, optional
+        The sampling frequency of the arduino sensor. The default is 500.
+    n_workers : Integer, optional
+        The number of worker processes. The default is None, which uses one per
+        core. With 1 everything runs in this process.
+
+    Returns
+    -------
+    results : List of dictionaries
+        One row per point, best first, with its settings, the mean and lowest
+        agreement (F1 score of sensitivity and positive predictivity) over
+        the recordings, and the recording_metrics of each recording under
+        'recordings', by name.
+    summary : Dictionary
+        The number of points, recordings, filters and detections run, and the wall time.
+
+    '''
+    if data is None:
+        data = load_recordings()
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    start_time = time.perf_counter()
+    reference_indices = get_reference_indices(data, reference, fs)
+    tolerance_samples = int(round(tolerance*fs))
+
+    # group the points by filter, then by detection setting
+    groups = {}
+    for point in points:
+        filter_key = tuple(point[name] for name in filter_parameters)
+        detections = groups.setdefault(filter_key, {})
+        dts = detections.setdefault(tuple(point[name] for name in detection_parameters), [])
+        if point['dt'] not in dts:
+            dts.append(point['dt'])
+    filters = {filter_key: p3f.get_filter(filter_key[0], [filter_key[1], filter_key[2]], filter_key[3], fs)
+               for filter_key in groups}
+    tasks = [(name, filter_key, [key + (dts,) for key, dts in groups[filter_key].items()])
+             for name in data for filter_key in groups]
+
+    evaluated = {}
+    if n_workers == 1:
+        for name, filter_key, detections in tasks:
+            evaluated[(name, filter_key)] = evaluate_filter(data[name], filters[filter_key], detections,
+                                                            reference_indices[name], tolerance_samples, fs)
+    else:
+        shared_buffers = {}
+        try:
+            for name, recording in data.items():
+                shared = shared_memory.SharedMemory(create=True, size=max(recording.nbytes, 1))
+                shared_buffers[name] = shared
+                np.ndarray(recording.shape, dtype=float, buffer=shared.buf)[:] = recording
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = {(name, filter_key): executor.submit(evaluate_shared_filter, shared_buffers[name].name,
+                                                               len(data[name]), filters[filter_key], detections,
+                                                               reference_indices[name], tolerance_samples, fs)
+                           for name, filter_key, detections in tasks}
+                evaluated = {key: future.result() for key, future in futures.items()}
+        finally:
+            for shared in shared_buffers.values():
+                shared.close()
+                shared.unlink()
+
+    results = []
+    for point in points:
+        filter_key = tuple(point[name] for name in filter_parameters)
+        result_key = (point['numtaps'], point['height'], point['dt'])
+        per_recording = {name: evaluated[(name, filter_key)][result_key] for name in data}
+        agreements = [metrics['agreement'] for metrics in per_recording.values()]
+        results.append(dict(point, mean_agreement=float(np.mean(agreements)),
+                            min_agreement=float(np.min(agreements)), recordings=per_recording))
+    results.sort(key=lambda row: (-row['mean_agreement'], -row['min_agreement']))
+
+    summary = {'n_points': len(points),
+               'n_recordings': len(data),
+               'n_filters': len(tasks),
+               'n_detections': sum(len(detections) for _, _, detections in tasks),
+               'n_workers': n_workers,
+               'wall_time': time.perf_counter() - start_time}
+    return results, summary
+
+
+def write_sweep(results, file_name):
+    '''
+    The write_sweep function will input the rows returned by run_sweep and
+    write them to a .csv file, one row per point with a column for each
+    metric of each recording (named recording:metric).
+
+    Parameters
+    ----------
+    results : List of dictionaries
+        The rows returned by run_sweep.
+    file_name : String
+        The path of the .csv file to write.
+
+    Returns
+    -------
+    None.
+
+    '''
+    names = list(results[0]['recordings']) if results else []
+    columns = (['rank'] + list(default_parameters) + ['mean_agreement', 'min_agreement']
+               + [f'{name}:{metric}' for name in names for metric in recording_metrics])
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for rank, row in enumerate(results, 1):
+            flat_row = dict(row, rank=rank)
+            for name, metrics in row['recordings'].items():
+                flat_row.update({f'{name}:{metric}': metrics[metric] for metric in recording_metrics})
+            writer.writerow(flat_row)
+
+
+def print_sweep(results, top=10):
+    '''
+    The print_sweep function will print the best points of a sweep.
+    '''
+    print(f"{'rank':>4} {'numtaps':>7} {'fc1':>5} {'fc2':>5} {'window':>9} {'height':>6} {'dt':>5} "
+          f"{'mean agree':>10} {'min agree':>9}")
+    for rank, row in enumerate(results[:top], 1):
+        print(f"{rank:>4} {row['numtaps']:>7} {row['fc1']:>5g} {row['fc2']:>5g} {row['window']:>9} "
+              f"{row['height']:>6g} {row['dt']:>5g} {row['mean_agreement']:>10.3f} {row['min_agreement']:>9.3f}")
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Project_3_synthetic.py
+Created on Sat Oct 17 23:52:40 2026
+This module makes the synthetic data the tests and Project_3_benchmark run
+on: ECG recordings with a known heart rate and heart rate variability,
+arduino text files of them (including ones many hours long), the same
+recordings with artifacts added, and made up rows of run_batch results for
+a cohort of recordings.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import shutil
+import numpy as np
+import Project_3_loader as p3l
+
+#%% Synthetic ECG
+
+def generate_synthetic_ecg(duration, fs=500, heart_rate=70, lf_amplitude=.03, hf_amplitude=.02,
+                           noise=.01, seed=None):
+    '''
+    The generate_synthetic_ecg function will make an ECG recording that looks
+    like the arduino data (a baseline around 1.65 V with R peaks near 2.3 V).
+    The time between beats is modulated by a 0.1 Hz (LF) and a 0.25 Hz (HF)
+    sine wave so the recording has a known heart rate variability.
+
+    Parameters
+    ----------
+    duration : Float
+        The length of the recording in seconds.
+    fs : Integer, optional
+        The sampling frequency in Hz. The default is 500.
+    heart_rate : Float, optional
+        The mean heart rate in beats per minute. The default is 70.
+    lf_amplitude : Float, optional
+        The amplitude in seconds of the LF change in the time between beats. The default is .03.
+    hf_amplitude : Float, optional
+        The amplitude in seconds of the HF change in the time between beats. The default is .02.
+    noise : Float, optional
+        The standard deviation in volts of the noise added to the recording. The default is .01.
+    seed : Integer, optional
+        The seed of the random number generator. The default is None.
+
+    Returns
+    -------
+    ecg_data : Array of floats.
+        A 1D array of the synthetic voltage at each sample.
+    time_of_heartbeat : Array of floats.
+        A 1D array of the time of each R peak in seconds.
+
+    '''
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration*fs)
+    mean_interval = 60/heart_rate
+
+    # find the beat times one at a time, since each interval depends on when the beat is
+    n_beats = int(duration/mean_interval*1.2) + 2
+    beat_times = np.empty(n_beats)
+    beat_time = mean_interval/2
+    for beat_index in range(n_beats):
+        beat_times[beat_index] = beat_time
+        beat_time += (mean_interval + lf_amplitude*np.sin(2*np.pi*.1*beat_time)
+                      + hf_amplitude*np.sin(2*np.pi*.25*beat_time))
+    time_of_heartbeat = beat_times[beat_times < (n_samples - fs//2)/fs]
+
+    # one PQRST beat made of gaussian waves (offset in seconds, width in seconds, height in volts)
+    waves = [(-.2, .025, .1), (-.03, .008, -.08), (0, .01, .65), (.03, .008, -.15), (.25, .04, .2)]
+    template_time = np.arange(-fs//2, fs//2)/fs
+    template = np.zeros(len(template_time))
+    for offset, width, wave_height in waves:
+        template += wave_height*np.exp(-.5*((template_time - offset)/width)**2)
+
+    # add a beat at each R peak
+    ecg_data = np.full(n_samples, 1.65)
+    beat_samples = np.round(time_of_heartbeat*fs).astype(int)
+    for beat_sample in beat_samples:
+        start = beat_sample - fs//2
+        template_start = max(0, -start)
+        ecg_data[max(start, 0):start + len(template)] += template[template_start:]
+    ecg_data += noise*rng.standard_normal(n_samples)
+
+    return ecg_data, beat_samples/fs
+
+
+def write_adc_file(ecg_data, file_name):
+    '''
+    The write_adc_file function will convert a recording in volts back to
+    10 bit ADC counts and write it as a text file like the arduino files.
+    '''
+    counts = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, 1023).astype(int)
+    np.savetxt(file_name, counts, fmt='%d')
+
+
+def write_long_recording(file_name, hours, seed=0):
+    '''
+    The write_long_recording function will write a synthetic recording that
+    is a whole number of hours long as an arduino text file. One hour of
+    synthetic ECG is made and written, and then the text is copied onto the
+    end of the file until it is long enough, so even a 24 hour file is
+    written without holding it in memory.
+    '''
+    hour_file = file_name + '.hour.txt'
+    ecg_data, _ = generate_synthetic_ecg(3600, seed=seed)
+    write_adc_file(ecg_data, hour_file)
+    del ecg_data
+    with open(file_name, 'wb') as file:
+        for _ in range(int(hours)):
+            with open(hour_file, 'rb') as hour:
+                shutil.copyfileobj(hour, file, 1 << 20)
+    os.remove(hour_file)
+
+#%% Signal quality
+
+def add_artifacts(ecg_data, fs=500, seed=0):
+    '''
+    The add_artifacts function will add four artifacts to a copy of a
+    synthetic recording, one at 20%, 40%, 60% and 80% of the way through, each
+    8 seconds long: the leads coming off (a flat line), noise that
+    saturates the ADC, a burst of muscle noise and a baseline swing from
+    moving. The recording is then rounded to the ADC counts like the arduino
+    data. It returns the recording and the start and stop sample of each artifact.
+    '''
+    rng = np.random.default_rng(seed)
+    ecg_data = ecg_data.copy()
+    length = 8*fs
+    starts = (np.array([.2, .4, .6, .8])*len(ecg_data)).astype(int)
+    ecg_data[starts[0]:starts[0] + length] = 1.65 + .002*rng.standard_normal(length)
+    ecg_data[starts[1]:starts[1] + length] += 3*rng.standard_normal(length)
+    ecg_data[starts[2]:starts[2] + length] += .8*rng.standard_normal(length)
+    ecg_data[starts[3]:starts[3] + length] += 1.5*np.sin(2*np.pi*.5*np.arange(length)/fs)
+    ecg_data = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, p3l.max_count)*p3l.volts_per_count
+    return ecg_data, np.stack([starts, starts + length], axis=1)
+
+#%% Cohort statistics
+
+def make_cohort_results(n_recordings=4000, seed=0):
+    '''
+    The make_cohort_results function will make rows like the ones
+    run_batch returns for a cohort of recordings of the four activities,
+    without any ECG. The LF/HF ratio is lognormal around 0.5 for resting and
+    relaxing, 0.9 for mental stress and 1.6 for physical stress, and the SDRR
+    is the same for every activity.
+    '''
+    rng = np.random.default_rng(seed)
+    activities = np.array(['Resting', 'Relaxing', 'Mental', 'Physical'])
+    ratio_means = np.array([.5, .5, .9, 1.6])
+    activity_index = np.arange(n_recordings) % len(activities)
+    hf = rng.lognormal(np.log(.8), .4, n_recordings)
+    lf_hf_ratio = rng.lognormal(np.log(ratio_means[activity_index]), .5)
+    sdrr = rng.normal(.05, .01, n_recordings)
+    return [{'recording': f'recording_{index}.txt', 'activity': activities[activity_index[index]],
+             'sdrr': sdrr[index], 'lf': hf[index]*lf_hf_ratio[index], 'hf': hf[index],
+             'lf_hf_ratio': lf_hf_ratio[index]}
+            for index in range(n_recordings)]
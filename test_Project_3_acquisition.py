@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_acquisition.py
+Created on Sat Oct 17 17:52:09 2026
+Tests of the live acquisition of Project_3_acquisition. Synthetic recordings
+are served by SimulatedArduino devices much faster than real time, and the
+beats found live are compared to the streaming pipeline of Project_3_stream
+on the whole recording.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import asyncio
+import numpy as np
+import Project_3_acquisition as p3a
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_stream as p3s
+import Project_3_synthetic as p3syn
+
+
+def make_recordings(n_devices=3, duration=30):
+    '''
+    The make_recordings function will make a synthetic recording for each
+    device, rounded to the ADC counts the devices send.
+    '''
+    recordings = {}
+    for device in range(n_devices):
+        ecg_data, _ = p3syn.generate_synthetic_ecg(duration, heart_rate=60 + 5*device, seed=device)
+        counts = np.clip(np.round(ecg_data/p3l.volts_per_count), 0, p3l.max_count)
+        recordings[f'device {device}'] = counts*p3l.volts_per_count
+    return recordings
+
+
+def test_live_beats_match_whole_recording():
+    recordings = make_recordings()
+    reports = asyncio.run(p3a.acquire_simulated(recordings, speed=50))
+    for name, ecg_data in recordings.items():
+        reference = np.concatenate(list(p3s.detect_beats(p3s.stream_filter([ecg_data], p3f.get_filter()))))
+        live = reports[name]['time_of_heartbeat']
+        assert len(live) == len(reference)
+        assert np.allclose(live, reference)
+        assert reports[name]['samples'] == len(ecg_data)
+        assert reports[name]['bad_lines'] == 0
+
+
+def test_latency_report_covers_whole_stream():
+    recordings = make_recordings(1)
+    report = asyncio.run(p3a.acquire_simulated(recordings, speed=50))['device 0']
+    assert report['detector']['chunks'] > 0
+    assert report['detector']['real_time_factor'] > 0
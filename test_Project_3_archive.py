@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_archive.py
+Created on Sat Oct 17 19:21:15 2026
+Tests that the Project_3_archive format is lossless: whole archives, random
+ranges read from them, and archives loaded through Project_3_loader all
+give back the ADC counts they were written from.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import numpy as np
+import Project_3_archive as p3a
+import Project_3_loader as p3l
+import Project_3_synthetic as p3syn
+
+
+def get_counts(duration, seed=0):
+    '''
+    The get_counts function will return the ADC counts of a synthetic recording.
+    '''
+    ecg_data, _ = p3syn.generate_synthetic_ecg(duration, seed=seed)
+    return np.clip(np.round(ecg_data/p3l.volts_per_count), 0, p3l.max_count).astype(np.int16)
+
+
+def test_archive_round_trip_is_lossless(tmp_path):
+    counts = get_counts(600)
+    archive_name = os.path.join(tmp_path, 'synthetic.p3a')
+    archive_size = p3a.write_archive(counts, archive_name, chunk_samples=4096)
+    assert archive_size == os.path.getsize(archive_name) < 2*len(counts)
+    assert np.array_equal(p3a.load_archive(archive_name, counts=True), counts)
+    assert np.array_equal(p3a.load_archive(archive_name, 1000, True, counts=True), counts[:-1000][::-1])
+
+
+def test_random_ranges_are_lossless(tmp_path):
+    counts = get_counts(600)
+    archive_name = os.path.join(tmp_path, 'synthetic.p3a')
+    p3a.write_archive(counts, archive_name, chunk_samples=4096)
+    rng = np.random.default_rng(0)
+    with p3a.ArchiveReader(archive_name) as reader:
+        assert len(reader) == len(counts)
+        for start, length in zip(rng.integers(0, len(counts), 50), rng.integers(0, 20000, 50)):
+            assert np.array_equal(reader.read_counts(start, start + length), counts[start:start + length])
+        assert np.allclose(reader.read(100, 200), counts[100:200]*p3l.volts_per_count)
+
+
+def test_loader_reads_archives(tmp_path):
+    counts = get_counts(60)
+    archive_name = os.path.join(tmp_path, 'synthetic' + p3l.archive_extension)
+    p3a.write_archive(counts, archive_name)
+    assert np.array_equal(p3l.load_counts(archive_name, 500, True), counts[:-500][::-1])
+    assert np.allclose(p3l.load_recording(archive_name, 500, True), counts[:-500][::-1]*p3l.volts_per_count)
+    chunks = list(p3l.iterate_recording(archive_name, 7000, 500, True))
+    assert np.allclose(np.concatenate(chunks), counts[:-500][::-1]*p3l.volts_per_count)
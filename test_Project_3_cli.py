@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_cli.py
+Created on Sat Oct 17 19:36:42 2026
+Tests of the Project_3_cli command line tool on synthetic recordings: the
+results it writes, that the streaming analysis finds the same heartbeats,
+and its exit status for missing recordings.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import json
+import os
+import pytest
+import Project_3_cli as p3cli
+import Project_3_synthetic as p3syn
+
+
+@pytest.fixture
+def recording_dir(tmp_path):
+    '''
+    The recording_dir fixture will write two synthetic recordings to a folder.
+    '''
+    for seed in range(2):
+        ecg_data, _ = p3syn.generate_synthetic_ecg(60, seed=seed)
+        p3syn.write_adc_file(ecg_data, os.path.join(tmp_path, f'synthetic_{seed}.txt'))
+    return tmp_path
+
+
+def run_cli(inputs, output_dir, *options):
+    '''
+    The run_cli function will run Project_3_cli without figures or printing
+    and return its exit status and the results it wrote.
+    '''
+    status = p3cli.main([*inputs, '--output-dir', str(output_dir), '--jobs', '1', '--no-plots', '--quiet',
+                         *options])
+    results_name = os.path.join(output_dir, 'results.json')
+    if not os.path.exists(results_name):
+        return status, None
+    with open(results_name) as file:
+        return status, json.load(file)
+
+
+def test_folder_is_analyzed(recording_dir, tmp_path):
+    status, output = run_cli([str(recording_dir)], tmp_path/'batch')
+    assert status == 0
+    assert [os.path.basename(row['recording']) for row in output['results']] == ['synthetic_0.txt', 'synthetic_1.txt']
+    assert all(row['n_beats'] > 0 for row in output['results'])
+    assert os.path.exists(tmp_path/'batch'/'results.csv')
+    assert os.path.exists(tmp_path/'batch'/'timing.json')
+
+
+def test_stream_finds_the_same_beats(recording_dir, tmp_path):
+    _, batch = run_cli([str(recording_dir)], tmp_path/'batch')
+    status, stream = run_cli([str(recording_dir)], tmp_path/'stream', '--stream')
+    assert status == 0
+    assert [row['n_beats'] for row in stream['results']] == [row['n_beats'] for row in batch['results']]
+
+
+def test_empty_glob_exits_1(tmp_path):
+    assert run_cli([str(tmp_path/'*.txt')], tmp_path/'out') == (1, None)
+
+
+def test_missing_recording_exits_2(tmp_path):
+    with pytest.raises(SystemExit) as error:
+        run_cli([str(tmp_path/'missing.txt')], tmp_path/'out')
+    assert error.value.code == 2
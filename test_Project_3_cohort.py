@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_cohort.py
+Created on Sat Oct 17 18:52:06 2026
+Tests of the cohort statistics of Project_3_cohort on a made up cohort from
+Project_3_synthetic.make_cohort_results, where only the LF/HF ratio differs
+between activities, except between resting and relaxing.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import Project_3_cohort as p3c
+import Project_3_synthetic as p3syn
+
+
+def test_compare_activities_finds_the_lf_hf_differences():
+    results = p3syn.make_cohort_results(4000, seed=0)
+    intervals, comparisons = p3c.compare_activities(results, n_resamples=2000, seed=0)
+    assert len(intervals) == 4*len(p3c.cohort_metrics)
+    assert all(row['low'] <= row['statistic'] <= row['high'] for row in intervals)
+    for row in comparisons:
+        if row['metric'] == 'sdrr':
+            assert row['p_holm'] >= .05
+        elif row['metric'] == 'lf_hf_ratio':
+            same = {row['group_a'], row['group_b']} == {'Resting', 'Relaxing'}
+            assert (row['p_holm'] >= .05) if same else (row['p_holm'] < .05)
+
+
+def test_empty_cohort_gives_no_rows():
+    assert p3c.summarize_groups([]) == []
+    assert p3c.compare_activities([]) == ([], [])
+
+
+def test_single_activity_has_no_comparisons():
+    results = [row for row in p3syn.make_cohort_results(200, seed=0) if row['activity'] == 'Resting']
+    intervals, comparisons = p3c.compare_activities(results, n_resamples=200, seed=0)
+    assert len(intervals) == len(p3c.cohort_metrics)
+    assert comparisons == []
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_memo.py
+Created on Sat Oct 17 18:14:37 2026
+Tests of the stage memoization of Project_3_memo: results read back from
+disk match the stages run with memoization off, changing the LF band only
+runs the power spectrum again, stages are keyed on the recording file and on
+the stages before them, and a warm run of the bundled recordings is faster
+than running them with memoization off.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import time
+import numpy as np
+import pytest
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_memo as p3memo
+import Project_3_module as p3m
+import Project_3_spectral as p3sp
+import Project_3_synthetic as p3syn
+
+
+def analyze(ecg_data, lf_band=p3sp.lf_band):
+    '''
+    The analyze function will run the stages of Project_3_script on a
+    recording and return the LF and HF averages of its power spectrum.
+    '''
+    filtered = p3m.apply_filter(ecg_data, p3f.get_filter())
+    time_of_heartbeat = p3m.find_heartbeat_indices(filtered, 250)*(1/500)
+    regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat)
+    return np.array(p3m.calculate_power_spectrum(interpolated_ibi, regular_time[-1], lf_band=lf_band)[2:])
+
+
+@pytest.fixture
+def memo_dir(tmp_path):
+    p3memo.enable_memoization(str(tmp_path))
+    p3memo.reset_stats()
+    yield tmp_path
+    p3memo.disable_memoization()
+
+
+def test_rerun_reads_every_stage_back(memo_dir):
+    ecg_data, _ = p3syn.generate_synthetic_ecg(300, seed=0)
+    first = analyze(ecg_data)
+    p3memo.reset_stats()
+    assert np.array_equal(analyze(ecg_data), first)
+    assert all(counts == {'hits': 1, 'misses': 0} for counts in p3memo.get_stats().values())
+
+
+def test_new_band_only_reruns_power_spectrum(memo_dir):
+    ecg_data, _ = p3syn.generate_synthetic_ecg(300, seed=0)
+    new_band = (.05, .15)
+    analyze(ecg_data)
+    p3memo.reset_stats()
+    band_powers = analyze(ecg_data, new_band)
+    stats = p3memo.get_stats()
+    assert stats.pop('calculate_power_spectrum') == {'hits': 0, 'misses': 1}
+    assert all(counts['misses'] == 0 for counts in stats.values())
+
+    # the saved result is the one for the new band, also once the grids are recalculated
+    p3memo.disable_memoization()
+    expected = analyze(ecg_data, new_band)
+    assert np.array_equal(band_powers, expected)
+    assert not np.array_equal(expected, analyze(ecg_data))
+    p3sp.get_frequency_grid.cache_clear()
+    p3memo.enable_memoization(str(memo_dir))
+    assert np.array_equal(analyze(ecg_data, new_band), expected)
+
+
+def analyze_bundled():
+    '''
+    The analyze_bundled function will load the bundled recordings and run
+    analyze on each of them.
+    '''
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for file_name, trim, flip in p3l.bundled_recordings:
+        analyze(p3l.load_recording(os.path.join(folder, file_name), trim, flip))
+
+
+def get_best_time(function, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def test_stages_are_keyed_on_file_and_upstream_stage(memo_dir, tmp_path):
+    ecg_data, _ = p3syn.generate_synthetic_ecg(60, seed=0)
+    file_name = str(tmp_path / 'synthetic.txt')
+    p3syn.write_adc_file(ecg_data, file_name)
+    data = p3l.load_recording(file_name, cache_dir=str(tmp_path / 'cache'))
+    data_key = p3memo.get_array_key(data)
+    assert str(os.stat(file_name).st_mtime_ns) in data_key
+    assert not data.flags.writeable
+
+    filtered = p3m.apply_filter(data, p3f.get_filter())
+    filter_key = p3memo.get_array_key(filtered)
+    assert filter_key is not None and not filtered.flags.writeable
+    # the key of the stage is the same for an array with the same key, whatever its samples
+    arguments = {'data': data, 'filt': p3f.get_filter()}
+    stand_in = np.zeros(len(data))
+    p3memo.set_array_key(stand_in, data_key)
+    assert p3memo.get_key('apply_filter', {**arguments, 'data': stand_in}) == p3memo.get_key('apply_filter', arguments)
+    # a file that changed gets a new key
+    os.utime(file_name, ns=(0, 0))
+    assert p3memo.get_array_key(p3l.load_recording(file_name, cache_dir=str(tmp_path / 'cache'))) != data_key
+
+
+def test_warm_run_is_faster_than_memoization_off(memo_dir):
+    p3memo.disable_memoization()
+    off_time = get_best_time(analyze_bundled)
+    p3memo.enable_memoization(str(memo_dir))
+    analyze_bundled()
+    p3memo.reset_stats()
+    warm_time = get_best_time(analyze_bundled)
+    assert all(counts['misses'] == 0 for counts in p3memo.get_stats().values())
+    assert warm_time < off_time/1.5
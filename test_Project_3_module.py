@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_module.py
+Created on Sat Oct 17 17:05:12 2026
+Tests that the compute path of Project_3_module stays headless and quick to
+import, and that the adaptive heartbeat detector finds the beats the fixed
+height detector finds on the bundled recordings, at any gain, in less time.
+Each import check runs a fresh interpreter with python -X importtime, so
+modules already imported by pytest do not hide what the import pulls in.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_module as p3m
+
+# longest Project_3_module may take to import, in seconds (numpy and scipy included)
+import_time_budget = 3.0
+# fewest of the fixed height beats the adaptive detector must find, and of its beats that must be fixed height beats
+min_agreement = .98
+
+
+def get_import_times(module_name):
+    '''
+    The get_import_times function will import a module in a new interpreter
+    with -X importtime and return the cumulative import time in seconds of
+    every module that was imported, keyed by module name.
+    '''
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               capture_output=True, text=True, check=True)
+    import_times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        import_times[name.strip()] = int(cumulative)/1e6
+    return import_times
+
+
+def test_module_does_not_import_matplotlib():
+    import_times = get_import_times('Project_3_module')
+    assert 'Project_3_module' in import_times
+    assert not [name for name in import_times if name.split('.')[0] == 'matplotlib']
+
+
+def test_module_import_time_within_budget():
+    import_times = get_import_times('Project_3_module')
+    assert import_times['Project_3_module'] < import_time_budget
+
+
+@pytest.fixture(scope='module')
+def recordings():
+    folder = os.path.dirname(os.path.abspath(__file__))
+    return [np.asarray(p3l.load_recording(os.path.join(folder, file_name), trim, flip))
+            for file_name, trim, flip in p3l.bundled_recordings]
+
+
+def find_fixed_height_beats(ecg_data, numtaps=250):
+    '''
+    The find_fixed_height_beats function will find the heartbeats of raw data
+    like Project_3_script does, filtering it and finding the peaks above 1.7 V.
+    '''
+    filtered = p3m.apply_filter(ecg_data, p3f.get_filter(numtaps, (.5, 50), 'hann', 500))
+    return p3m.find_heartbeat_indices(filtered, numtaps)
+
+
+@pytest.mark.parametrize('gain', [1, .3])
+def test_adaptive_detector_matches_fixed_height(recordings, gain):
+    for ecg_data in recordings:
+        # the fixed height beats of the data before it is scaled, at most 0.4 s apart
+        # (numtaps=250 would drop the beats of the physical recording above 120 bpm)
+        reference_indices = find_fixed_height_beats(ecg_data, numtaps=200)
+        detected_indices = p3m.find_heartbeat_indices_adaptive(1.65 + gain*(ecg_data - 1.65))
+        sensitivity, positive_predictivity = p3m.match_beats(reference_indices, detected_indices, 25)
+        assert sensitivity >= min_agreement
+        assert positive_predictivity >= min_agreement
+
+
+def test_adaptive_detector_is_faster_than_fixed_height(recordings):
+    def get_best_time(detector):
+        times = []
+        for _ in range(5):
+            start_time = time.perf_counter()
+            for ecg_data in recordings:
+                detector(ecg_data)
+            times.append(time.perf_counter() - start_time)
+        return min(times)
+
+    assert get_best_time(p3m.find_heartbeat_indices_adaptive) <= get_best_time(find_fixed_height_beats)
+
+
+def test_channels_match_rows(recordings):
+    channels = np.stack(recordings)
+    filtered = p3m.apply_filter(channels, p3f.get_filter(250, (.5, 50), 'hann', 500))
+    for channel_indices, row in zip(p3m.find_heartbeat_indices(filtered, 250), filtered):
+        assert np.array_equal(channel_indices, p3m.find_heartbeat_indices(row, 250))
+    for channel_indices, row in zip(p3m.find_heartbeat_indices_adaptive(channels), channels):
+        assert np.array_equal(channel_indices, p3m.find_heartbeat_indices_adaptive(row))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_precision.py
+Created on Sat Oct 17 19:02:26 2026
+Tests of the int16/float32 analysis of Project_3_precision against the
+float64 analysis of Project_3_module: the filtered data and power spectrum
+stay within their error bounds, the heartbeats move by at most a sample, and
+load_counts gives the counts written in the text file.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import os
+import numpy as np
+import pytest
+import Project_3_filters as p3f
+import Project_3_loader as p3l
+import Project_3_module as p3m
+import Project_3_precision as p3prec
+import Project_3_synthetic as p3syn
+
+
+@pytest.fixture(scope='module')
+def counts():
+    ecg_data, _ = p3syn.generate_synthetic_ecg(600, seed=0)
+    return np.clip(np.round(ecg_data/p3l.volts_per_count), 0, p3l.max_count).astype(np.int16)
+
+
+@pytest.mark.parametrize('fft_size', [None, 1024])
+def test_filter_within_error_bound(counts, fft_size):
+    filt = p3f.get_filter()
+    filtered_32 = p3prec.apply_filter_counts(counts, filt, fft_size=fft_size)
+    filtered_64 = p3m.apply_filter(counts*p3l.volts_per_count, filt)
+    assert filtered_32.dtype == np.float32
+    assert np.max(np.abs(filtered_32 - filtered_64)) <= p3prec.get_filter_error_bound(filt, fft_size)
+
+
+def test_filter_channels_match_rows(counts):
+    filt = p3f.get_filter()
+    channels = np.stack([counts[:100000], counts[100000:200000]])
+    filtered = p3prec.apply_filter_counts(channels, filt)
+    for row, filtered_row in zip(channels, filtered):
+        assert np.array_equal(filtered_row, p3prec.apply_filter_counts(row, filt))
+
+
+def test_heartbeats_and_power_within_bounds(counts):
+    filt = p3f.get_filter()
+    beats_64 = p3m.find_heartbeat_indices(p3m.apply_filter(counts*p3l.volts_per_count, filt), 250)
+    beats_32 = p3m.find_heartbeat_indices(p3prec.apply_filter_counts(counts, filt), 250)
+    assert len(beats_32) == len(beats_64)
+    assert np.max(np.abs(beats_32 - beats_64)) <= 1
+
+    regular_time, interpolated_ibi = p3m.interpolate_ibi(beats_64*(1/500))
+    _, power_64, _, _ = p3m.calculate_power_spectrum(interpolated_ibi, regular_time[-1])
+    _, power_32, _, _ = p3prec.calculate_power_spectrum(interpolated_ibi, regular_time[-1])
+    assert np.max(np.abs(power_32 - power_64)) <= p3prec.get_power_error_bound(interpolated_ibi, regular_time[-1])
+
+
+def test_bundled_heartbeats_unchanged():
+    filt = p3f.get_filter()
+    for file_name, trim, flip in p3l.bundled_recordings:
+        beats_64 = p3m.find_heartbeat_indices(p3m.apply_filter(p3l.load_recording(file_name, trim, flip), filt), 250)
+        beats_32 = p3m.find_heartbeat_indices(p3prec.apply_filter_counts(p3l.load_counts(file_name, trim, flip),
+                                                                         filt), 250)
+        assert np.array_equal(beats_32, beats_64)
+
+
+def test_load_counts_parses_text_counts(counts, tmp_path):
+    file_name = str(tmp_path / 'synthetic.txt')
+    np.savetxt(file_name, counts, fmt='%d')
+    loaded = p3l.load_counts(file_name, trim=10, flip=True)
+    assert loaded.dtype == np.int16
+    assert np.array_equal(loaded, counts[:-10][::-1])
+    assert np.array_equal(p3l.load_recording(file_name, trim=10, flip=True), loaded*p3l.volts_per_count)
+    # a text file that does not hold whole counts is not cached
+    with open(file_name, 'a') as file:
+        file.write('511.5\n')
+    with pytest.raises(ValueError):
+        p3l.load_counts(file_name)
+    assert not os.path.exists(os.path.join(tmp_path, p3l.cache_folder, 'synthetic.counts.npy.tmp.npy'))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_quality.py
+Created on Sat Oct 17 19:04:37 2026
+Tests of the signal quality gate of Project_3_quality on a synthetic
+recording with the four artifacts of Project_3_synthetic.add_artifacts. The
+bad segments are taken out before the heartbeats are found, so the adaptive
+detector still finds the beats around them, and no interval that crosses a
+bad segment is kept.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import numpy as np
+import Project_3_batch as p3b
+import Project_3_filters as p3f
+import Project_3_module as p3m
+import Project_3_quality as p3q
+import Project_3_synthetic as p3syn
+
+
+def test_clean_recording_has_no_bad_segments():
+    ecg_data, _ = p3syn.generate_synthetic_ecg(300, seed=0)
+    assert len(p3q.get_bad_segments(p3q.get_signal_quality(ecg_data))) == 0
+
+
+def test_every_artifact_is_in_a_bad_segment():
+    ecg_data, _ = p3syn.generate_synthetic_ecg(300, seed=0)
+    noisy_data, artifacts = p3syn.add_artifacts(ecg_data, seed=0)
+    bad_segments = p3q.get_bad_segments(p3q.get_signal_quality(noisy_data))
+    for start, stop in artifacts:
+        assert np.any((bad_segments[:, 0] <= start) & (bad_segments[:, 1] >= stop))
+
+
+def test_gate_restores_the_sdrr():
+    filt = p3f.get_filter(250, (.5, 50), 'hann', 500)
+    ecg_data, _ = p3syn.generate_synthetic_ecg(300, seed=0)
+    noisy_data, artifacts = p3syn.add_artifacts(ecg_data, seed=0)
+    clean = p3b.analyze_recording(ecg_data, filt, 250)
+    ungated = p3b.analyze_recording(noisy_data, filt, 250)
+    gated = p3b.analyze_recording(noisy_data, filt, 250, quality=True)
+    assert gated['n_bad_segments'] == len(artifacts)
+    assert gated['n_beats'] < clean['n_beats']
+    # the artifacts throw off the SDRR unless their heartbeats are left out
+    assert abs(ungated['sdrr'] - clean['sdrr']) > .1
+    assert abs(gated['sdrr'] - clean['sdrr']) < .005
+
+
+def test_adaptive_thresholds_ignore_bad_segments():
+    ecg_data, time_of_heartbeat = p3syn.generate_synthetic_ecg(300, seed=0)
+    noisy_data, _ = p3syn.add_artifacts(ecg_data, seed=0)
+    bad_segments = p3q.get_bad_segments(p3q.get_signal_quality(noisy_data), margin=125)
+    mask = p3q.get_sample_mask(bad_segments, len(noisy_data))
+    true_indices = np.round(time_of_heartbeat*500).astype(int)
+    true_indices = true_indices[mask[true_indices]]
+    time_array = np.arange(len(noisy_data))/500
+
+    gated = p3m.get_heartbeats(noisy_data, 250, time_array, method='adaptive', mask=mask)
+    gated_indices = np.round(gated*500).astype(int)
+    assert np.all(mask[gated_indices])
+    assert min(p3m.match_beats(true_indices, gated_indices, 25)) > .99
+    # dropping the beats in the bad segments only after detection leaves thresholds set by the artifacts
+    ungated = p3m.find_heartbeat_indices_adaptive(noisy_data)
+    assert p3m.match_beats(true_indices, ungated[mask[ungated]], 25)[0] < .9
+
+    # no interval across a bad segment is kept
+    valid = p3q.find_ibi_outliers(gated, bad_segments)
+    starts, stops = bad_segments[:, 0]/500, bad_segments[:, 1]/500
+    crosses = np.any((gated[:-1, None] < stops) & (gated[1:, None] > starts), axis=1)
+    assert np.count_nonzero(crosses) == len(bad_segments)
+    assert not np.any(valid & crosses)
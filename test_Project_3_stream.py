@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_stream.py
+Created on Sat Oct 17 17:31:48 2026
+Tests of the streaming analysis of Project_3_stream: the streaming filter and
+heartbeat detector against the whole-recording functions of Project_3_module,
+the interpolated intervals of the sliding HRV tracker against interpolate_ibi,
+and the memory of run_pipeline as the recording grows from 1 to 24 hours.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+import Project_3_filters as p3f
+import Project_3_module as p3m
+import Project_3_stream as p3s
+import Project_3_synthetic as p3syn
+
+# the most the peak memory of run_pipeline may grow from 1 to 24 hours, in bytes
+# (the beat times it keeps take up about 1 MB a day)
+memory_growth_limit = 8 << 20
+
+
+def test_streaming_filter_matches_convolve():
+    ecg_data, _ = p3syn.generate_synthetic_ecg(60, seed=0)
+    filt = p3f.get_filter()
+    filtered = np.concatenate(list(p3s.stream_filter(p3s.iterate_chunks(ecg_data, 4999), filt)))
+    assert np.allclose(filtered, np.convolve(ecg_data, filt, mode='same'))
+
+
+def test_online_detector_matches_find_peaks_and_keeps_latency():
+    ecg_data, _ = p3syn.generate_synthetic_ecg(120, seed=0)
+    filtered = p3m.apply_filter(ecg_data, p3f.get_filter())
+    detector = p3s.OnlineBeatDetector()
+    beats = [detector.process(chunk) for chunk in p3s.iterate_chunks(filtered, 1000)]
+    beats.append(detector.flush())
+    reference = p3m.find_heartbeat_indices(filtered, 250)/500
+    assert np.allclose(np.concatenate(beats), reference)
+    # the latency of the whole stream is still there after the flush
+    report = detector.get_latency_report()
+    assert report['chunks'] == len(beats) - 1
+    assert report['real_time_factor'] > 0
+
+
+def test_hrv_tracker_interpolates_like_interpolate_ibi():
+    rng = np.random.default_rng(0)
+    # the first interval ends on the dt grid of interpolate_ibi, which starts at 0 s
+    intervals = .8 + .05*np.sin(np.arange(400)/5) + .02*rng.standard_normal(400)
+    time_of_heartbeat = np.concatenate([[.2], 1.0 + np.cumsum(np.concatenate([[0], intervals[1:]]))])
+    tracker = p3s.SlidingHRVTracker(window_time=600, dt=.5)
+    tracker.update(time_of_heartbeat)
+    interpolated = tracker._ring[:tracker._n_interpolated]
+
+    regular_time, interpolated_ibi = p3m.interpolate_ibi(time_of_heartbeat, dt=.5)
+    expected = interpolated_ibi[(regular_time >= time_of_heartbeat[1]) & (regular_time <= time_of_heartbeat[-1])]
+    assert len(expected) > 100
+    assert np.allclose(interpolated[:len(expected)], expected)
+
+
+def run_pipeline_in_process(file_name, cache_dir, max_memory=32 << 20):
+    # a new python process, so its peak resident memory is only run_pipeline's
+    code = ('import json, resource, sys\n'
+            'import Project_3_stream as p3s\n'
+            'summary, _ = p3s.run_pipeline(sys.argv[1], max_memory=int(sys.argv[2]), cache_dir=sys.argv[3])\n'
+            'print(json.dumps({"n_beats": summary["n_beats"], '
+            '"peak_memory": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024}))')
+    output = subprocess.run([sys.executable, '-c', code, file_name, str(max_memory), cache_dir],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output)
+
+
+def test_pipeline_memory_is_flat(tmp_path):
+    pytest.importorskip('resource')
+    results = {}
+    for hours in (1, 24):
+        file_name = str(tmp_path / f'synthetic_{hours}h.txt')
+        p3syn.write_long_recording(file_name, hours, seed=0)
+        results[hours] = run_pipeline_in_process(file_name, str(tmp_path / 'cache'))
+        os.remove(file_name)
+    shortest, longest = results[1], results[24]
+    assert longest['n_beats'] == 24*shortest['n_beats']
+    assert longest['peak_memory'] - shortest['peak_memory'] <= memory_growth_limit
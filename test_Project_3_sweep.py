@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+test_Project_3_sweep.py
+Created on Sat Oct 17 18:40:02 2026
+Tests of the parameter sweeps of Project_3_sweep: the shared filtering and
+detection give the same metrics as running every point on its own, in this
+process and with worker processes, and ranked against the true beats of
+synthetic recordings the sweep finds the settings that detect every beat.
+
+@authors: Cole Richardson and Thomas Bausman
+"""
+
+# import packages
+import numpy as np
+import pytest
+import Project_3_filters as p3f
+import Project_3_sweep as p3sw
+import Project_3_synthetic as p3syn
+
+# a small grid that still shares filters and heartbeats between points
+space = {'numtaps': [200, 250], 'window': ['hann', 'hamming'], 'height': [1.6, 1.7], 'dt': [.1, .05]}
+
+
+@pytest.fixture(scope='module')
+def data():
+    return p3sw.load_recordings()
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_sweep_matches_point_by_point(data, n_workers):
+    points = p3sw.make_grid(space)
+    results, summary = p3sw.run_sweep(points, data, n_workers=n_workers)
+    assert summary['n_points'] == len(points) == len(results)
+    assert summary['n_filters'] == 4*len(data)
+
+    reference_indices = p3sw.get_reference_indices(data)
+    for row in results:
+        filt = p3f.get_filter(row['numtaps'], [row['fc1'], row['fc2']], row['window'])
+        for name, recording in data.items():
+            expected = p3sw.evaluate_filter(recording, filt, [(row['numtaps'], row['height'], [row['dt']])],
+                                            reference_indices[name], 25)
+            expected = expected[(row['numtaps'], row['height'], row['dt'])]
+            assert np.allclose([row['recordings'][name][metric] for metric in p3sw.recording_metrics],
+                               [expected[metric] for metric in p3sw.recording_metrics], equal_nan=True)
+
+
+def test_sweep_recovers_good_settings_on_synthetic_data():
+    data, true_indices = {}, {}
+    for heart_rate in (60, 75, 90):
+        ecg_data, time_of_heartbeat = p3syn.generate_synthetic_ecg(120, heart_rate=heart_rate, seed=heart_rate)
+        data[f'{heart_rate} bpm'] = ecg_data
+        true_indices[f'{heart_rate} bpm'] = np.round(time_of_heartbeat*500).astype(int)
+    # 350 taps keeps find_peaks further apart than the beats at 90 bpm, and 2.0 V is above the R peaks
+    points = p3sw.make_grid({'numtaps': [200, 250, 350], 'height': [1.5, 1.7, 1.8, 2.0]})
+    results, _ = p3sw.run_sweep(points, data, reference=true_indices, n_workers=1)
+
+    best = {(row['numtaps'], row['height']) for row in results if row['min_agreement'] == 1.0}
+    assert (p3sw.default_parameters['numtaps'], p3sw.default_parameters['height']) in best
+    assert best <= {(200, 1.7), (200, 1.8), (250, 1.7), (250, 1.8)}
+    assert (results[0]['numtaps'], results[0]['height']) in best
+    assert all(row['min_agreement'] < .9 for row in results if row['numtaps'] == 350 or row['height'] == 2.0)